@@ -0,0 +1,119 @@
+"""
+Benchmark the API deadline, fallbacks, circuit breaker and race mode against the mock API server.
+
+The mock server answers after a short delay, but a share of its requests is made slow or fails.
+The same recordings are transcribed with each fallback mode, and the report gives the latency
+percentiles, the number of errors and the number of requests the server received. With a local
+model (--local-model), the local fallback and race mode are also measured, followed by a
+simulated outage in which every request fails, to show the circuit breaker sending recordings to
+the local model.
+
+Usage (from the root of the repository):
+    python benchmarks/bench_api_fallback.py
+    python benchmarks/bench_api_fallback.py --slow-rate 0.3 --deadline 1.5 --local-model tiny
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from mock_openai_server import create_server, server_url
+from transcription import ApiFallback, BackendRace, transcribe
+from utils import ConfigManager
+
+
+def run_requests(server, audio_data, requests, local_model=None):
+    """
+    Transcribe a recording several times.
+
+    :return: (list of latencies in seconds, number of errors, number of requests the server received)
+    """
+    server_requests = server.requests
+    latencies = []
+    errors = 0
+    for _ in range(requests):
+        start_time = time.perf_counter()
+        try:
+            transcribe(audio_data, local_model)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start_time)
+    return latencies, errors, server.requests - server_requests
+
+
+def report(name, latencies, errors, server_requests):
+    latencies_ms = np.array(latencies) * 1000
+    print(f'{name:<18} p50 {np.percentile(latencies_ms, 50):7.0f} ms  p95 {np.percentile(latencies_ms, 95):7.0f} ms  '
+          f'max {latencies_ms.max():7.0f} ms  {errors:3d} errors  {server_requests:3d} API requests')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20, help='Number of recordings per fallback mode')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of audio per recording')
+    parser.add_argument('--delay', type=float, default=0.3, help='Seconds the mock server takes to answer')
+    parser.add_argument('--slow-rate', type=float, default=0.2, help='Share of requests that are slow')
+    parser.add_argument('--slow-delay', type=float, default=5.0, help='Seconds added to slow requests')
+    parser.add_argument('--fail-rate', type=float, default=0.1, help='Share of requests that fail')
+    parser.add_argument('--deadline', type=float, default=1.0, help='Seconds to wait before falling back')
+    parser.add_argument('--local-model', help='Local model for the local fallback, e.g. tiny; requires faster-whisper')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the injected delays and failures')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server = create_server(port=0, delay=args.delay, slow_rate=args.slow_rate, slow_delay=args.slow_delay,
+                           fail_rate=args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(True, 'model_options', 'use_api')
+    ConfigManager.set_config_value(server_url(server), 'model_options', 'api', 'base_url')
+    ConfigManager.set_config_value(args.deadline, 'model_options', 'api', 'deadline')
+    os.environ.setdefault('OPENAI_API_KEY', 'mock')
+
+    local_model = None
+    if args.local_model:
+        from transcription import create_local_model
+        local_options = dict(ConfigManager.get_config_section('model_options')['local'], model=args.local_model,
+                             model_path=None)
+        local_model = create_local_model(local_options)
+
+    rng = np.random.default_rng(args.seed)
+    t = np.arange(int(args.duration * 16000)) / 16000
+    audio_data = (3000 * np.sin(2 * np.pi * 180 * t) + rng.normal(0, 300, t.shape[0])).astype(np.int16)
+
+    print(f'{args.requests} recordings of {args.duration:.1f} s per mode. API delay {args.delay:.1f} s, '
+          f'{args.slow_rate:.0%} slow by {args.slow_delay:.1f} s, {args.fail_rate:.0%} failing, '
+          f'deadline {args.deadline:.1f} s\n')
+    for fallback in ('none', 'hedge') + (('local',) if local_model else ()):
+        ConfigManager.set_config_value(fallback, 'model_options', 'api', 'fallback')
+        ApiFallback.reset()
+        report(fallback, *run_requests(server, audio_data, args.requests, local_model))
+
+    if local_model:
+        ConfigManager.set_config_value('none', 'model_options', 'api', 'fallback')
+        ConfigManager.set_config_value(True, 'model_options', 'api', 'race')
+        BackendRace.reset()
+        report('race', *run_requests(server, audio_data, args.requests, local_model))
+        print(BackendRace.summary())
+        ConfigManager.set_config_value(False, 'model_options', 'api', 'race')
+        ConfigManager.set_config_value('local', 'model_options', 'api', 'fallback')
+
+        threshold = ConfigManager.get_config_value('model_options', 'api', 'failure_threshold')
+        print(f'\nOutage: every API request fails. The circuit breaker opens after {threshold} failures.')
+        ApiFallback.reset()
+        server.fail_rate = 1.0
+        report('local, outage', *run_requests(server, audio_data, args.requests, local_model))
+        print(f'Circuit breaker open: {ApiFallback.is_open()}')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare the memory and CPU cost of the recording capture path.
+
+The legacy path replays the original ResultThread loop: every sample is pushed into a deque,
+each 30 ms frame is rebuilt with np.array(list(...)) and appended to a list of numpy scalars.
+The new path copies each block into a preallocated AudioBuffer and reads frames as views.
+
+Usage: python benchmarks/bench_audio_buffer.py [--seconds 60] [--sample-rate 16000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from audio_buffer import AudioBuffer
+
+
+def make_blocks(seconds, sample_rate, frame_size):
+    """Generate the int16 blocks a sounddevice callback would deliver."""
+    rng = np.random.default_rng(0)
+    total_frames = int(seconds * sample_rate / frame_size)
+    audio = rng.integers(-3000, 3000, size=(total_frames * frame_size, 1), dtype=np.int16)
+    return [audio[i * frame_size:(i + 1) * frame_size] for i in range(total_frames)]
+
+
+def legacy_capture(blocks, frame_size):
+    """The original deque-and-list-of-scalars loop."""
+    audio_buffer = deque(maxlen=frame_size)
+    recording = []
+    for indata in blocks:
+        audio_buffer.extend(indata[:, 0])
+        if len(audio_buffer) < frame_size:
+            continue
+        frame = np.array(list(audio_buffer), dtype=np.int16)
+        audio_buffer.clear()
+        recording.extend(frame)
+        frame.tobytes()
+    return np.array(recording, dtype=np.int16)
+
+
+def buffer_capture(blocks, frame_size, sample_rate):
+    """The AudioBuffer path used by ResultThread."""
+    audio_buffer = AudioBuffer(sample_rate * 30, dtype=np.int16)
+    frame_start = 0
+    for indata in blocks:
+        audio_buffer.write(indata[:, 0])
+        frame = audio_buffer.read(frame_start, frame_size)
+        while frame is not None:
+            frame_start += frame_size
+            frame.tobytes()
+            frame = audio_buffer.read(frame_start, frame_size)
+    return audio_buffer.get_data()
+
+
+def measure(name, func, *args):
+    """Run func once for CPU time and once under tracemalloc for peak memory."""
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = func(*args)
+    cpu_time = time.process_time() - cpu_start
+    wall_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{name:<10} wall {wall_time * 1000:9.1f} ms   cpu {cpu_time * 1000:9.1f} ms   '
+          f'peak memory {peak / 1024 / 1024:8.2f} MiB')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=60.0, help='Length of the simulated dictation')
+    parser.add_argument('--sample-rate', type=int, default=16000, help='Sample rate in Hz')
+    args = parser.parse_args()
+
+    frame_size = int(args.sample_rate * 0.03)
+    blocks = make_blocks(args.seconds, args.sample_rate, frame_size)
+    print(f'Simulating {args.seconds:.0f} s of audio in {len(blocks)} blocks of {frame_size} samples')
+
+    legacy = measure('legacy', legacy_capture, blocks, frame_size)
+    buffered = measure('buffer', buffer_capture, blocks, frame_size, args.sample_rate)
+    assert np.array_equal(legacy, buffered), 'Capture paths produced different audio'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark clearing a backlog of short utterances one at a time against coalescing them into one decode.
+
+A backlog like the one that forms in continuous mode when a large model falls behind is built
+from the speech fixtures. It is transcribed once with a transcribe_local() call per utterance, and
+once in groups of up to 30 seconds with transcribe_local_batch(), as the pipeline does. The report
+gives the time to clear the backlog, the speedup and the word error rate of the coalesced
+transcriptions against the one-at-a-time ones.
+
+Speech fixtures are the WAV or FLAC files in benchmarks/fixtures (or --fixtures). Without any,
+synthetic clips are used, which measure speed but not the word error rate. Requires faster-whisper.
+
+Usage (from the root of the repository):
+    python benchmarks/bench_backlog.py
+    python benchmarks/bench_backlog.py --model small --utterances 12 --max-seconds 6
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from auto_tune import word_error_rate
+from bench_models import FIXTURES_DIR, SAMPLE_RATE, load_fixtures
+from transcription import (COALESCE_MAX_SECONDS, create_local_model, get_local_model_options, transcribe_local,
+                           transcribe_local_batch)
+from utils import ConfigManager
+
+
+def group_backlog(utterances):
+    """Split the backlog into groups of at most COALESCE_MAX_SECONDS, like the pipeline does."""
+    groups = []
+    total_seconds = None
+    for audio in utterances:
+        duration = audio.shape[0] / SAMPLE_RATE
+        if total_seconds is None or total_seconds + duration > COALESCE_MAX_SECONDS:
+            groups.append([])
+            total_seconds = 0.0
+        groups[-1].append(audio)
+        total_seconds += duration
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Folder with WAV or FLAC speech recordings')
+    parser.add_argument('--model', help='Local model to use (default: the model in the config)')
+    parser.add_argument('--utterances', type=int, default=8, help='Number of utterances in the backlog')
+    parser.add_argument('--max-seconds', type=float, default=8.0, help='Longest fixture to use as an utterance')
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    local_model_options = get_local_model_options()
+    if args.model:
+        local_model_options.update(model=args.model, model_path=None)
+
+    fixtures = [audio for _, audio in load_fixtures(args.fixtures)]
+    fixtures = [audio for audio in fixtures if audio.shape[0] <= args.max_seconds * SAMPLE_RATE] or fixtures
+    utterances = [fixtures[i % len(fixtures)] for i in range(args.utterances)]
+    groups = group_backlog(utterances)
+    duration = sum(audio.shape[0] for audio in utterances) / SAMPLE_RATE
+    print(f'{local_model_options["model"]}, backlog of {len(utterances)} utterances, {duration:.1f} seconds of audio, '
+          f'coalesced into {len(groups)} decodes\n')
+
+    model = create_local_model(local_model_options)
+    transcribe_local(utterances[0], model)
+
+    start_time = time.perf_counter()
+    references = [transcribe_local(audio, model) for audio in utterances]
+    one_at_a_time = time.perf_counter() - start_time
+    print(f'{"One at a time":<16} {one_at_a_time:7.2f} s  RTF {one_at_a_time / duration:.3f}')
+
+    start_time = time.perf_counter()
+    transcriptions = [transcription for group in groups for transcription in transcribe_local_batch(group, model)]
+    coalesced = time.perf_counter() - start_time
+    errors = [word_error_rate(reference, transcription) for reference, transcription in zip(references, transcriptions)]
+    print(f'{"Coalesced":<16} {coalesced:7.2f} s  RTF {coalesced / duration:.3f}  '
+          f'speedup {one_at_a_time / coalesced:4.2f}x  WER {sum(errors) / len(errors):.3f}')
+
+
+if __name__ == '__main__':
+    main()
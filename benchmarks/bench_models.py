@@ -0,0 +1,224 @@
+"""
+Benchmark the local transcription models available offline on this machine.
+
+Every model and compute type from config_schema.yaml that is already downloaded and supported on
+the device is loaded with create_local_model() and run through transcribe_local() on the speech
+fixtures. Each combination runs in its own process, so load time and peak memory are measured
+from a cold start. The report covers load time, peak RSS, real-time factor and p50/p95 latency by
+utterance length, and can be saved as JSON and compared against a stored baseline.
+
+Speech fixtures are the WAV or FLAC files in benchmarks/fixtures (or --fixtures). Without any,
+synthetic clips are used, which measure speed but not realistic decoding.
+
+Usage (from the root of the repository):
+    python benchmarks/bench_models.py --output results.json
+    python benchmarks/bench_models.py --models base tiny --baseline results.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+from utils import ConfigManager
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SAMPLE_RATE = 16000
+# Upper bounds in seconds of the utterance length buckets
+LENGTH_BUCKETS = ((5, 'short (<5 s)'), (15, 'medium (5-15 s)'), (float('inf'), 'long (>15 s)'))
+
+
+def load_fixtures(fixtures_dir):
+    """
+    Load the speech fixtures as int16 arrays at 16kHz, or synthetic clips if there are none.
+
+    :return: List of (name, audio) tuples
+    """
+    from batch_transcribe import load_fixtures as load_speech_fixtures
+
+    fixtures = [(name, audio) for name, audio, _ in load_speech_fixtures(fixtures_dir, SAMPLE_RATE)]
+    if not fixtures:
+        print('No speech fixtures found, using synthetic clips. Download sample recordings with '
+              'python benchmarks/fetch_fixtures.py.', file=sys.stderr)
+        rng = np.random.default_rng(0)
+        for seconds in (2, 4, 8, 12, 20, 28):
+            t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+            audio = 0.2 * np.sin(2 * np.pi * 150 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+            audio += rng.normal(0, 0.01, audio.shape[0])
+            fixtures.append((f'synthetic-{seconds}s', (audio * 32767).astype(np.int16)))
+    return fixtures
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MiB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values, q):
+    """Return the q-th percentile of a list, or None if it is empty."""
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_one(model, compute_type, device, fixtures_dir, repeats):
+    """
+    Benchmark a single combination in this process.
+
+    :return: Dictionary of results
+    """
+    from transcription import create_local_model, transcribe_local
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(model, 'model_options', 'local', 'model')
+    ConfigManager.set_config_value(None, 'model_options', 'local', 'model_path')
+    ConfigManager.set_config_value(compute_type, 'model_options', 'local', 'compute_type')
+    ConfigManager.set_config_value(device, 'model_options', 'local', 'device')
+    ConfigManager.set_config_value('none', 'model_options', 'local', 'performance_profile')
+    fixtures = load_fixtures(fixtures_dir)
+
+    start = time.perf_counter()
+    local_model = create_local_model(local_files_only=True)
+    load_time = time.perf_counter() - start
+
+    latencies = {label: [] for _, label in LENGTH_BUCKETS}
+    audio_seconds = decode_seconds = 0.0
+    for name, audio in fixtures:
+        duration = audio.shape[0] / SAMPLE_RATE
+        label = next(label for limit, label in LENGTH_BUCKETS if duration < limit)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            transcribe_local(audio, local_model)
+            latency = time.perf_counter() - start
+            latencies[label].append(latency)
+            audio_seconds += duration
+            decode_seconds += latency
+
+    return {
+        'model': model,
+        'compute_type': compute_type,
+        'device': device,
+        'load_time': load_time,
+        'peak_rss_mb': peak_rss_mb(),
+        'real_time_factor': decode_seconds / audio_seconds if audio_seconds else None,
+        'latency': {label: {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+                    for label, values in latencies.items() if values},
+    }
+
+
+def available_combinations(models, compute_types, device):
+    """
+    Return the (model, compute type) pairs that are downloaded and supported on the device.
+    """
+    import ctranslate2
+    from faster_whisper.utils import download_model
+
+    ctranslate2_device = 'cuda' if device == 'cuda' or (device == 'auto' and ctranslate2.get_cuda_device_count()) else 'cpu'
+    supported = ctranslate2.get_supported_compute_types(ctranslate2_device)
+
+    combinations = []
+    for model in models:
+        try:
+            download_model(model, local_files_only=True)
+        except Exception:
+            print(f'{model}: not downloaded, skipping')
+            continue
+        for compute_type in compute_types:
+            if compute_type == 'default' or compute_type in supported:
+                combinations.append((model, compute_type))
+    return combinations
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Print regressions in real-time factor and p95 latency against a baseline.
+
+    :return: True if any combination regressed by more than the tolerance
+    """
+    baseline_by_key = {(r['model'], r['compute_type'], r['device']): r for r in baseline['results']}
+    regressed = False
+    for result in results:
+        previous = baseline_by_key.get((result['model'], result['compute_type'], result['device']))
+        if previous is None:
+            continue
+        checks = [('real-time factor', result['real_time_factor'], previous['real_time_factor'])]
+        for label, stats in result['latency'].items():
+            if label in previous['latency']:
+                checks.append((f'{label} p95', stats['p95'], previous['latency'][label]['p95']))
+        for name, current, reference in checks:
+            if current and reference and current > reference * (1 + tolerance):
+                regressed = True
+                print(f'REGRESSION {result["model"]}/{result["compute_type"]}: {name} '
+                      f'{current:.3f} vs baseline {reference:.3f} (+{current / reference - 1:.0%})')
+    return regressed
+
+
+def print_result(result):
+    """Print one combination as a line of the report."""
+    rss = f'{result["peak_rss_mb"]:7.0f} MiB' if result['peak_rss_mb'] is not None else '      n/a'
+    latency = '   '.join(f'{label} p50 {stats["p50"]:.2f} s / p95 {stats["p95"]:.2f} s'
+                           for label, stats in result['latency'].items())
+    print(f'{result["model"]:<10} {result["compute_type"]:<8} load {result["load_time"]:6.2f} s   '
+          f'peak RSS {rss}   RTF {result["real_time_factor"]:.3f}   {latency}')
+
+
+def main():
+    ConfigManager.initialize()
+    schema = ConfigManager.get_schema()['model_options']['local']
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=schema['model']['options'], help='Models to benchmark')
+    parser.add_argument('--compute-types', nargs='+', default=schema['compute_type']['options'],
+                        help='Compute types to benchmark')
+    parser.add_argument('--device', default='cpu', choices=schema['device']['options'], help='Device to run on')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Directory of WAV or FLAC speech fixtures')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of times each fixture is transcribed')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against results previously written with --output')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Allowed relative slowdown against the baseline before failing')
+    parser.add_argument('--run-one', nargs=2, metavar=('MODEL', 'COMPUTE_TYPE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(*args.run_one, args.device, args.fixtures, args.repeats)))
+        return
+
+    results = []
+    for model, compute_type in available_combinations(args.models, args.compute_types, args.device):
+        # A fresh process per combination, so load time and peak memory are not shared
+        process = subprocess.run([sys.executable, __file__, '--run-one', model, compute_type,
+                                  '--device', args.device, '--fixtures', args.fixtures,
+                                  '--repeats', str(args.repeats)],
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f'{model:<10} {compute_type:<8} failed: {process.stderr.strip().splitlines()[-1:]}')
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print_result(result)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        if compare_to_baseline(results, baseline, args.tolerance):
+            sys.exit(1)
+        print('No regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark decoding a long recording in one pass against splitting it at pauses and decoding the chunks in parallel.
+
+The speech fixtures are joined, with short pauses between them, into one long recording like a
+few minutes of hold-to-record dictation. It is transcribed in one pass by a model with a single
+worker, then split with split_at_pauses() and decoded with transcribe_local_chunked() by models
+with more workers. The CPU cores are shared between the workers. The report gives the time to
+text, the speedup over one pass and the word error rate against the one-pass transcription.
+
+Speech fixtures are the WAV or FLAC files in benchmarks/fixtures (or --fixtures). Without any,
+synthetic clips are used, which measure speed but not the word error rate. Requires faster-whisper.
+
+Usage (from the root of the repository):
+    python benchmarks/bench_parallel_decode.py
+    python benchmarks/bench_parallel_decode.py --model small --duration 120 --workers 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from audio_processing import split_at_pauses
+from auto_tune import word_error_rate
+from bench_models import FIXTURES_DIR, SAMPLE_RATE, load_fixtures
+from transcription import (PARALLEL_CHUNK_SECONDS, create_local_model, get_local_model_options,
+                           transcribe_local_chunked, transcribe_local_segments)
+from utils import ConfigManager
+
+
+def build_recording(fixtures, duration, pause=0.6):
+    """Join the fixtures, repeated as needed, into one recording of at least duration seconds."""
+    pause_samples = np.zeros(int(pause * SAMPLE_RATE), dtype=np.int16)
+    parts = []
+    samples = 0
+    while samples < duration * SAMPLE_RATE:
+        for _, audio in fixtures:
+            parts.extend((audio, pause_samples))
+            samples += audio.shape[0] + pause_samples.shape[0]
+    return np.concatenate(parts)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Folder with WAV or FLAC speech recordings')
+    parser.add_argument('--model', help='Local model to use (default: the model in the config)')
+    parser.add_argument('--duration', type=float, default=300.0, help='Seconds of audio in the long recording')
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({2, max(cores // 2, 2), cores}),
+                        help='Worker counts to decode the chunks with')
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    local_model_options = get_local_model_options()
+    if args.model:
+        local_model_options.update(model=args.model, model_path=None)
+
+    audio_data = build_recording(load_fixtures(args.fixtures), args.duration)
+    duration = audio_data.shape[0] / SAMPLE_RATE
+    chunks = split_at_pauses(audio_data, SAMPLE_RATE, PARALLEL_CHUNK_SECONDS)
+    print(f'{local_model_options["model"]}, {duration:.0f} seconds of audio in {len(chunks)} chunks, '
+          f'{cores} CPU cores\n')
+
+    model = create_local_model(local_model_options, cpu_threads=cores, num_workers=1)
+    transcribe_local_segments(audio_data[:SAMPLE_RATE * 5], model)
+    start_time = time.perf_counter()
+    reference = ''.join(segment.text for segment in transcribe_local_segments(audio_data, model))
+    baseline = time.perf_counter() - start_time
+    del model
+    print(f'{"One pass":<22} {baseline:7.2f} s  RTF {baseline / duration:.3f}')
+
+    for workers in args.workers:
+        model = create_local_model(local_model_options, cpu_threads=max(cores // workers, 1), num_workers=workers)
+        transcribe_local_segments(audio_data[:SAMPLE_RATE * 5], model)
+        start_time = time.perf_counter()
+        text = transcribe_local_chunked(audio_data, model, chunks)
+        elapsed = time.perf_counter() - start_time
+        del model
+        print(f'{f"{workers} workers":<22} {elapsed:7.2f} s  RTF {elapsed / duration:.3f}  '
+              f'speedup {baseline / elapsed:4.2f}x  WER {word_error_rate(reference, text):.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the codecs recordings can be uploaded to the API with.
+
+Each speech fixture is encoded with every codec (and Opus at several bitrates) through the same
+EncodedAudioStream used for uploads. The report gives the encoded size, bitrate and encode time of
+each codec, the estimated time to encode and send all fixtures at several upload speeds, and the
+codec auto mode would choose for a 10 second recording at each speed.
+
+Speech fixtures are the WAV or FLAC files in benchmarks/fixtures (or --fixtures). Without any,
+synthetic clips are used.
+
+Usage (from the root of the repository):
+    python benchmarks/bench_upload_codecs.py
+    python benchmarks/bench_upload_codecs.py --bitrates 16 24 32 --speeds 0.5 2 10 50
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from audio_encoding import EncodedAudioStream, UploadCodec
+from bench_models import FIXTURES_DIR, SAMPLE_RATE, load_fixtures
+
+
+def encode_fixtures(fixtures, codec, bitrate):
+    """
+    Encode every fixture with a codec.
+
+    :return: (total encoded bytes, total encode time in seconds)
+    """
+    total_bytes = 0
+    total_time = 0.0
+    for _, audio in fixtures:
+        stream = EncodedAudioStream(audio, SAMPLE_RATE, codec, bitrate)
+        total_bytes += len(stream.getvalue())
+        total_time += stream.encode_time
+    return total_bytes, total_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Folder with WAV or FLAC speech recordings')
+    parser.add_argument('--bitrates', type=int, nargs='+', default=[16, 24, 32], help='Opus bitrates in kbps')
+    parser.add_argument('--speeds', type=float, nargs='+', default=[0.5, 2.0, 10.0, 50.0],
+                        help='Upload speeds in Mbps to estimate the upload time at')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    total_duration = sum(audio.shape[0] for _, audio in fixtures) / SAMPLE_RATE
+    print(f'{len(fixtures)} fixtures, {total_duration:.1f} seconds of audio\n')
+
+    options = [('wav', 0), ('flac', 0)] + [('opus', bitrate) for bitrate in args.bitrates]
+    header = f'{"Codec":<12} {"KiB":>8} {"kbps":>7} {"Encode ms/s":>12}'
+    header += ''.join(f' {f"@{speed:g} Mbps":>12}' for speed in args.speeds)
+    print(header)
+
+    wav_bytes = None
+    for codec, bitrate in options:
+        total_bytes, encode_time = encode_fixtures(fixtures, codec, bitrate)
+        wav_bytes = wav_bytes or total_bytes
+        name = f'{codec} {bitrate}k' if bitrate else codec
+        line = (f'{name:<12} {total_bytes / 1024:8.0f} {total_bytes * 8 / total_duration / 1000:7.1f} '
+                f'{encode_time / total_duration * 1000:12.2f}')
+        # Encoding and uploading overlap, but count both to stay on the safe side
+        line += ''.join(f' {encode_time + total_bytes * 8 / (speed * 1e6):11.2f}s' for speed in args.speeds)
+        print(line)
+
+        UploadCodec.encode_speed[codec] = encode_time / total_duration
+        if codec != 'opus':
+            UploadCodec.compression_ratio[codec] = total_bytes / wav_bytes
+
+    print('\nCodec chosen by auto mode for a 10 second recording, using the encode speeds measured above:')
+    bitrate = 24 if 24 in args.bitrates else args.bitrates[0]
+    for speed in args.speeds:
+        UploadCodec.bandwidth = speed * 1e6 / 8
+        times = {codec: UploadCodec.predict_time(codec, 10.0, SAMPLE_RATE, bitrate) for codec in UploadCodec.AUTO_CODECS}
+        chosen = min(times, key=times.get)
+        predictions = ', '.join(f'{codec} {seconds:.2f}s' for codec, seconds in times.items())
+        print(f'    {speed:g} Mbps: {chosen} ({predictions})')
+
+
+if __name__ == '__main__':
+    main()
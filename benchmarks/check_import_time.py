@@ -0,0 +1,85 @@
+"""
+Check that importing WhisperWriter stays within a time budget and loads no optional backends.
+
+Each module is imported in a fresh interpreter with `python -X importtime`. The check fails if
+the median cumulative import time exceeds the budget, or if importing the module loads any of
+the heavy dependencies that should only be imported once the configured backend needs them
+(faster-whisper, the OpenAI client, the audio libraries and the input simulation libraries).
+
+Usage (from the root of the repository):
+    python benchmarks/check_import_time.py
+    python benchmarks/check_import_time.py --modules transcription vad --budget-ms 300
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Imported on demand by the backend that uses them, never at startup
+LAZY_MODULES = ('faster_whisper', 'ctranslate2', 'onnxruntime', 'openai', 'httpx', 'sounddevice',
+                'soundfile', 'webrtcvad', 'audioplayer', 'pynput', 'evdev')
+
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter.
+
+    :return: (cumulative import time of the module in ms, {top-level package: cumulative ms})
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             cwd=os.path.dirname(SRC_DIR), env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{process.stderr.strip().splitlines()[-1]}')
+
+    packages = {}
+    total = None
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = max(packages.get(package, 0.0), int(cumulative) / 1000)
+        if name.strip() == module:
+            total = int(cumulative) / 1000
+    return total or 0.0, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=['main'], help='Modules to import')
+    parser.add_argument('--budget-ms', type=float, default=750.0, help='Maximum median import time per module')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters per module')
+    parser.add_argument('--top', type=int, default=8, help='Number of slowest packages to list')
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(max(args.runs, 1))]
+        except RuntimeError as e:
+            print(e)
+            failed = True
+            continue
+
+        median = float(np.median([total for total, _ in runs]))
+        packages = runs[-1][1]
+        status = 'OK' if median <= args.budget_ms else 'OVER BUDGET'
+        print(f'{module}: {median:.1f} ms median over {len(runs)} runs (budget {args.budget_ms:.0f} ms) {status}')
+        for package, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'    {package:<24} {cumulative:8.1f} ms')
+
+        loaded = [package for package in LAZY_MODULES if package in packages]
+        if loaded:
+            print(f'    Loaded at import time, should be imported on demand: {", ".join(loaded)}')
+        failed = failed or median > args.budget_ms or bool(loaded)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Download a small set of real speech recordings with reference transcriptions into benchmarks/fixtures.
+
+The recordings are utterances from the LibriSpeech dev-clean set (read English audiobooks,
+CC BY 4.0, https://www.openslr.org/12), chosen so that short (<5 s), medium (5-15 s) and long
+(>15 s) utterances are equally represented. The archive is streamed and only read until enough
+utterances are found, so a few megabytes are downloaded rather than the whole set. Each utterance
+is saved as a 16kHz FLAC file, with its transcription in a .txt file of the same name, which
+auto_tune.py and the benchmarks use as the reference.
+
+Usage (from the root of the repository):
+    python benchmarks/fetch_fixtures.py
+    python benchmarks/fetch_fixtures.py --count 24
+"""
+import argparse
+import io
+import os
+import sys
+import tarfile
+import urllib.request
+
+import soundfile as sf
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LIBRISPEECH_URL = 'https://www.openslr.org/resources/12/dev-clean.tar.gz'
+# Upper bounds in seconds of the utterance length buckets, as in bench_models.py
+LENGTH_BUCKETS = (5, 15, float('inf'))
+
+
+def parse_transcripts(data):
+    """
+    Parse a LibriSpeech .trans.txt file.
+
+    :return: Dictionary of utterance ID to transcription
+    """
+    transcripts = {}
+    for line in data.decode('utf-8').splitlines():
+        utterance_id, _, text = line.partition(' ')
+        if text:
+            transcripts[utterance_id] = text.strip()
+    return transcripts
+
+
+def fetch_fixtures(url, fixtures_dir, count):
+    """
+    Stream the archive and save utterances until every length bucket has its share of count.
+
+    :return: Number of utterances saved
+    """
+    per_bucket = max(count // len(LENGTH_BUCKETS), 1)
+    selected = {limit: 0 for limit in LENGTH_BUCKETS}
+    # The recordings and the transcriptions of a chapter can come in either order in the archive
+    recordings = {}
+    transcripts = {}
+    saved = 0
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with urllib.request.urlopen(url, timeout=30) as response, tarfile.open(fileobj=response, mode='r|gz') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            name = os.path.basename(member.name)
+            if name.endswith('.trans.txt'):
+                transcripts.update(parse_transcripts(archive.extractfile(member).read()))
+            elif name.endswith('.flac'):
+                data = archive.extractfile(member).read()
+                info = sf.info(io.BytesIO(data))
+                limit = next(limit for limit in LENGTH_BUCKETS if info.duration < limit)
+                if selected[limit] < per_bucket:
+                    selected[limit] += 1
+                    recordings[name[:-len('.flac')]] = data
+            else:
+                continue
+
+            for utterance_id in [utterance_id for utterance_id in recordings if utterance_id in transcripts]:
+                with open(os.path.join(fixtures_dir, f'{utterance_id}.flac'), 'wb') as file:
+                    file.write(recordings.pop(utterance_id))
+                with open(os.path.join(fixtures_dir, f'{utterance_id}.txt'), 'w', encoding='utf-8') as file:
+                    file.write(transcripts[utterance_id].lower() + '\n')
+                saved += 1
+            if saved == per_bucket * len(LENGTH_BUCKETS):
+                break
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Folder to save the recordings in')
+    parser.add_argument('--count', type=int, default=12, help='Number of utterances to download')
+    parser.add_argument('--url', default=LIBRISPEECH_URL, help='URL of the LibriSpeech dev-clean archive')
+    args = parser.parse_args()
+
+    try:
+        saved = fetch_fixtures(args.url, args.fixtures, args.count)
+    except (OSError, tarfile.TarError) as e:
+        sys.exit(f'Could not download {args.url}: {e}')
+    print(f'Saved {saved} recordings with reference transcriptions to {args.fixtures}')
+
+
+if __name__ == '__main__':
+    main()
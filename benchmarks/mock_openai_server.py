@@ -0,0 +1,250 @@
+"""
+Run a local stand-in for the OpenAI transcription API, to test the API backend without an API key.
+
+The server answers POST /v1/audio/transcriptions with a fixed transcription after an optional
+delay, and answers any other request with an empty response. Every uploaded file is decoded, and
+uploads that cannot be decoded are answered with an error, as the real API does. A share of the requests can be made
+slow or answered with an error, to test how WhisperWriter handles a struggling API. The server
+counts the connections it accepts, which shows whether clients reuse their connections.
+
+To use it from WhisperWriter, set `base_url` to the printed URL and `OPENAI_API_KEY` to any value.
+With --bench, the server runs in the background and the script compares creating a new client
+for every request against the shared keep-alive client used by WhisperWriter.
+
+Usage (from the root of the repository):
+    python benchmarks/mock_openai_server.py --port 8765 --delay 0.2
+    python benchmarks/mock_openai_server.py --slow-rate 0.2 --slow-delay 8 --fail-rate 0.1
+    python benchmarks/mock_openai_server.py --bench --requests 20
+"""
+import argparse
+import email.parser
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Handles the requests of one connection; HTTP/1.1 keeps the connection open between them."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self._read_body()
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_received += len(body)
+
+        if not self.path.rstrip('/').endswith('/audio/transcriptions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        error = self._decode_upload(body)
+        if error:
+            with self.server.lock:
+                self.server.decode_errors += 1
+            self._send_json(400, {'error': {'message': f'Invalid file format: {error}'}})
+            return
+
+        delay = self.server.delay + random.uniform(0, self.server.jitter)
+        if random.random() < self.server.slow_rate:
+            delay += self.server.slow_delay
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.server.fail_rate:
+            self._send_json(500, {'error': {'message': 'Injected failure'}})
+            return
+        self._send_json(200, {'text': self.server.text})
+
+    def do_GET(self):
+        self._send_json(200, {'object': 'list', 'data': []})
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self):
+        """Read the request body, sent either with a Content-Length or in chunks."""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                if size == 0:
+                    return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _decode_upload(self, body):
+        """
+        Decode the audio file of a multipart upload.
+
+        :return: None if the file decodes, otherwise a description of the problem
+        """
+        import soundfile as sf
+
+        message = email.parser.BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers.get('Content-Type', '').encode('latin-1') + b'\r\n\r\n' + body)
+        for part in message.walk():
+            if part.get_param('name', header='Content-Disposition') != 'file':
+                continue
+            try:
+                audio, _ = sf.read(io.BytesIO(part.get_payload(decode=True)), dtype='int16')
+            except Exception as e:
+                return str(e)
+            return None if audio.shape[0] else 'the file contains no audio'
+        return 'no file in the request'
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(host='127.0.0.1', port=8765, delay=0.0, jitter=0.0, text='Hello from the mock server.',
+                  verbose=False, slow_rate=0.0, slow_delay=0.0, fail_rate=0.0):
+    """
+    Create the mock server. Call serve_forever() on it, e.g. in a background thread.
+
+    The injected delays and failures are attributes of the server, and can be changed while it runs.
+
+    :param port: Port to listen on, or 0 for any free port
+    :param delay: Seconds to wait before answering a transcription request
+    :param jitter: Maximum random number of seconds added to the delay
+    :param slow_rate: Share of transcription requests that wait slow_delay seconds longer
+    :param fail_rate: Share of transcription requests answered with an error
+    :return: ThreadingHTTPServer with the counters connections, requests, bytes_received and decode_errors
+    """
+    server = ThreadingHTTPServer((host, port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.delay = delay
+    server.jitter = jitter
+    server.text = text
+    server.verbose = verbose
+    server.slow_rate = slow_rate
+    server.slow_delay = slow_delay
+    server.fail_rate = fail_rate
+    server.connections = 0
+    server.requests = 0
+    server.bytes_received = 0
+    server.decode_errors = 0
+    return server
+
+
+def server_url(server):
+    """Return the base URL to use as base_url for the server."""
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}/v1'
+
+
+def run_requests(server, transcribe, audio_data, requests):
+    """
+    Send transcription requests one after the other.
+
+    :return: (list of latencies in seconds, number of connections the server accepted)
+    """
+    connections = server.connections
+    latencies = []
+    for _ in range(requests):
+        start_time = time.perf_counter()
+        transcribe(audio_data)
+        latencies.append(time.perf_counter() - start_time)
+    return latencies, server.connections - connections
+
+
+def bench(args):
+    """Compare a new client per request against the shared keep-alive client."""
+    from openai import OpenAI
+    from transcription import ApiClient, transcribe_api
+    from utils import ConfigManager
+
+    server = create_server(port=0, delay=args.delay, jitter=args.jitter)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(server_url(server), 'model_options', 'api', 'base_url')
+    os.environ.setdefault('OPENAI_API_KEY', 'mock')
+
+    rng = np.random.default_rng(0)
+    audio_data = (rng.normal(0, 1000, int(args.duration * 16000))).astype(np.int16)
+
+    def transcribe_new_client(audio_data):
+        # What transcribe_api() did before the shared client: a new client for every request
+        import io
+        import soundfile as sf
+        client = OpenAI(api_key=os.environ['OPENAI_API_KEY'], base_url=server_url(server))
+        byte_io = io.BytesIO()
+        sf.write(byte_io, audio_data, 16000, format='wav')
+        byte_io.seek(0)
+        text = client.audio.transcriptions.create(model='whisper-1', file=('audio.wav', byte_io, 'audio/wav')).text
+        client.close()
+        return text
+
+    print(f'Sending {args.requests} requests of {args.duration:.1f} seconds of audio to {server_url(server)} '
+          f'(delay {args.delay * 1000:.0f} ms)')
+    for name, transcribe in (('New client per request', transcribe_new_client), ('Shared client', transcribe_api)):
+        latencies, connections = run_requests(server, transcribe, audio_data, args.requests)
+        latencies_ms = np.array(latencies) * 1000
+        print(f'{name:<24} p50 {np.percentile(latencies_ms, 50):7.1f} ms  p95 {np.percentile(latencies_ms, 95):7.1f} ms  '
+              f'first {latencies_ms[0]:7.1f} ms  {connections} connections')
+    ApiClient.close()
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before each transcription response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Maximum random seconds added to the delay')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Share of requests that are slow')
+    parser.add_argument('--slow-delay', type=float, default=10.0, help='Seconds added to the delay of slow requests')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with an error')
+    parser.add_argument('--text', default='Hello from the mock server.', help='Transcription to return')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    parser.add_argument('--bench', action='store_true', help='Compare a new client per request against the shared client')
+    parser.add_argument('--requests', type=int, default=20, help='Number of requests per client with --bench')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of audio per request with --bench')
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args)
+        return
+
+    server = create_server(args.host, args.port, args.delay, args.jitter, args.text, args.verbose,
+                           args.slow_rate, args.slow_delay, args.fail_rate)
+    print(f'Mock OpenAI API listening on {server_url(server)}. Press Ctrl+C to stop.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f'{server.requests} requests on {server.connections} connections, '
+              f'{server.bytes_received / 1024:.0f} KiB received, {server.decode_errors} files that could not be decoded.')
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
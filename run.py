@@ -1,8 +1,33 @@
+import time
+LAUNCHER_START = time.perf_counter()
+
+import argparse
 import os
 import sys
-import subprocess
 from dotenv import load_dotenv
 
-print('Starting WhisperWriter...')
-load_dotenv()
-subprocess.run([sys.executable, os.path.join('src', 'main.py')])
+
+def main():
+    parser = argparse.ArgumentParser(description='Start WhisperWriter.')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Print a timeline of the startup steps once the activation key is armed')
+    args, qt_args = parser.parse_known_args()
+
+    print('Starting WhisperWriter...')
+    load_dotenv()
+
+    # Run the app in this interpreter instead of starting a second one for src/main.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    sys.argv = [sys.argv[0]] + qt_args
+    from startup_profile import StartupProfile
+    StartupProfile.start(LAUNCHER_START, enabled=args.startup_profile)
+    StartupProfile.mark('environment loaded')
+
+    from main import WhisperWriterApp
+    StartupProfile.mark('modules imported')
+    app = WhisperWriterApp()
+    app.run()
+
+
+if __name__ == '__main__':
+    main()
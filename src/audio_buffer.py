@@ -0,0 +1,141 @@
+import threading
+import numpy as np
+
+
+class AudioBuffer:
+    """
+    A preallocated, growable buffer of mono audio samples.
+
+    Blocks from the audio callback are copied in with a single slice assignment, frames are
+    read back as zero-copy views, and the whole recording is returned as one contiguous array.
+    When the buffer is full, its capacity is doubled so appends stay amortized O(1).
+    """
+
+    def __init__(self, capacity, dtype=np.int16):
+        """
+        Initialize the buffer.
+
+        :param capacity: Number of samples to preallocate
+        :param dtype: Sample type of the buffer (int16 or float32)
+        """
+        self._data = np.empty(max(int(capacity), 1), dtype=dtype)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of samples written so far."""
+        return self._size
+
+    @property
+    def capacity(self):
+        """Return the number of samples that fit before the buffer has to grow."""
+        return self._data.shape[0]
+
+    @property
+    def nbytes(self):
+        """Return the memory allocated for the samples in bytes."""
+        return self._data.nbytes
+
+    def write(self, block):
+        """
+        Append a block of samples to the buffer.
+
+        :param block: 1-D array of samples, e.g. ``indata[:, 0]`` from a sounddevice callback
+        """
+        samples = block.shape[0]
+        with self._lock:
+            end = self._size + samples
+            if end > self._data.shape[0]:
+                self._grow(end)
+            self._data[self._size:end] = block
+            self._size = end
+
+    def _grow(self, min_capacity):
+        """Reallocate the storage to at least min_capacity samples, keeping the written data."""
+        capacity = self._data.shape[0]
+        while capacity < min_capacity:
+            capacity *= 2
+        data = np.empty(capacity, dtype=self._data.dtype)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def read(self, start, length):
+        """
+        Return a view of length samples starting at start.
+
+        Views stay valid after the buffer grows, as they keep the old storage alive.
+
+        :return: numpy view of the samples, or None if they have not been written yet
+        """
+        with self._lock:
+            if start + length > self._size:
+                return None
+            return self._data[start:start + length]
+
+    def get_data(self):
+        """Return a contiguous view of all samples written so far."""
+        with self._lock:
+            return self._data[:self._size]
+
+    def clear(self):
+        """Discard all samples, keeping the allocated storage."""
+        with self._lock:
+            self._size = 0
+
+
+class RingBuffer:
+    """
+    A fixed-size circular buffer that keeps only the most recent audio samples.
+
+    Used for the pre-roll, so it is not thread-safe on its own; callers serialize access.
+    """
+
+    def __init__(self, capacity, dtype=np.int16):
+        """
+        Initialize the buffer.
+
+        :param capacity: Maximum number of samples kept
+        :param dtype: Sample type of the buffer
+        """
+        self._data = np.zeros(max(int(capacity), 0), dtype=dtype)
+        self._end = 0
+        self._size = 0
+
+    @property
+    def nbytes(self):
+        """Return the memory allocated for the samples in bytes."""
+        return self._data.nbytes
+
+    def __len__(self):
+        """Return the number of samples currently held."""
+        return self._size
+
+    def write(self, block):
+        """Append a block of samples, overwriting the oldest ones once the buffer is full."""
+        capacity = self._data.shape[0]
+        if capacity == 0:
+            return
+        if block.shape[0] >= capacity:
+            self._data[:] = block[-capacity:]
+            self._end = 0
+            self._size = capacity
+            return
+
+        samples = block.shape[0]
+        first = min(samples, capacity - self._end)
+        self._data[self._end:self._end + first] = block[:first]
+        self._data[:samples - first] = block[first:]
+        self._end = (self._end + samples) % capacity
+        self._size = min(self._size + samples, capacity)
+
+    def get_data(self):
+        """Return a copy of the held samples in chronological order."""
+        start = self._end - self._size
+        if start >= 0:
+            return self._data[start:self._end].copy()
+        return np.concatenate((self._data[start:], self._data[:self._end]))
+
+    def clear(self):
+        """Discard all samples."""
+        self._end = 0
+        self._size = 0
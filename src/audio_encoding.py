@@ -0,0 +1,261 @@
+import io
+import os
+import threading
+import time
+
+from utils import ConfigManager
+
+# Format, subtype, file extension and MIME type of each codec recordings can be uploaded with
+UPLOAD_CODECS = {
+    'wav': ('WAV', 'PCM_16', 'wav', 'audio/wav'),
+    'flac': ('FLAC', 'PCM_16', 'flac', 'audio/flac'),
+    'opus': ('OGG', 'OPUS', 'ogg', 'audio/ogg'),
+}
+
+# Sample rates the Opus encoder accepts
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def opus_compression_level(bitrate_kbps):
+    """
+    Return the libsndfile compression level for an Opus bitrate.
+
+    libsndfile maps compression levels from 0 to 1 linearly onto bitrates from 256 down to 6 kbps.
+    """
+    return min(max(1.0 - (bitrate_kbps * 1000 - 6000) / 250000, 0.0), 1.0)
+
+
+class _EncoderOutput:
+    """In-memory file the encoder writes to, which can be read while the encoder is still writing."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.data[self.position:self.position + len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += len(self.data)
+        self.position = offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        return b''
+
+
+class EncodedAudioStream(io.RawIOBase):
+    """
+    A file-like object that encodes a recording block by block as it is read.
+
+    Passed as the file of an upload, the HTTP client starts sending the first blocks while the
+    rest of the recording is still being encoded, and the upload has no Content-Length, so it is
+    sent in chunks. Encoded bytes are kept, so the stream can be rewound with seek(0) if the
+    request is retried.
+
+    Only Opus is streamed. libsndfile completes the headers of WAV and FLAC files when they are
+    closed, by seeking back to the start, so bytes sent before that would describe an empty or
+    invalid file. These codecs are encoded in full when the stream is created, which takes well
+    under a millisecond per second of audio.
+    """
+
+    # Samples encoded at a time, one second at 16 kHz
+    BLOCK_SIZE = 16000
+    # Codecs whose output is final as soon as it is written
+    STREAMED_CODECS = ('opus',)
+
+    def __init__(self, audio_data, sample_rate, codec='flac', bitrate=24):
+        """
+        Start encoding a recording.
+
+        :param audio_data: 1-D int16 array of samples
+        :param sample_rate: Sample rate of the recording
+        :param codec: Name of a codec in UPLOAD_CODECS
+        :param bitrate: Target bitrate in kbps for Opus
+        """
+        import soundfile as sf
+
+        super().__init__()
+        self.codec = codec
+        file_format, subtype, self.extension, self.mime_type = UPLOAD_CODECS[codec]
+        self.sample_rate = sample_rate
+        self.duration = audio_data.shape[0] / sample_rate
+        self.encode_time = 0.0
+        self.first_read = None
+        self.last_read = None
+        self._encode_time_before_read = 0.0
+        self._audio_data = audio_data
+        self._encoded_samples = 0
+        self._position = 0
+        self._output = _EncoderOutput()
+
+        start_time = time.perf_counter()
+        options = {}
+        if codec == 'opus':
+            options['compression_level'] = opus_compression_level(bitrate)
+        self._file = sf.SoundFile(self._output, 'w', sample_rate, 1, subtype, format=file_format, **options)
+        self.encode_time += time.perf_counter() - start_time
+        if codec not in self.STREAMED_CODECS:
+            self._encode_all()
+
+    @property
+    def name(self):
+        """File name of the upload."""
+        return f'audio.{self.extension}'
+
+    @property
+    def encoded_bytes(self):
+        """Number of bytes encoded so far."""
+        return len(self._output.data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Rewind the stream; seeking anywhere else is not supported, as the length is unknown."""
+        if whence != os.SEEK_SET or offset != 0:
+            raise io.UnsupportedOperation('EncodedAudioStream can only be rewound')
+        self._position = 0
+        return 0
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        """Return up to size encoded bytes, encoding more of the recording as needed."""
+        now = time.perf_counter()
+        if self.first_read is None:
+            self.first_read = now
+            self._encode_time_before_read = self.encode_time
+        while self._file is not None and (size is None or size < 0 or self.encoded_bytes - self._position < size):
+            self._encode_block()
+        end = self.encoded_bytes if size is None or size < 0 else min(self._position + size, self.encoded_bytes)
+        data = bytes(self._output.data[self._position:end])
+        self._position = end
+        self.last_read = time.perf_counter()
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def getvalue(self):
+        """Encode the rest of the recording and return all the encoded bytes."""
+        self._encode_all()
+        return bytes(self._output.data)
+
+    def transfer_time(self):
+        """
+        Return the number of seconds the stream was read for, minus the time spent encoding.
+
+        While an upload is in progress, the HTTP client reads the next chunk once the previous one
+        has been sent, so this approximates the upload time of large recordings.
+        """
+        if self.first_read is None or self.last_read is None:
+            return None
+        encode_time = self.encode_time - self._encode_time_before_read
+        return max(self.last_read - self.first_read - encode_time, 0.0)
+
+    def _encode_all(self):
+        while self._file is not None:
+            self._encode_block()
+
+    def _encode_block(self):
+        """Encode the next block of the recording, closing the encoder after the last one."""
+        start_time = time.perf_counter()
+        block = self._audio_data[self._encoded_samples:self._encoded_samples + self.BLOCK_SIZE]
+        if block.shape[0]:
+            self._file.write(block)
+            self._encoded_samples += block.shape[0]
+        if self._encoded_samples >= self._audio_data.shape[0]:
+            self._file.close()
+            self._file = None
+        self.encode_time += time.perf_counter() - start_time
+
+
+class UploadCodec:
+    """
+    Chooses the codec recordings are uploaded with, and measures the upload bandwidth.
+
+    In auto mode, the codec is the one with the lowest predicted time to encode and send the
+    recording: FLAC is lossless and fast to encode, while Opus is many times smaller but takes
+    longer to encode, so it only pays off on slow connections. Predictions use the encode speed,
+    compressed size and upload bandwidth measured on previous uploads, and FLAC is used until the
+    bandwidth has been measured.
+    """
+
+    # Candidates in auto mode, in order of preference
+    AUTO_CODECS = ('flac', 'opus')
+    # Uploads smaller than this fit in the socket buffers, so their timing says nothing about the bandwidth
+    MIN_MEASURED_BYTES = 64 * 1024
+    # Weight of the latest measurement in the running averages
+    SMOOTHING = 0.3
+
+    _lock = threading.Lock()
+    bandwidth = None
+    # Initial estimates of the encoded bytes per second of 16-bit audio and the encode time per second of audio
+    compression_ratio = {'wav': 1.0, 'flac': 0.55}
+    encode_speed = {'wav': 0.0001, 'flac': 0.0005, 'opus': 0.02}
+
+    @classmethod
+    def select(cls, duration, sample_rate):
+        """
+        Return the codec to upload a recording with, from model_options.api.upload_codec.
+
+        :param duration: Length of the recording in seconds
+        :param sample_rate: Sample rate of the recording
+        """
+        api_options = ConfigManager.get_config_section('model_options')['api']
+        codec = api_options.get('upload_codec') or 'flac'
+        candidates = cls.AUTO_CODECS if codec == 'auto' else (codec,)
+        if sample_rate not in OPUS_SAMPLE_RATES:
+            candidates = tuple(candidate for candidate in candidates if candidate != 'opus') or ('flac',)
+        if len(candidates) == 1:
+            return candidates[0]
+        bitrate = api_options.get('opus_bitrate') or 24
+        return min(candidates, key=lambda candidate: cls.predict_time(candidate, duration, sample_rate, bitrate))
+
+    @classmethod
+    def predict_time(cls, codec, duration, sample_rate, bitrate=24):
+        """Return the predicted seconds to encode and upload a recording with a codec."""
+        with cls._lock:
+            encode_time = cls.encode_speed.get(codec, 0.0) * duration
+            if cls.bandwidth is None:
+                return encode_time
+            if codec == 'opus':
+                size = bitrate * 1000 / 8 * duration
+            else:
+                size = cls.compression_ratio.get(codec, 1.0) * 2 * sample_rate * duration
+            return encode_time + size / cls.bandwidth
+
+    @classmethod
+    def observe(cls, stream):
+        """Update the estimates from a finished upload of an EncodedAudioStream."""
+        transfer_time = stream.transfer_time()
+        with cls._lock:
+            if stream.duration > 0:
+                cls.encode_speed[stream.codec] = cls._smooth(cls.encode_speed.get(stream.codec),
+                                                             stream.encode_time / stream.duration)
+                if stream.codec != 'opus':
+                    raw_bytes = stream.duration * 2 * stream.sample_rate
+                    cls.compression_ratio[stream.codec] = cls._smooth(cls.compression_ratio.get(stream.codec),
+                                                                      stream.encoded_bytes / raw_bytes)
+            if transfer_time and stream.encoded_bytes >= cls.MIN_MEASURED_BYTES:
+                cls.bandwidth = cls._smooth(cls.bandwidth, stream.encoded_bytes / transfer_time)
+
+    @classmethod
+    def _smooth(cls, average, value):
+        return value if average is None else average + cls.SMOOTHING * (value - average)
@@ -0,0 +1,169 @@
+import math
+import threading
+import numpy as np
+
+from vad import frame_energy_db
+
+
+def dilate_labels(speech_labels, padding_frames):
+    """
+    Extend every run of speech frames by padding_frames on both sides.
+
+    :param speech_labels: 1-D bool array with one label per frame
+    :return: 1-D bool array of the same length
+    """
+    if padding_frames <= 0 or not speech_labels.any():
+        return speech_labels
+    window = np.ones(2 * padding_frames + 1, dtype=np.int32)
+    return np.convolve(speech_labels.astype(np.int32), window, mode='same') > 0
+
+
+def compact_silence(audio_data, speech_labels, frame_size, padding_frames):
+    """
+    Remove the leading, trailing and internal silence of a recording, keeping some padding.
+
+    Non-speech regions are shortened to padding_frames on each side of the surrounding speech.
+    Samples past the last labelled frame are kept, as they were never classified. If no frame
+    contains speech, the recording is returned unchanged.
+
+    :param audio_data: 1-D array of samples
+    :param speech_labels: 1-D bool array with one label per frame, from the start of the recording
+    :param frame_size: Number of samples per frame
+    :param padding_frames: Number of non-speech frames to keep next to speech
+    :return: The compacted recording, or audio_data itself if nothing was removed
+    """
+    if speech_labels is None or not speech_labels.any():
+        return audio_data
+
+    keep = dilate_labels(speech_labels, padding_frames)
+    if keep.all():
+        return audio_data
+
+    labelled_samples = min(keep.shape[0] * frame_size, audio_data.shape[0])
+    mask = np.ones(audio_data.shape[0], dtype=bool)
+    mask[:labelled_samples] = np.repeat(keep, frame_size)[:labelled_samples]
+    return audio_data[mask]
+
+
+def split_at_pauses(audio_data, sample_rate, max_chunk_seconds, frame_ms=20, pause_ms=300):
+    """
+    Split a recording into chunks no longer than max_chunk_seconds, cutting in the quietest pauses.
+
+    Each cut is placed in the second half of the longest chunk allowed, at the centre of the
+    quietest pause_ms stretch, so words are not cut in two and chunks stay close to the maximum.
+
+    :param audio_data: 1-D int16 array of samples
+    :return: List of (start sample, end sample) pairs covering the recording in order
+    """
+    max_samples = int(max_chunk_seconds * sample_rate)
+    if max_samples <= 0 or audio_data.shape[0] <= max_samples:
+        return [(0, audio_data.shape[0])]
+
+    frame_size = max(int(sample_rate * frame_ms / 1000), 1)
+    frame_count = audio_data.shape[0] // frame_size
+    levels = frame_energy_db(audio_data[:frame_count * frame_size].reshape(frame_count, frame_size))
+    # Averaging over a pause length prefers real pauses to the short gaps between syllables
+    pause_frames = max(pause_ms // frame_ms, 1)
+    levels = np.convolve(levels, np.ones(pause_frames) / pause_frames, mode='same')
+
+    chunks = []
+    start = 0
+    while audio_data.shape[0] - start > max_samples:
+        first_frame = (start + max_samples // 2) // frame_size
+        last_frame = min((start + max_samples) // frame_size, frame_count)
+        if last_frame > first_frame:
+            end = (first_frame + int(np.argmin(levels[first_frame:last_frame]))) * frame_size + frame_size // 2
+        else:
+            end = start + max_samples
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, audio_data.shape[0]))
+    return chunks
+
+
+def resample(audio_data, from_rate, to_rate, block_seconds=30):
+    """
+    Resample a recording with band-limited (FFT) interpolation.
+
+    Frequencies above the new Nyquist frequency are removed rather than folded back into the
+    speech band, as linear interpolation does when downsampling. The recording is resampled in
+    blocks that overlap by 100 ms, so long files do not need one transform of their full length.
+
+    :param audio_data: 1-D float array of samples
+    :return: 1-D array of the same dtype at to_rate
+    """
+    if from_rate == to_rate or audio_data.shape[0] == 0:
+        return audio_data
+
+    length = int(round(audio_data.shape[0] * to_rate / from_rate))
+    # Blocks and overlaps are whole multiples of the input samples that map onto whole output samples
+    unit = from_rate // math.gcd(from_rate, to_rate)
+    padding = unit * max(from_rate // 10 // unit, 1)
+    output_padding = padding * to_rate // from_rate
+    block = block_seconds * from_rate
+    padded = np.pad(audio_data.astype(np.float64), padding)
+
+    blocks = []
+    for start in range(0, audio_data.shape[0], block):
+        segment = padded[start:start + block + 2 * padding]
+        output_length = int(round(segment.shape[0] * to_rate / from_rate))
+        bins = output_length // 2 + 1
+        spectrum = np.fft.rfft(segment)
+        if spectrum.shape[0] >= bins:
+            spectrum = spectrum[:bins]
+        else:
+            spectrum = np.pad(spectrum, (0, bins - spectrum.shape[0]))
+        resampled = np.fft.irfft(spectrum, output_length) * (output_length / segment.shape[0])
+        blocks.append(resampled[output_padding:output_length - output_padding])
+
+    resampled = np.concatenate(blocks)[:length]
+    if resampled.shape[0] < length:
+        resampled = np.pad(resampled, (0, length - resampled.shape[0]))
+    return resampled.astype(audio_data.dtype)
+
+
+class SpeechGate:
+    """
+    Decides whether a recording is worth transcribing, and counts the decodes it avoided.
+
+    Recordings in which VAD never detected speech, or where speech makes up less than the
+    minimum ratio of frames, are skipped before any model pass or API upload. The counters are
+    shared by all recording threads.
+    """
+
+    _lock = threading.Lock()
+    recordings_checked = 0
+    recordings_skipped = 0
+    segments_filtered = 0
+
+    @classmethod
+    def has_speech(cls, speech_labels, speech_detected, min_speech_ratio=0.0):
+        """
+        Check a recording and update the counters.
+
+        :param speech_labels: 1-D bool array with one label per frame
+        :param speech_detected: True if the recording loop detected the onset of speech
+        :param min_speech_ratio: Minimum fraction of frames that must contain speech
+        :return: True if the recording should be transcribed
+        """
+        has_speech = speech_detected
+        if has_speech and speech_labels is not None and speech_labels.shape[0]:
+            has_speech = np.count_nonzero(speech_labels) / speech_labels.shape[0] >= min_speech_ratio
+
+        with cls._lock:
+            cls.recordings_checked += 1
+            if not has_speech:
+                cls.recordings_skipped += 1
+        return has_speech
+
+    @classmethod
+    def count_filtered_segments(cls, count):
+        """Record segments dropped after decoding because they most likely contain no speech."""
+        with cls._lock:
+            cls.segments_filtered += count
+
+    @classmethod
+    def summary(cls):
+        """Return a one-line summary of the counters."""
+        return (f'{cls.recordings_skipped} of {cls.recordings_checked} recordings skipped without decoding, '
+                f'{cls.segments_filtered} segments filtered after decoding')
@@ -0,0 +1,235 @@
+import time
+import threading
+import numpy as np
+
+from audio_buffer import AudioBuffer, RingBuffer
+from metrics import Metrics
+from utils import ConfigManager
+
+
+class AudioInputService:
+    """
+    A long-lived audio capture service that keeps a single input stream open.
+
+    Every block from the stream is fanned out to the subscribed recording sessions, so starting
+    a recording does not pay for opening a new PortAudio stream. The last few hundred milliseconds
+    are kept in a pre-roll buffer that is handed to each new session, so speech that starts just
+    before the activation key registers is not clipped. A monitor thread reopens the stream if it
+    stops delivering audio, e.g. because the device was unplugged.
+    """
+
+    FRAME_DURATION_MS = 30
+    STALL_TIMEOUT = 1.0
+    RETRY_INTERVAL = 2.0
+
+    def __init__(self):
+        """
+        Initialize the service from the recording options.
+        """
+        self._load_config()
+        self._stream = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._wake = threading.Event()
+        self._last_callback_time = 0.0
+        self._monitor_thread = None
+
+    # Recording options that require the stream to be reopened
+    STREAM_OPTIONS = ('sample_rate', 'sound_device', 'pre_roll_duration')
+
+    def _load_config(self):
+        """Read the stream settings from the recording options."""
+        recording_options = ConfigManager.get_config_section('recording_options')
+        self.sample_rate = recording_options.get('sample_rate') or 16000
+        self.device = recording_options.get('sound_device')
+        self.frame_size = int(self.sample_rate * (self.FRAME_DURATION_MS / 1000.0))
+        pre_roll_ms = recording_options.get('pre_roll_duration') or 0
+        self.pre_roll = RingBuffer(self.sample_rate * pre_roll_ms // 1000, dtype=np.int16)
+        Metrics.observe_memory('pre_roll', self.pre_roll.nbytes)
+
+    def apply_config_changes(self, changed_keys):
+        """
+        Reopen the stream with the new settings if the device, sample rate or pre-roll changed.
+
+        :param changed_keys: Set of changed key tuples from ConfigManager.changed_keys()
+        """
+        if not any(('recording_options', option) in changed_keys for option in self.STREAM_OPTIONS):
+            return
+        was_running = self._running
+        self.stop()
+        self._load_config()
+        if was_running:
+            self.start()
+
+    def is_running(self):
+        """Return True if the service has been started and not stopped."""
+        return self._running
+
+    def start(self):
+        """
+        Open the input stream and start monitoring it.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._open_stream()
+        self._monitor_thread = threading.Thread(target=self._monitor, name='AudioInputMonitor', daemon=True)
+        self._monitor_thread.start()
+
+    def stop(self):
+        """
+        Stop monitoring and close the input stream.
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        if self._monitor_thread:
+            self._monitor_thread.join()
+            self._monitor_thread = None
+        self._close_stream()
+
+    def subscribe(self, callback, pre_roll=True):
+        """
+        Register a callback that receives every captured block as a 1-D int16 array.
+
+        The callback runs on the audio thread and must not block.
+
+        :param pre_roll: If True, the callback first receives the buffered pre-roll audio
+        :return: Number of pre-roll samples delivered
+        """
+        with self._lock:
+            pre_roll_samples = 0
+            if pre_roll and len(self.pre_roll):
+                pre_roll_data = self.pre_roll.get_data()
+                pre_roll_samples = pre_roll_data.shape[0]
+                callback(pre_roll_data)
+            self._subscribers.append(callback)
+        return pre_roll_samples
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered with subscribe()."""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def replace_subscriber(self, old_callback, new_callback):
+        """
+        Swap one subscriber for another, so every block goes to exactly one of them.
+        """
+        with self._lock:
+            if old_callback in self._subscribers:
+                self._subscribers.remove(old_callback)
+            self._subscribers.append(new_callback)
+
+    def _open_stream(self):
+        """Open and start the input stream. Returns True on success."""
+        try:
+            import sounddevice as sd
+            self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
+                                          blocksize=self.frame_size, device=self.device,
+                                          callback=self._audio_callback,
+                                          finished_callback=self._wake.set)
+            self._last_callback_time = time.monotonic()
+            self._stream.start()
+            ConfigManager.console_print('Audio input stream opened.')
+            return True
+        except Exception as e:
+            ConfigManager.console_print(f'Error opening audio input stream: {e}')
+            self._stream = None
+            return False
+
+    def _close_stream(self):
+        """Close the input stream, ignoring errors from a device that has gone away."""
+        stream, self._stream = self._stream, None
+        with self._lock:
+            self.pre_roll.clear()
+        if stream is None:
+            return
+        try:
+            stream.abort()
+            stream.close()
+        except Exception as e:
+            ConfigManager.console_print(f'Error closing audio input stream: {e}')
+
+    def _reopen_stream(self):
+        """Close the stream and reopen it, rescanning the available devices first."""
+        self._close_stream()
+        try:
+            import sounddevice as sd
+            # PortAudio only sees devices that were connected when it was initialized
+            sd._terminate()
+            sd._initialize()
+        except Exception as e:
+            ConfigManager.console_print(f'Error reinitializing audio devices: {e}')
+        return self._open_stream()
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        """Fan the captured block out to every subscriber."""
+        if status:
+            ConfigManager.console_print(f"Audio callback status: {status}")
+        self._last_callback_time = time.monotonic()
+        block = indata[:, 0]
+        with self._lock:
+            self.pre_roll.write(block)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(block)
+
+    def _monitor(self):
+        """Reopen the stream whenever it finishes or stops delivering audio."""
+        while self._running:
+            self._wake.wait(self.STALL_TIMEOUT)
+            self._wake.clear()
+            if not self._running:
+                break
+
+            stream = self._stream
+            stalled = time.monotonic() - self._last_callback_time > self.STALL_TIMEOUT
+            if stream is not None and stream.active and not stalled:
+                continue
+
+            ConfigManager.console_print('Audio input stream lost. Reopening...')
+            while self._running and not self._reopen_stream():
+                self._wake.wait(self.RETRY_INTERVAL)
+                self._wake.clear()
+
+
+class CaptureSession:
+    """
+    A subscription to the AudioInputService that collects blocks into an AudioBuffer.
+    """
+
+    def __init__(self, audio_service, pre_roll=True, replaces=None):
+        """
+        Start capturing.
+
+        :param audio_service: The running AudioInputService
+        :param pre_roll: If True, the buffer starts with the service's pre-roll audio
+        :param replaces: A CaptureSession to hand over to; every block after the handover goes here
+        """
+        self.audio_service = audio_service
+        # Preallocate room for 30 seconds of audio; the buffer grows if the recording is longer
+        self.audio_buffer = AudioBuffer(audio_service.sample_rate * 30, dtype=np.int16)
+        self.data_ready = threading.Event()
+        self.pre_roll_samples = 0
+        self._closed = False
+
+        if replaces is not None:
+            audio_service.replace_subscriber(replaces._on_block, self._on_block)
+            replaces._closed = True
+        else:
+            self.pre_roll_samples = audio_service.subscribe(self._on_block, pre_roll)
+
+    def _on_block(self, block):
+        """Append a block from the audio thread and wake up the reader."""
+        self.audio_buffer.write(block)
+        self.data_ready.set()
+
+    def close(self):
+        """Stop receiving audio."""
+        if not self._closed:
+            self.audio_service.unsubscribe(self._on_block)
+            self._closed = True
+            Metrics.observe_memory('capture_buffer', self.audio_buffer.nbytes)
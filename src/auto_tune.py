@@ -0,0 +1,208 @@
+"""
+Find the fastest performance profile for this machine that stays accurate, and select it.
+
+Every profile in performance_profiles is tried with each compute type the device supports and
+a few thread counts up to the number of CPU cores, skipping compute types whose model would not
+fit in the available memory. Each candidate transcribes the speech recordings in the fixtures
+folder. Its word error rate is measured against reference .txt files next to the recordings, or
+against the transcription of the accuracy profile at full precision if there are none. The
+fastest candidate within the tolerance is saved as the selected profile, with its compute type
+and thread count.
+
+Usage (from the root of the repository):
+    python src/auto_tune.py
+    python src/auto_tune.py --fixtures recordings/ --tolerance 0.05 --dry-run
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from batch_transcribe import load_fixtures
+from model_registry import estimate_model_size_mb, model_key
+from transcription import PROFILE_DECODE_OPTIONS, create_local_model, transcribe_local_segments
+from utils import ConfigManager
+
+FIXTURES_DIR = os.path.join('benchmarks', 'fixtures')
+# Compute types worth trying, from the most to the least precise
+COMPUTE_TYPES = ('float32', 'float16', 'bfloat16', 'int8_float32', 'int8_float16', 'int8')
+
+
+def normalize_words(text):
+    """Split a transcription into lowercase words without punctuation."""
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Return the word-level edit distance between two texts, divided by the number of reference words."""
+    reference, hypothesis = normalize_words(reference), normalize_words(hypothesis)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, reference_word in enumerate(reference, 1):
+        current = [i]
+        for j, hypothesis_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (reference_word != hypothesis_word)))
+        previous = current
+    return previous[-1] / len(reference)
+
+
+def available_memory_mb():
+    """Return the memory available to new processes in MiB, or None if unknown."""
+    try:
+        with open('/proc/meminfo', 'r') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def resolve_device(device):
+    """Return the device models will run on, resolving 'auto'."""
+    import ctranslate2
+    if device in (None, 'auto'):
+        return 'cuda' if ctranslate2.get_cuda_device_count() > 0 else 'cpu'
+    return device
+
+
+def candidate_compute_types(local_model_options, device, requested=None):
+    """
+    Return the compute types to try: supported on the device, and small enough to fit in memory.
+    """
+    import ctranslate2
+    supported = ctranslate2.get_supported_compute_types(device)
+    compute_types = [compute_type for compute_type in (requested or COMPUTE_TYPES) if compute_type in supported]
+
+    memory = available_memory_mb()
+    if memory is None or device != 'cpu':
+        return compute_types
+    fitting = []
+    for compute_type in compute_types:
+        size = estimate_model_size_mb(model_key(dict(local_model_options, compute_type=compute_type)))
+        if size * 1.5 < memory:
+            fitting.append(compute_type)
+        else:
+            print(f'Skipping {compute_type}: the model needs about {size:.0f} MB, {memory:.0f} MB available.')
+    return fitting
+
+
+def candidate_thread_counts(requested=None):
+    """Return the CPU thread counts to try, up to the number of cores."""
+    if requested:
+        return sorted(set(requested))
+    cores = os.cpu_count() or 1
+    return sorted({max(cores // 4, 1), max(cores // 2, 1), cores})
+
+
+def run_profile(model, fixtures, profile):
+    """
+    Transcribe the fixtures with the decoding options of a profile.
+
+    :return: (list of transcriptions, total decode time in seconds)
+    """
+    decode_options = {option: profile[option] for option in PROFILE_DECODE_OPTIONS if profile.get(option) is not None}
+    transcriptions = []
+    total_time = 0.0
+    for _, audio, _ in fixtures:
+        start_time = time.perf_counter()
+        segments = transcribe_local_segments(audio, model, **decode_options)
+        total_time += time.perf_counter() - start_time
+        transcriptions.append(''.join(segment.text for segment in segments))
+    return transcriptions, total_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Folder with WAV or FLAC speech recordings')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='Maximum increase of the word error rate over the reference')
+    parser.add_argument('--profiles', nargs='+', help='Profiles to try (default: all)')
+    parser.add_argument('--compute-types', nargs='+', help='Compute types to try (default: all supported)')
+    parser.add_argument('--threads', type=int, nargs='+', help='CPU thread counts to try')
+    parser.add_argument('--dry-run', action='store_true', help='Print the results without saving the profile')
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    print_to_terminal = ConfigManager.get_config_value('misc', 'print_to_terminal')
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    sample_rate = ConfigManager.get_config_value('recording_options', 'sample_rate') or 16000
+
+    if not os.path.isdir(args.fixtures):
+        sys.exit(f'Fixtures folder not found: {args.fixtures}')
+    fixtures = load_fixtures(args.fixtures, sample_rate)
+    if not fixtures:
+        sys.exit(f'No WAV or FLAC recordings in {args.fixtures}. Record a few sentences of your own speech there, '
+                 f'or download sample recordings with python benchmarks/fetch_fixtures.py.')
+    audio_seconds = sum(audio.shape[0] for _, audio, _ in fixtures) / sample_rate
+
+    # Candidates set their own options, so the selected profile must not apply on top of them
+    saved_profile = ConfigManager.get_config_value('model_options', 'local', 'performance_profile')
+    ConfigManager.set_config_value('none', 'model_options', 'local', 'performance_profile')
+    profiles = {name: dict(options) for name, options in ConfigManager.get_config_section('performance_profiles').items()
+                if not args.profiles or name in args.profiles}
+    local_model_options = dict(ConfigManager.get_config_section('model_options')['local'])
+    device = resolve_device(local_model_options.get('device'))
+    compute_types = candidate_compute_types(local_model_options, device, args.compute_types)
+    if not compute_types:
+        sys.exit(f'None of the compute types are supported on {device} with the available memory.')
+    thread_counts = candidate_thread_counts(args.threads) if device == 'cpu' else [0]
+    print(f'Tuning {local_model_options["model"]} on {device} ({os.cpu_count()} cores) with {len(fixtures)} '
+          f'recordings, {audio_seconds:.1f} seconds of audio.')
+    print(f'Profiles: {", ".join(profiles)}. Compute types: {", ".join(compute_types)}. '
+          f'Threads: {", ".join(str(threads) for threads in thread_counts)}.\n')
+
+    results = []
+    references = [reference for _, _, reference in fixtures]
+    for compute_type in compute_types:
+        for threads in thread_counts:
+            model = create_local_model(dict(local_model_options, compute_type=compute_type), cpu_threads=threads)
+            # Decode once first, so one-time costs are not counted against the first profile
+            transcribe_local_segments(fixtures[0][1], model)
+            for name, profile in profiles.items():
+                transcriptions, decode_time = run_profile(model, fixtures, profile)
+                results.append({'profile': name, 'compute_type': compute_type, 'cpu_threads': threads,
+                                'time': decode_time, 'transcriptions': transcriptions})
+                print(f'{name:<10} {compute_type:<14} {threads:3d} threads  RTF {decode_time / audio_seconds:.3f}')
+            del model
+
+    # Without reference files, the most precise run of the accuracy profile is the reference
+    if any(reference is None for reference in references):
+        baseline = next((result for result in results if result['profile'] == 'accuracy'), results[0])
+        references = [reference if reference is not None else transcription
+                      for reference, transcription in zip(references, baseline['transcriptions'])]
+        print(f'\nReference: {baseline["profile"]} profile with {baseline["compute_type"]}.')
+
+    best_error = None
+    for result in results:
+        errors = [word_error_rate(reference, transcription)
+                  for reference, transcription in zip(references, result['transcriptions'])]
+        result['wer'] = sum(errors) / len(errors)
+        best_error = result['wer'] if best_error is None else min(best_error, result['wer'])
+    accurate = [result for result in results if result['wer'] <= best_error + args.tolerance]
+    best = min(accurate, key=lambda result: result['time'])
+
+    print('\nCandidates within the tolerance, fastest first:')
+    for result in sorted(accurate, key=lambda result: result['time']):
+        print(f'    {result["profile"]:<10} {result["compute_type"]:<14} {result["cpu_threads"]:3d} threads  '
+              f'RTF {result["time"] / audio_seconds:.3f}  WER {result["wer"]:.3f}')
+
+    ConfigManager.set_config_value(saved_profile, 'model_options', 'local', 'performance_profile')
+    ConfigManager.set_config_value(print_to_terminal, 'misc', 'print_to_terminal')
+    print(f'\nFastest accurate profile: {best["profile"]} with {best["compute_type"]} and '
+          f'{best["cpu_threads"] or "default"} CPU threads.')
+    if args.dry_run:
+        return
+
+    ConfigManager.set_config_value(best['profile'], 'model_options', 'local', 'performance_profile')
+    ConfigManager.set_config_value(best['compute_type'], 'performance_profiles', best['profile'], 'compute_type')
+    ConfigManager.set_config_value(best['cpu_threads'], 'performance_profiles', best['profile'], 'cpu_threads')
+    ConfigManager.save_config()
+    print(f'Saved to {os.path.join("src", "config.yaml")}.')
+
+
+if __name__ == '__main__':
+    main()
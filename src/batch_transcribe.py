@@ -0,0 +1,291 @@
+"""
+Transcribe folders of recorded audio files without the desktop app.
+
+Files are transcribed by a pool of worker processes, each holding its own model, using the same
+model configuration and post-processing as WhisperWriter. Results are written as each file
+finishes, files that already have results are skipped, so an interrupted run can be resumed,
+and throughput is reported in seconds of audio per second of wall time.
+
+Usage (from the root of the repository):
+    python src/batch_transcribe.py recordings/ --format srt --workers 4
+    python src/batch_transcribe.py inbox/ --output transcripts/ --watch
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import soundfile as sf
+
+from audio_processing import resample
+from transcription import (create_local_model, post_process_transcription, transcribe,
+                           transcribe_local_segments)
+from utils import ConfigManager
+
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+JSONL_FILENAME = 'transcriptions.jsonl'
+END_OF_FILES = object()
+
+_worker_model = None
+
+
+def init_worker(cpu_threads):
+    """
+    Load the configuration and, for local transcription, the model in a worker process.
+    """
+    global _worker_model
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    if not ConfigManager.get_config_value('model_options', 'use_api'):
+        _worker_model = create_local_model(cpu_threads=cpu_threads)
+
+
+def load_audio(path, sample_rate):
+    """
+    Read an audio file as mono int16 samples at the given sample rate.
+    """
+    audio, file_sample_rate = sf.read(path, dtype='float32', always_2d=True)
+    audio = resample(audio.mean(axis=1), file_sample_rate, sample_rate)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def load_fixtures(fixtures_dir, sample_rate):
+    """
+    Load the speech recordings in a folder and their reference transcriptions, if any.
+
+    A reference is a .txt file with the same name as the recording. Used by auto_tune.py and the
+    benchmarks.
+
+    :return: List of (name, audio, reference text or None) tuples, empty if the folder does not exist
+    """
+    fixtures = []
+    if not os.path.isdir(fixtures_dir):
+        return fixtures
+    for name in sorted(os.listdir(fixtures_dir)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        path = os.path.join(fixtures_dir, name)
+        reference_path = os.path.splitext(path)[0] + '.txt'
+        reference = None
+        if os.path.isfile(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as file:
+                reference = file.read()
+        fixtures.append((name, load_audio(path, sample_rate), reference))
+    return fixtures
+
+
+def transcribe_file(path, output_format):
+    """
+    Transcribe one file in a worker process.
+
+    :return: Dictionary with the file, its duration, the text and, for SRT output, the segments
+    """
+    sample_rate = ConfigManager.get_config_value('recording_options', 'sample_rate') or 16000
+    audio_data = load_audio(path, sample_rate)
+    start_time = time.perf_counter()
+
+    segments = None
+    if output_format == 'srt':
+        if ConfigManager.get_config_value('model_options', 'use_api'):
+            raise RuntimeError('SRT output requires a local model')
+        segments = [(segment.start, segment.end, segment.text.strip())
+                    for segment in transcribe_local_segments(audio_data, _worker_model)]
+        text = post_process_transcription(''.join(f' {text}' for _, _, text in segments))
+    else:
+        text = transcribe(audio_data, _worker_model)
+
+    return {
+        'file': path,
+        'duration': audio_data.shape[0] / sample_rate,
+        'transcription_time': time.perf_counter() - start_time,
+        'text': text,
+        'segments': segments,
+    }
+
+
+def format_timestamp(seconds):
+    """Format seconds as an SRT timestamp."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}'
+
+
+class ResultWriter:
+    """
+    Writes results as they arrive and remembers which files are already done.
+    """
+
+    def __init__(self, input_dir, output_dir, output_format):
+        """Initialize the writer, loading the already transcribed files for JSONL output."""
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.jsonl_path = os.path.join(output_dir, JSONL_FILENAME)
+        self.done = set()
+
+        os.makedirs(output_dir, exist_ok=True)
+        if output_format == 'jsonl' and os.path.isfile(self.jsonl_path):
+            with open(self.jsonl_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        self.done.add(json.loads(line)['file'])
+                    except (ValueError, KeyError):
+                        continue
+
+    def output_path(self, path):
+        """Return the text or SRT file a recording is transcribed to."""
+        relative_path = os.path.relpath(path, self.input_dir)
+        return os.path.join(self.output_dir, os.path.splitext(relative_path)[0] + '.' + self.output_format)
+
+    def is_done(self, path):
+        """Return True if the recording already has a result."""
+        if self.output_format == 'jsonl':
+            return os.path.relpath(path, self.input_dir) in self.done
+        return os.path.isfile(self.output_path(path))
+
+    def write(self, result):
+        """Write the result of one recording."""
+        relative_path = os.path.relpath(result['file'], self.input_dir)
+        if self.output_format == 'jsonl':
+            record = {'file': relative_path, 'duration': round(result['duration'], 3), 'text': result['text']}
+            with open(self.jsonl_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.done.add(relative_path)
+            return
+
+        if self.output_format == 'srt':
+            content = ''.join(f'{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n'
+                              for index, (start, end, text) in enumerate(result['segments'], start=1))
+        else:
+            content = result['text'].strip() + '\n'
+
+        # Write to a temporary file first, so an interrupted run never leaves a partial result
+        output_path = self.output_path(result['file'])
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(output_path + '.tmp', output_path)
+
+
+def find_audio_files(input_dir, recursive):
+    """Yield the audio files in a directory, in sorted order."""
+    if recursive:
+        for root, dirs, files in os.walk(input_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(root, name)
+    else:
+        for name in sorted(os.listdir(input_dir)):
+            path = os.path.join(input_dir, name)
+            if name.lower().endswith(AUDIO_EXTENSIONS) and os.path.isfile(path):
+                yield path
+
+
+def watch_audio_files(input_dir, recursive, interval):
+    """
+    Yield audio files forever, including new ones once their size has stopped changing.
+
+    None is yielded after every scan that found no new files, so the caller can collect results.
+    """
+    seen = set()
+    sizes = {}
+    while True:
+        found = False
+        for path in find_audio_files(input_dir, recursive):
+            if path in seen:
+                continue
+            size = os.path.getsize(path)
+            if sizes.get(path) == size:
+                seen.add(path)
+                found = True
+                yield path
+            else:
+                sizes[path] = size
+        time.sleep(interval)
+        if not found:
+            yield None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Directory containing WAV or FLAC files')
+    parser.add_argument('--output', help='Directory to write the results to (default: the input directory)')
+    parser.add_argument('--format', choices=('txt', 'jsonl', 'srt'), default='txt', help='Output format')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+    parser.add_argument('--cpu-threads', type=int, default=0,
+                        help='CPU threads per worker (default: the number of cores divided by the workers)')
+    parser.add_argument('--recursive', action='store_true', help='Include files in subdirectories')
+    parser.add_argument('--watch', action='store_true', help='Keep running and transcribe new files as they appear')
+    parser.add_argument('--watch-interval', type=float, default=2.0, help='Seconds between scans in watch mode')
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    workers = max(args.workers, 1)
+    cpu_threads = args.cpu_threads or max((os.cpu_count() or 1) // workers, 1)
+    writer = ResultWriter(args.input, args.output or args.input, args.format)
+
+    if args.watch:
+        files = watch_audio_files(args.input, args.recursive, args.watch_interval)
+    else:
+        files = find_audio_files(args.input, args.recursive)
+
+    print(f'Transcribing with {workers} workers and {cpu_threads} CPU threads per worker...')
+    start_time = time.perf_counter()
+    audio_seconds = 0.0
+    completed = failed = skipped = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cpu_threads,)) as executor:
+        pending = {}
+        files = iter(files)
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                # Keep a couple of files queued per worker, without listing the whole folder up front
+                while not exhausted and len(pending) < workers * 2:
+                    path = next(files, END_OF_FILES)
+                    if path is END_OF_FILES:
+                        exhausted = True
+                    elif path is None:
+                        break  # No new files yet in watch mode
+                    elif writer.is_done(path):
+                        skipped += 1
+                    else:
+                        pending[executor.submit(transcribe_file, path, args.format)] = path
+
+                if not pending:
+                    continue
+                done, _ = wait(pending, timeout=args.watch_interval if args.watch else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f'Error transcribing {path}: {e}', file=sys.stderr)
+                        continue
+
+                    writer.write(result)
+                    completed += 1
+                    audio_seconds += result['duration']
+                    elapsed = time.perf_counter() - start_time
+                    print(f'[{completed}] {os.path.relpath(path, args.input)}: {result["duration"]:.1f} s of audio in '
+                          f'{result["transcription_time"]:.1f} s ({audio_seconds / elapsed:.2f} audio s/s overall)')
+        except KeyboardInterrupt:
+            print('Interrupted. Run the same command again to resume.')
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start_time
+    throughput = audio_seconds / elapsed if elapsed else 0.0
+    print(f'Transcribed {completed} files ({audio_seconds:.1f} s of audio) in {elapsed:.1f} s: '
+          f'{throughput:.2f} audio seconds per wall second. Skipped {skipped} already transcribed, {failed} failed.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
 import subprocess
 import os
 import signal
+import threading
 import time
-from pynput.keyboard import Controller as PynputController
 
 from utils import ConfigManager
 
@@ -22,16 +22,26 @@ def run_command_or_exit_on_failure(command):
 class InputSimulator:
     """
     A class to simulate keyboard input using various methods.
+
+    Text is typed from the pipeline's typing thread while settings are applied on the GUI thread,
+    so typing and switching the input method are serialized by a lock.
     """
 
     def __init__(self):
         """
         Initialize the InputSimulator with the specified configuration.
         """
-        self.input_method = ConfigManager.get_config_value('post_processing', 'input_method')
         self.dotool_process = None
+        self._lock = threading.RLock()
+        self._initialize_input_method()
 
+    def _initialize_input_method(self):
+        """
+        Set up the input method selected in the post-processing options.
+        """
+        self.input_method = ConfigManager.get_config_value('post_processing', 'input_method')
         if self.input_method == 'pynput':
+            from pynput.keyboard import Controller as PynputController
             self.keyboard = PynputController()
         elif self.input_method == 'dotool':
             self._initialize_dotool()
@@ -59,12 +69,13 @@ class InputSimulator:
             text (str): The text to type.
         """
         interval = ConfigManager.get_config_value('post_processing', 'writing_key_press_delay')
-        if self.input_method == 'pynput':
-            self._typewrite_pynput(text, interval)
-        elif self.input_method == 'ydotool':
-            self._typewrite_ydotool(text, interval)
-        elif self.input_method == 'dotool':
-            self._typewrite_dotool(text, interval)
+        with self._lock:
+            if self.input_method == 'pynput':
+                self._typewrite_pynput(text, interval)
+            elif self.input_method == 'ydotool':
+                self._typewrite_ydotool(text, interval)
+            elif self.input_method == 'dotool':
+                self._typewrite_dotool(text, interval)
 
     def _typewrite_pynput(self, text, interval):
         """
@@ -110,9 +121,25 @@ class InputSimulator:
         self.dotool_process.stdin.write(f"type {text}\n")
         self.dotool_process.stdin.flush()
 
+    def apply_config_changes(self, changed_keys):
+        """
+        Switch to a new input method if it was changed in the settings.
+
+        The key press delay is read for every transcription, so it needs no action here.
+
+        Args:
+            changed_keys (set): Changed key tuples from ConfigManager.changed_keys().
+        """
+        if ('post_processing', 'input_method') in changed_keys:
+            # Waits for text that is being typed to finish
+            with self._lock:
+                self.cleanup()
+                self._initialize_input_method()
+
     def cleanup(self):
         """
         Perform cleanup operations, such as terminating the dotool process.
         """
-        if self.input_method == 'dotool':
-            self._terminate_dotool()
+        with self._lock:
+            if self.input_method == 'dotool':
+                self._terminate_dotool()
@@ -1,7 +1,10 @@
+import time
 from abc import ABC, abstractmethod
 from enum import Enum, auto
 from typing import Callable, Set
 
+from metrics import Metrics
+from startup_profile import StartupProfile
 from utils import ConfigManager
 
 
@@ -280,6 +283,7 @@ class KeyListener:
         """Initialize the KeyListener with backends and activation keys."""
         self.backends = []
         self.active_backend = None
+        self.is_listening = False
         self.key_chord = None
         self.callbacks = {
             "on_activate": [],
@@ -327,11 +331,13 @@ class KeyListener:
         """Set a specific backend as active."""
         new_backend = next((b for b in self.backends if isinstance(b, backend_class)), None)
         if new_backend:
+            was_listening = self.is_listening
             if self.active_backend:
                 self.stop()
             self.active_backend = new_backend
             self.active_backend.on_input_event = self.on_input_event
-            self.start()
+            if was_listening:
+                self.start()
         else:
             raise ValueError(f"Backend {backend_class.__name__} is not available")
 
@@ -341,15 +347,20 @@ class KeyListener:
 
     def start(self):
         """Start the active backend."""
+        if self.is_listening:
+            return
         if self.active_backend:
             self.active_backend.start()
+            self.is_listening = True
+            StartupProfile.mark('hotkey armed')
         else:
             raise RuntimeError("No active backend selected")
 
     def stop(self):
         """Stop the active backend."""
-        if self.active_backend:
+        if self.active_backend and self.is_listening:
             self.active_backend.stop()
+        self.is_listening = False
 
     def load_activation_keys(self):
         """Load activation keys from configuration."""
@@ -388,12 +399,14 @@ class KeyListener:
         if not self.key_chord or not self.active_backend:
             return
 
+        timestamp = time.perf_counter()
         key, event_type = event
 
         was_active = self.key_chord.is_active()
         is_active = self.key_chord.update(key, event_type)
 
         if not was_active and is_active:
+            Metrics.mark_hotkey(timestamp)
             self._trigger_callbacks("on_activate")
         elif was_active and not is_active:
             self._trigger_callbacks("on_deactivate")
@@ -412,6 +425,22 @@ class KeyListener:
         """Update activation keys from the current configuration."""
         self.load_activation_keys()
 
+    def apply_config_changes(self, changed_keys):
+        """
+        Apply changed settings that affect the key listener, keeping it listening if it was.
+
+        :param changed_keys: Set of changed key tuples from ConfigManager.changed_keys()
+        """
+        if ('recording_options', 'activation_key') in changed_keys:
+            self.update_activation_keys()
+        if ('recording_options', 'input_backend') in changed_keys:
+            was_listening = self.is_listening
+            self.stop()
+            self.active_backend = None
+            self.update_backend()
+            if was_listening:
+                self.start()
+
 class EvdevBackend(InputBackend):
     """
     Backend for handling input events using the evdev library.
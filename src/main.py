@@ -1,18 +1,22 @@
 import os
 import sys
 import time
-from audioplayer import AudioPlayer
-from pynput.keyboard import Controller
-from PyQt5.QtCore import QObject, QProcess
+from PyQt5.QtCore import QObject, QTimer
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QMessageBox
 
+from audio_service import AudioInputService
 from key_listener import KeyListener
+from metrics import Metrics
+from model_loader import ModelLoader
+from model_registry import ModelRegistry
+from pipeline import TranscriptionPipeline
 from result_thread import ResultThread
+from startup_profile import StartupProfile
+from transcription import ApiClient
 from ui.main_window import MainWindow
 from ui.settings_window import SettingsWindow
 from ui.status_window import StatusWindow
-from transcription import create_local_model
 from input_simulation import InputSimulator
 from utils import ConfigManager
 
@@ -25,12 +29,15 @@ class WhisperWriterApp(QObject):
         super().__init__()
         self.app = QApplication(sys.argv)
         self.app.setWindowIcon(QIcon(os.path.join('assets', 'ww-logo.png')))
+        StartupProfile.mark('Qt initialized')
 
         ConfigManager.initialize()
 
+        self.components_initialized = False
         self.settings_window = SettingsWindow()
         self.settings_window.settings_closed.connect(self.on_settings_closed)
-        self.settings_window.settings_saved.connect(self.restart_app)
+        self.settings_window.settings_saved.connect(self.apply_settings)
+        StartupProfile.mark('settings window created')
 
         if ConfigManager.config_file_exists():
             self.initialize_components()
@@ -42,28 +49,108 @@ class WhisperWriterApp(QObject):
         """
         Initialize the components of the application.
         """
+        # Load the model in the background while the audio device and key listener are set up
+        self.model_loader = None
+        self.model_registry = ModelRegistry()
+        self.retired_model_loaders = []
+        self.pipeline = None
+        # Created later; create_status_window() then connects the loader's progress
+        self.status_window = None
+        self.start_model_loader()
+        # Startup is done once the main window is up and the model has loaded; the key listener is
+        # only armed when the user clicks Start, which would add their reaction time to the timeline
+        StartupProfile.expect('main window shown', *(['model loader finished'] if self.model_loader else []))
+
         self.input_simulator = InputSimulator()
 
+        metrics_port = ConfigManager.get_config_value('misc', 'metrics_port')
+        if metrics_port:
+            Metrics.start_server(metrics_port)
+
         self.key_listener = KeyListener()
         self.key_listener.add_callback("on_activate", self.on_activation)
         self.key_listener.add_callback("on_deactivate", self.on_deactivation)
+        StartupProfile.mark('key listener created')
 
-        model_options = ConfigManager.get_config_section('model_options')
-        model_path = model_options.get('local', {}).get('model_path')
-        self.local_model = create_local_model() if not model_options.get('use_api') else None
+        self.audio_service = AudioInputService()
+        if ConfigManager.get_config_value('recording_options', 'keep_stream_open'):
+            self.audio_service.start()
+            StartupProfile.mark('audio stream opened')
 
         self.result_thread = None
 
+        max_queue_size = ConfigManager.get_config_value('recording_options', 'max_queued_recordings') or 3
+        self.pipeline = TranscriptionPipeline(self.type_result, max_queue_size=max_queue_size, model_loader=self.model_loader)
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.timeout.connect(self.unload_idle_model)
+        self.idle_timer.start(30000)
+
         self.main_window = MainWindow()
         self.main_window.openSettings.connect(self.settings_window.show)
-        self.main_window.startListening.connect(self.key_listener.start)
+        self.main_window.startListening.connect(self.start_listening)
         self.main_window.closeApp.connect(self.exit_app)
 
-        if not ConfigManager.get_config_value('misc', 'hide_status_window'):
-            self.status_window = StatusWindow()
+        self.create_status_window()
 
         self.create_tray_icon()
         self.main_window.show()
+        StartupProfile.mark('main window shown')
+        self.components_initialized = True
+
+    def start_listening(self):
+        """
+        Start listening for the activation key when Start is clicked in the main window.
+        """
+        StartupProfile.mark('start clicked')
+        self.key_listener.start()
+        hotkey_armed_ms = StartupProfile.elapsed_ms('start clicked', 'hotkey armed')
+        if StartupProfile.enabled and hotkey_armed_ms is not None:
+            print(f'Activation key armed {hotkey_armed_ms:.1f} ms after Start was clicked.')
+
+    def create_status_window(self):
+        """
+        Create the status window, unless it is hidden in the settings or already exists.
+        """
+        if self.status_window or ConfigManager.get_config_value('misc', 'hide_status_window'):
+            return
+        self.status_window = StatusWindow()
+        self.pipeline.queueSignal.connect(self.status_window.updateQueueDepth)
+        self.pipeline.drainedSignal.connect(self.on_pipeline_drained)
+        if self.model_loader:
+            self.connect_model_progress(self.model_loader)
+
+    def connect_model_progress(self, model_loader):
+        """
+        Show the loading steps of the model loader in the status window.
+        """
+        model_loader.progressSignal.connect(self.status_window.updateLoadingProgress)
+        if model_loader.progress:
+            self.status_window.updateLoadingProgress(model_loader.progress)
+
+    def start_model_loader(self):
+        """
+        Start loading the local model in the background, or drop it if the API is used without a local fallback.
+        """
+        if self.model_loader and self.model_loader.isRunning():
+            # Let an outdated load finish on its own, without publishing its model
+            self.model_loader.readySignal.disconnect(self.on_model_ready)
+            self.model_loader.failedSignal.disconnect(self.on_model_failed)
+            if self.status_window:
+                self.model_loader.progressSignal.disconnect(self.status_window.updateLoadingProgress)
+            self.retired_model_loaders.append(self.model_loader)
+
+        self.model_loader = None
+        if ModelLoader.is_needed():
+            self.model_loader = ModelLoader(self.model_registry)
+            self.model_loader.readySignal.connect(self.on_model_ready)
+            self.model_loader.failedSignal.connect(self.on_model_failed)
+            if self.status_window:
+                self.connect_model_progress(self.model_loader)
+            self.model_loader.start()
+
+        if self.pipeline:
+            self.pipeline.model_loader = self.model_loader
 
     def create_tray_icon(self):
         """
@@ -93,6 +180,15 @@ class WhisperWriterApp(QObject):
             self.key_listener.stop()
         if self.input_simulator:
             self.input_simulator.cleanup()
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.audio_service:
+            self.audio_service.stop()
+        Metrics.stop_server()
+        ApiClient.close()
+        for model_loader in [self.model_loader] + self.retired_model_loaders:
+            if model_loader and model_loader.isRunning():
+                model_loader.wait()
 
     def exit_app(self):
         """
@@ -101,11 +197,47 @@ class WhisperWriterApp(QObject):
         self.cleanup()
         QApplication.quit()
 
-    def restart_app(self):
-        """Restart the application to apply the new settings."""
-        self.cleanup()
-        QApplication.quit()
-        QProcess.startDetached(sys.executable, sys.argv)
+    def apply_settings(self, changed_keys):
+        """
+        Apply saved settings in place. Each component only acts on the settings it uses.
+
+        :param changed_keys: Set of changed key tuples from ConfigManager.changed_keys()
+        """
+        if not self.components_initialized:
+            self.initialize_components()
+            return
+        if not changed_keys:
+            return
+        ConfigManager.console_print(f'Applying changed settings: {", ".join(".".join(keys) for keys in sorted(changed_keys))}')
+
+        reload_model = (ModelLoader.needs_reload(changed_keys)
+                        or ('model_options', 'use_api') in changed_keys
+                        or ('model_options', 'api', 'fallback') in changed_keys
+                        or ('model_options', 'api', 'race') in changed_keys)
+        if reload_model or ConfigManager.has_changed(changed_keys, 'recording_options'):
+            # Recording sessions read these settings when they start
+            self.stop_result_thread()
+
+        self.key_listener.apply_config_changes(changed_keys)
+        self.input_simulator.apply_config_changes(changed_keys)
+        self.audio_service.apply_config_changes(changed_keys)
+        if ('recording_options', 'keep_stream_open') in changed_keys:
+            if ConfigManager.get_config_value('recording_options', 'keep_stream_open'):
+                self.audio_service.start()
+            elif not (self.result_thread and self.result_thread.isRunning()):
+                self.audio_service.stop()
+        self.pipeline.apply_config_changes(changed_keys)
+
+        if reload_model:
+            self.start_model_loader()
+
+        if ('misc', 'metrics_port') in changed_keys:
+            Metrics.stop_server()
+            metrics_port = ConfigManager.get_config_value('misc', 'metrics_port')
+            if metrics_port:
+                Metrics.start_server(metrics_port)
+        if ('misc', 'hide_status_window') in changed_keys:
+            self.create_status_window()
 
     def on_settings_closed(self):
         """
@@ -119,6 +251,42 @@ class WhisperWriterApp(QObject):
             )
             self.initialize_components()
 
+    def on_model_ready(self, model):
+        """
+        Called when the local model has finished loading in the background.
+
+        The model is not kept here: components take it from the model loader, so it can be freed.
+        """
+        ConfigManager.console_print(Metrics.memory_summary())
+        self.retired_model_loaders = [loader for loader in self.retired_model_loaders if loader.isRunning()]
+
+    def on_pipeline_drained(self):
+        """
+        Close the status window once the pipeline has typed every utterance, if recording has stopped.
+        """
+        if self.status_window and not (self.result_thread and self.result_thread.is_running):
+            self.status_window.updateStatus('idle')
+
+    def unload_idle_model(self):
+        """
+        Unload the local model if it has not been used for longer than the configured idle period.
+        """
+        unload_after = ConfigManager.get_config_value('model_options', 'local', 'unload_after') or 0
+        if unload_after <= 0 or not self.model_loader:
+            return
+        idle_time = self.model_loader.idle_time()
+        if idle_time < unload_after or (self.result_thread and self.result_thread.isRunning()) or self.pipeline.pending():
+            return
+        if self.model_loader.unload():
+            ConfigManager.console_print(f'Model unloaded after {idle_time:.0f} seconds idle. {Metrics.memory_summary()}')
+
+    def on_model_failed(self, error):
+        """
+        Called when the local model could not be loaded.
+        """
+        QMessageBox.critical(self.main_window, 'Model Failed to Load',
+                             f'The local model could not be loaded:\n\n{error}\n\nCheck the model options in the settings.')
+
     def on_activation(self):
         """
         Called when the activation key combination is pressed.
@@ -148,9 +316,19 @@ class WhisperWriterApp(QObject):
         if self.result_thread and self.result_thread.isRunning():
             return
 
-        self.result_thread = ResultThread(self.local_model)
+        # Reload an unloaded model while the user speaks; the recording waits for it if needed
+        if self.model_loader:
+            self.model_loader.reload()
+
+        pipeline = None
+        if ConfigManager.get_config_value('recording_options', 'recording_mode') == 'continuous':
+            self.pipeline.start()
+            pipeline = self.pipeline
+
+        self.result_thread = ResultThread(audio_service=self.audio_service, pipeline=pipeline, model_loader=self.model_loader)
         if not ConfigManager.get_config_value('misc', 'hide_status_window'):
             self.result_thread.statusSignal.connect(self.status_window.updateStatus)
+            self.result_thread.partialSignal.connect(self.status_window.updatePartialText)
             self.status_window.closeSignal.connect(self.stop_result_thread)
         self.result_thread.resultSignal.connect(self.on_transcription_complete)
         self.result_thread.start()
@@ -162,15 +340,29 @@ class WhisperWriterApp(QObject):
         if self.result_thread and self.result_thread.isRunning():
             self.result_thread.stop()
 
-    def on_transcription_complete(self, result):
+    def type_result(self, result, timeline=None):
         """
-        When the transcription is complete, type the result and start listening for the activation key again.
+        Type the transcription and play the completion noise if enabled.
+
+        :param timeline: UtteranceTimeline of the recording, recorded in the metrics once typed
         """
+        if timeline:
+            timeline.mark('first_char')
         self.input_simulator.typewrite(result)
+        if timeline:
+            timeline.mark('last_char')
+            Metrics.record(timeline)
 
         if ConfigManager.get_config_value('misc', 'noise_on_completion'):
+            from audioplayer import AudioPlayer
             AudioPlayer(os.path.join('assets', 'beep.wav')).play(block=True)
 
+    def on_transcription_complete(self, result):
+        """
+        When the transcription is complete, type the result and start listening for the activation key again.
+        """
+        self.type_result(result, self.result_thread.timeline)
+
         if ConfigManager.get_config_value('recording_options', 'recording_mode') == 'continuous':
             self.start_result_thread()
         else:
@@ -0,0 +1,282 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from audio_processing import SpeechGate
+from utils import ConfigManager
+
+
+# Each stage is the time between two marks on an utterance timeline
+STAGES = (
+    ('activation', 'hotkey', 'stream_start'),
+    ('speech_onset', 'stream_start', 'first_speech'),
+    ('recording', 'stream_start', 'endpoint'),
+    ('queue', 'endpoint', 'decode_start'),
+    ('decode', 'decode_start', 'decode_end'),
+    ('typing_delay', 'decode_end', 'first_char'),
+    ('typing', 'first_char', 'last_char'),
+    ('endpoint_to_text', 'endpoint', 'last_char'),
+    ('end_to_end', 'hotkey', 'last_char'),
+)
+
+# Upper bounds in seconds of the histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds, in the format used by Prometheus.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize an empty histogram with the given bucket upper bounds."""
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Add a value to the histogram."""
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+
+
+class UtteranceTimeline:
+    """
+    Monotonic timestamps of the events in the life of one utterance.
+
+    Events are recorded with mark() and only the first mark of each event is kept, so a mark
+    can be placed in a loop without moving the timestamp.
+    """
+
+    def __init__(self):
+        """Initialize an empty timeline."""
+        self.wall_time = time.time()
+        self.marks = {}
+
+    def mark(self, event, timestamp=None):
+        """
+        Record the time of an event.
+
+        :param event: Name of the event, e.g. 'first_speech'
+        :param timestamp: time.perf_counter() value, or None for now
+        """
+        self.marks.setdefault(event, timestamp if timestamp is not None else time.perf_counter())
+
+    def duration(self, stage):
+        """Return the duration of a stage in seconds, or None if either of its marks is missing."""
+        for name, start, end in STAGES:
+            if name == stage and start in self.marks and end in self.marks:
+                return self.marks[end] - self.marks[start]
+        return None
+
+    def durations(self):
+        """Return the durations of all stages that have both of their marks."""
+        return {name: self.marks[end] - self.marks[start]
+                for name, start, end in STAGES if start in self.marks and end in self.marks}
+
+    def to_dict(self):
+        """Return the timeline with marks in milliseconds since the first mark."""
+        origin = min(self.marks.values()) if self.marks else 0.0
+        return {
+            'time': round(self.wall_time, 3),
+            'marks_ms': {event: round((timestamp - origin) * 1000, 1)
+                         for event, timestamp in sorted(self.marks.items(), key=lambda item: item[1])},
+            'stages_ms': {name: round(value * 1000, 1) for name, value in self.durations().items()},
+        }
+
+
+def process_memory():
+    """
+    Return the current and peak resident memory of this process in bytes.
+
+    :return: (current, peak); either is None where the platform does not report it
+    """
+    current = peak = None
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            current = int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    return current, peak
+
+
+class Metrics:
+    """
+    In-process registry of per-stage latency histograms.
+
+    Finished utterance timelines are added to one histogram per stage, optionally appended to a
+    JSONL file, and can be served in the Prometheus text format on a local HTTP endpoint. The
+    registry is shared by all threads.
+    """
+
+    _lock = threading.Lock()
+    _histograms = {}
+    _memory = {}
+    _last_hotkey = None
+    _server = None
+
+    @classmethod
+    def mark_hotkey(cls, timestamp=None):
+        """Remember when the activation key was pressed, for the next timeline."""
+        cls._last_hotkey = timestamp if timestamp is not None else time.perf_counter()
+
+    @classmethod
+    def new_timeline(cls, after_activation=True):
+        """
+        Start the timeline of a new utterance.
+
+        :param after_activation: True if the utterance started with the activation key press
+        """
+        timeline = UtteranceTimeline()
+        # Each key press belongs to one utterance, so a restarted recording does not reuse it
+        hotkey, cls._last_hotkey = cls._last_hotkey, None
+        if after_activation and hotkey is not None:
+            timeline.mark('hotkey', hotkey)
+        return timeline
+
+    @classmethod
+    def observe(cls, stage, value):
+        """Add a duration in seconds to the histogram of a stage."""
+        with cls._lock:
+            if stage not in cls._histograms:
+                cls._histograms[stage] = Histogram()
+            cls._histograms[stage].observe(value)
+
+    @classmethod
+    def record(cls, timeline):
+        """Add a finished timeline to the histograms and append it to the metrics file if enabled."""
+        for stage, value in timeline.durations().items():
+            cls.observe(stage, value)
+
+        metrics_file = ConfigManager.get_config_value('misc', 'metrics_file')
+        if metrics_file:
+            with cls._lock:
+                with open(metrics_file, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(timeline.to_dict()) + '\n')
+
+    @classmethod
+    def observe_memory(cls, component, nbytes):
+        """
+        Record the current memory used by a component, keeping track of its peak.
+
+        :param component: Name of the component, e.g. 'models'
+        :param nbytes: Memory currently used by the component in bytes
+        """
+        with cls._lock:
+            _, peak = cls._memory.get(component, (0, 0))
+            cls._memory[component] = (nbytes, max(peak, nbytes))
+
+    @classmethod
+    def memory_usage(cls):
+        """
+        Return the current and peak memory of each component in bytes, including the whole process.
+
+        :return: Dictionary of component name to (current, peak)
+        """
+        current, peak = process_memory()
+        with cls._lock:
+            if current is not None or peak is not None:
+                _, known_peak = cls._memory.get('process', (0, 0))
+                cls._memory['process'] = (current or 0, max(known_peak, peak or 0, current or 0))
+            return dict(cls._memory)
+
+    @classmethod
+    def memory_summary(cls):
+        """Return a one-line summary of the current and peak memory of each component."""
+        return 'Memory: ' + ', '.join(f'{component} {current / 1048576:.0f} MB (peak {peak / 1048576:.0f} MB)'
+                                      for component, (current, peak) in sorted(cls.memory_usage().items()))
+
+    @classmethod
+    def snapshot(cls):
+        """Return the count and sum of every histogram."""
+        with cls._lock:
+            return {stage: {'count': histogram.count, 'sum': histogram.sum}
+                    for stage, histogram in cls._histograms.items()}
+
+    @classmethod
+    def prometheus_text(cls):
+        """Return the histograms and speech gate counters in the Prometheus text format."""
+        lines = [
+            '# HELP whisperwriter_stage_seconds Time spent in each stage of an utterance.',
+            '# TYPE whisperwriter_stage_seconds histogram',
+        ]
+        with cls._lock:
+            for stage, histogram in sorted(cls._histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    lines.append(f'whisperwriter_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'whisperwriter_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'whisperwriter_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'whisperwriter_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        memory = cls.memory_usage()
+        for name, index, description in (('memory_bytes', 0, 'Memory currently used by each component.'),
+                                         ('memory_peak_bytes', 1, 'Peak memory used by each component.')):
+            lines.append(f'# HELP whisperwriter_{name} {description}')
+            lines.append(f'# TYPE whisperwriter_{name} gauge')
+            for component, values in sorted(memory.items()):
+                lines.append(f'whisperwriter_{name}{{component="{component}"}} {values[index]}')
+
+        for name, value, description in (
+            ('recordings_checked', SpeechGate.recordings_checked, 'Recordings checked for speech.'),
+            ('recordings_skipped', SpeechGate.recordings_skipped, 'Recordings skipped without decoding.'),
+            ('segments_filtered', SpeechGate.segments_filtered, 'Segments filtered after decoding.'),
+        ):
+            lines.append(f'# HELP whisperwriter_{name}_total {description}')
+            lines.append(f'# TYPE whisperwriter_{name}_total counter')
+            lines.append(f'whisperwriter_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def start_server(cls, port):
+        """Serve the metrics in the Prometheus text format on localhost, on a background thread."""
+        if cls._server is not None:
+            return
+        # Imported here, as http.server is slow to import and the server is disabled by default
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            """Answers GET /metrics with the registry in the Prometheus text format."""
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = cls.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                """Keep requests out of the terminal."""
+                pass
+
+        try:
+            cls._server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        except OSError as e:
+            ConfigManager.console_print(f'Could not start the metrics server on port {port}: {e}')
+            return
+        threading.Thread(target=cls._server.serve_forever, name='MetricsServer', daemon=True).start()
+        ConfigManager.console_print(f'Serving metrics on http://127.0.0.1:{port}/metrics')
+
+    @classmethod
+    def stop_server(cls):
+        """Stop the metrics server if it is running."""
+        if cls._server is not None:
+            cls._server.shutdown()
+            cls._server.server_close()
+            cls._server = None
@@ -0,0 +1,280 @@
+import gc
+import threading
+import time
+import traceback
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from metrics import Metrics
+from model_registry import ModelRegistry, estimate_model_size_mb, model_key
+from startup_profile import StartupProfile
+from transcription import PROFILE_MODEL_OPTIONS, get_local_model_options
+from utils import ConfigManager
+
+
+class ModelLoader(QThread):
+    """
+    A thread class for loading the local model in the background.
+
+    The application starts listening for the activation key while the model loads, so a
+    recording can start right away; threads that need the model wait for it with
+    wait_for_model() before transcribing.
+
+    After loading, the model decodes a short synthetic clip so that one-time costs such as
+    kernel selection and page faults on the weights are not paid by the first real
+    transcription. If the model has been idle for a while, rewarm_if_idle() repeats this in the
+    background when a new recording starts.
+
+    Models come from a ModelRegistry, so a model that is still resident, e.g. after switching
+    back to it in the settings, is ready instantly. If a long-form model is configured, it is
+    used for recordings longer than the long-form threshold, and loaded in the background as
+    soon as a recording is known to be that long. The loader does not hold the models itself, so
+    a model the registry evicts to stay within the memory budget is freed, and loaded again on
+    its next use.
+
+    Signals:
+        progressSignal: Emits a description of the current loading step
+        readySignal: Emits the loaded model
+        failedSignal: Emits the error message if the model could not be loaded
+    """
+
+    progressSignal = pyqtSignal(str)
+    readySignal = pyqtSignal(object)
+    failedSignal = pyqtSignal(str)
+
+    # Local model options that are only read when the model is created
+    LOAD_OPTIONS = ('model', 'device', 'compute_type', 'model_path')
+
+    def __init__(self, registry=None, **model_kwargs):
+        """
+        Initialize the loader.
+
+        :param registry: ModelRegistry to take the models from, or None for a new registry
+        :param model_kwargs: Keyword arguments passed on to create_local_model()
+        """
+        super().__init__()
+        self.registry = registry or ModelRegistry()
+        self.model_kwargs = model_kwargs
+        self.error = None
+        self.progress = None
+        self._loaded = False
+        self.load_time = None
+        self.warm_up_time = None
+        self.last_used = time.monotonic()
+        self._finished = threading.Event()
+        self._warm_up_lock = threading.Lock()
+        self._reloading = False
+
+    def _report_progress(self, text):
+        """Keep the current loading step, for windows created after it started, and emit it."""
+        self.progress = text
+        self.progressSignal.emit(text)
+
+    def run(self):
+        """Load the model and emit the result."""
+        try:
+            self._report_progress('Loading model...')
+            was_resident = self.registry.is_resident(get_local_model_options())
+            start_time = time.perf_counter()
+            model = self.registry.get(**self.model_kwargs)
+            self.load_time = time.perf_counter() - start_time
+            StartupProfile.mark('model loaded')
+            ConfigManager.console_print(f'Model loaded in {self.load_time:.2f} seconds.')
+            # A reload overlaps with a recording that is waiting for it, so it skips the warm-up
+            if (not was_resident and not self._reloading
+                    and ConfigManager.get_config_value('model_options', 'local', 'warm_up')):
+                self._report_progress('Warming up model...')
+                try:
+                    self.warm_up(model)
+                    StartupProfile.mark('model warmed up')
+                except Exception:
+                    traceback.print_exc()
+            # Only publish the model once it is warm, so recordings wait for it instead of racing the warm-up
+            self._loaded = True
+            self.last_used = time.monotonic()
+            self._report_progress('Model ready.')
+        except Exception as e:
+            traceback.print_exc()
+            self.error = str(e)
+        finally:
+            self._finished.set()
+            StartupProfile.mark('model loader finished')
+
+        if self._loaded:
+            self.readySignal.emit(model)
+            model = None
+            self._prefetch_long_form_model()
+        else:
+            self.failedSignal.emit(self.error or 'Unknown error')
+
+    @property
+    def model(self):
+        """The main model if it has been loaded and is resident, otherwise None."""
+        return self.registry.peek() if self._loaded else None
+
+    def unload(self):
+        """
+        Drop the loaded models to free their memory until reload() is called.
+
+        :return: True if the models were unloaded
+        """
+        if self.isRunning() or not self._loaded:
+            return False
+        self._finished.clear()
+        self._loaded = False
+        self.registry.clear()
+        gc.collect()
+        return True
+
+    def reload(self):
+        """Load the model again in the background after unload()."""
+        if self.isRunning() or self._loaded:
+            return
+        self.error = None
+        self._finished.clear()
+        self._reloading = True
+        self.start()
+
+    def idle_time(self):
+        """Return the number of seconds since the model was last used."""
+        return time.monotonic() - self.last_used
+
+    def long_form_options(self):
+        """Return the options of the long-form model, or None if it is not configured."""
+        local_model_options = get_local_model_options()
+        long_form_model = local_model_options.get('long_form_model')
+        if not long_form_model or (long_form_model == local_model_options['model']
+                                   and not local_model_options.get('model_path')):
+            return None
+        return dict(local_model_options, model=long_form_model, model_path=None)
+
+    def model_for_duration(self, duration):
+        """
+        Return the model to transcribe a recording of the given length with.
+
+        Recordings longer than the long-form threshold use the long-form model. All others use
+        the main model. Either is loaded again if it was evicted to stay within the memory budget.
+
+        :param duration: Length of the recording in seconds
+        :return: The model, or None if the main model has not been loaded
+        """
+        if not self._loaded:
+            return None
+        long_form_options = self.long_form_options()
+        threshold = ConfigManager.get_config_value('model_options', 'local', 'long_form_threshold') or 0
+        if long_form_options is not None and duration >= threshold:
+            try:
+                return self.registry.get(long_form_options, **self.model_kwargs)
+            except Exception as e:
+                ConfigManager.console_print(f'Error loading the long-form model, using the main model: {e}')
+        return self.registry.get(**self.model_kwargs)
+
+    def prepare_for_duration(self, duration):
+        """
+        Start loading the model for a recording of at least the given length, if it is not resident.
+
+        Called while recording, once the recording is known to be long enough for the long-form
+        model, so the model loads while the user is still speaking instead of after the recording.
+
+        :param duration: Length in seconds the recording will at least have
+        """
+        long_form_options = self.long_form_options()
+        threshold = ConfigManager.get_config_value('model_options', 'local', 'long_form_threshold') or 0
+        if (not self._loaded or long_form_options is None or duration < threshold
+                or self.registry.is_resident(long_form_options)):
+            return
+        ConfigManager.console_print('Long recording. Loading the long-form model in the background...')
+        threading.Thread(target=self.model_for_duration, args=(duration,), name='LongFormModelLoader',
+                         daemon=True).start()
+
+    def _prefetch_long_form_model(self):
+        """Load the long-form model in advance if it fits in the memory budget next to the main model."""
+        long_form_options = self.long_form_options()
+        budget = ConfigManager.get_config_value('model_options', 'local', 'model_memory_budget') or 0
+        if long_form_options is None or budget <= 0 or self.registry.is_resident(long_form_options):
+            return
+        if self.registry.resident_size_mb() + estimate_model_size_mb(model_key(long_form_options)) > budget:
+            return
+        try:
+            self._report_progress('Loading long-form model...')
+            self.warm_up(self.registry.get(long_form_options, **self.model_kwargs))
+        except Exception:
+            traceback.print_exc()
+
+    def warm_up(self, model=None):
+        """
+        Decode a short synthetic clip with the model and record how long it took.
+
+        :param model: The model to warm up, or None for the loaded model
+        :return: The warm-up time in seconds
+        """
+        model = model or self.model
+        if model is None:
+            return None
+        # A second of quiet noise with a tone; the encoder always runs on a full 30 second window
+        sample_rate = 16000
+        t = np.arange(sample_rate) / sample_rate
+        rng = np.random.default_rng(0)
+        clip = (0.05 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, 0.005, sample_rate)).astype(np.float32)
+        language = ConfigManager.get_config_value('model_options', 'common', 'language') or 'en'
+
+        with self._warm_up_lock:
+            start_time = time.perf_counter()
+            segments, _ = model.transcribe(clip, language=language, vad_filter=False,
+                                           condition_on_previous_text=False)
+            list(segments)
+            self.warm_up_time = time.perf_counter() - start_time
+
+        Metrics.observe('warm_up', self.warm_up_time)
+        ConfigManager.console_print(f'Model warmed up in {self.warm_up_time:.2f} seconds.')
+        return self.warm_up_time
+
+    def rewarm_if_idle(self):
+        """
+        Warm the model up again in the background if it has not been used for a while.
+
+        Called when a recording starts, so the warm-up runs while the user is speaking.
+        """
+        now = time.monotonic()
+        idle_time, self.last_used = now - self.last_used, now
+        rewarm_after = ConfigManager.get_config_value('model_options', 'local', 'rewarm_after') or 0
+        if (self.model is None or rewarm_after <= 0 or idle_time < rewarm_after
+                or self._warm_up_lock.locked()):
+            return
+        ConfigManager.console_print(f'Model idle for {idle_time:.0f} seconds. Warming up again...')
+        threading.Thread(target=self.warm_up, name='ModelWarmUp', daemon=True).start()
+
+    @staticmethod
+    def is_needed():
+        """Return True if a local model is used, to transcribe, as a fallback for the API or to race it."""
+        model_options = ConfigManager.get_config_section('model_options')
+        return (not model_options.get('use_api') or model_options['api'].get('fallback') == 'local'
+                or bool(model_options['api'].get('race')))
+
+    @classmethod
+    def needs_reload(cls, changed_keys):
+        """
+        Return True if changed settings require the local model to be created again.
+
+        :param changed_keys: Set of changed key tuples from ConfigManager.changed_keys()
+        """
+        profile = ConfigManager.get_config_value('model_options', 'local', 'performance_profile')
+        return (any(('model_options', 'local', option) in changed_keys
+                    for option in cls.LOAD_OPTIONS + ('performance_profile',))
+                or any(('performance_profiles', profile, option) in changed_keys for option in PROFILE_MODEL_OPTIONS))
+
+    def is_ready(self):
+        """Return True if the model has been loaded."""
+        return self._loaded
+
+    def wait_for_model(self, timeout=None):
+        """
+        Block until loading has finished.
+
+        If the main model has been evicted since, it is loaded again.
+
+        :param timeout: Maximum number of seconds to wait, or None to wait until loading finishes
+        :return: The model, or None if loading failed or the timeout expired
+        """
+        self._finished.wait(timeout)
+        return self.registry.get(**self.model_kwargs) if self._loaded else None
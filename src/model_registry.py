@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Metrics
+from transcription import create_local_model, get_local_model_options
+from utils import ConfigManager
+
+
+# Approximate number of parameters in millions, to estimate the memory used by each model
+MODEL_PARAMETERS = {
+    'tiny': 39,
+    'base': 74,
+    'small': 244,
+    'medium': 769,
+    'large': 1550,
+    'distil-small': 166,
+    'distil-medium': 394,
+    'distil-large': 756,
+}
+
+# Bytes per parameter for each compute type; models are converted to float16
+BYTES_PER_PARAMETER = {
+    'int8': 1,
+    'int8_float16': 1,
+    'int8_float32': 1,
+    'int8_bfloat16': 1,
+    'int16': 2,
+    'float16': 2,
+    'bfloat16': 2,
+    'default': 2,
+    'float32': 4,
+}
+
+
+def model_key(local_model_options):
+    """
+    Return the key identifying a model in the registry.
+
+    :param local_model_options: Dictionary with the model, model_path, device and compute_type, and
+                                optionally the cpu_threads and num_workers
+    :return: (model name or path, device, compute type, CPU threads, workers)
+    """
+    compute_type = local_model_options.get('compute_type') or 'default'
+    # create_local_model() always runs int8 models on the CPU
+    device = 'cpu' if compute_type == 'int8' else local_model_options.get('device') or 'auto'
+    return (local_model_options.get('model_path') or local_model_options['model'], device, compute_type,
+            local_model_options.get('cpu_threads') or 0, local_model_options.get('num_workers') or 1)
+
+
+def estimate_model_size_mb(key):
+    """Estimate the memory used by a model in MiB from its size on disk or its number of parameters."""
+    model, compute_type = key[0], key[2]
+    bytes_per_parameter = BYTES_PER_PARAMETER.get(compute_type, 2)
+
+    model_file = os.path.join(model, 'model.bin')
+    if os.path.isfile(model_file):
+        return os.path.getsize(model_file) / 2 * bytes_per_parameter / 1024 / 1024
+
+    name = model.split('/')[-1].replace('faster-', '').replace('whisper-', '').split('.')[0]
+    parameters = MODEL_PARAMETERS.get(name) or MODEL_PARAMETERS.get(name.rsplit('-', 1)[0], 0)
+    return parameters * 1e6 * bytes_per_parameter / 1024 / 1024
+
+
+class ModelRegistry:
+    """
+    Keeps loaded local models resident, so switching between them does not reload the weights.
+
+    Models are identified by their name or path, device and compute type. When a model is
+    loaded, the least recently used models are evicted until the estimated memory of the
+    resident models fits in the memory budget from model_options.local.model_memory_budget;
+    a budget of 0 keeps only one model. The registry counts hits, loads and evictions.
+
+    The registry holds the only lasting reference to each model; other components get the model
+    from it for each use, so an evicted model is freed and loaded again when it is next needed.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, local_model_options=None, **model_kwargs):
+        """
+        Return a model, loading it if it is not resident.
+
+        :param local_model_options: Options of the model, or None for the options from get_local_model_options()
+        :param model_kwargs: Keyword arguments passed on to create_local_model() when loading
+        :return: The model
+        """
+        if local_model_options is None:
+            local_model_options = get_local_model_options()
+        key = model_key(local_model_options)
+
+        model = self._get_resident(key)
+        if model is not None:
+            return model
+
+        # Load one model at a time, so two threads asking for the same model only load it once
+        with self._load_lock:
+            model = self._get_resident(key)
+            if model is not None:
+                return model
+
+            start_time = time.perf_counter()
+            model = create_local_model(local_model_options, **model_kwargs)
+            Metrics.observe('model_load', time.perf_counter() - start_time)
+            with self._lock:
+                self._models[key] = model
+                self._sizes[key] = estimate_model_size_mb(key)
+                self.loads += 1
+                self._evict()
+                self._observe_memory()
+        ConfigManager.console_print(self.summary())
+        return model
+
+    def peek(self, local_model_options=None):
+        """Return a resident model without loading it or counting a hit, or None if it is not resident."""
+        if local_model_options is None:
+            local_model_options = get_local_model_options()
+        with self._lock:
+            return self._models.get(model_key(local_model_options))
+
+    def is_resident(self, local_model_options):
+        """Return True if the model with these options is loaded."""
+        with self._lock:
+            return model_key(local_model_options) in self._models
+
+    def remove(self, local_model_options=None):
+        """Drop a model from the registry, e.g. to free its memory while the app is idle."""
+        if local_model_options is None:
+            local_model_options = get_local_model_options()
+        key = model_key(local_model_options)
+        with self._lock:
+            if self._models.pop(key, None) is not None:
+                self._sizes.pop(key, None)
+                self.evictions += 1
+                self._observe_memory()
+
+    def clear(self):
+        """Drop every model from the registry."""
+        with self._lock:
+            self.evictions += len(self._models)
+            self._models.clear()
+            self._sizes.clear()
+            self._observe_memory()
+
+    def resident_size_mb(self):
+        """Return the estimated memory used by the resident models in MiB."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def stats(self):
+        """Return the resident models with their estimated sizes, and the counters."""
+        with self._lock:
+            return {
+                'resident': [{'model': key[0], 'device': key[1], 'compute_type': key[2],
+                              'size_mb': round(self._sizes[key])} for key in self._models],
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+    def summary(self):
+        """Return a one-line summary of the resident models and the counters."""
+        stats = self.stats()
+        resident = ', '.join(f'{model["model"]} ({model["device"]}, {model["compute_type"]}, ~{model["size_mb"]} MB)'
+                             for model in stats['resident']) or 'none'
+        return (f'Resident models: {resident}. {stats["loads"]} loads, {stats["evictions"]} evictions, '
+                f'{stats["hits"]} hits.')
+
+    def _get_resident(self, key):
+        """Return a resident model and mark it as the most recently used, or None."""
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+            return model
+
+    def _observe_memory(self):
+        """Report the estimated memory of the resident models to the metrics registry."""
+        Metrics.observe_memory('models', int(sum(self._sizes.values()) * 1024 * 1024))
+
+    def _evict(self):
+        """Evict the least recently used models until the rest fit in the memory budget."""
+        budget = ConfigManager.get_config_value('model_options', 'local', 'model_memory_budget') or 0
+        while len(self._models) > 1 and (budget <= 0 or sum(self._sizes.values()) > budget):
+            key, _ = self._models.popitem(last=False)
+            self._sizes.pop(key, None)
+            self.evictions += 1
+            ConfigManager.console_print(f'Evicted model {key[0]} ({key[1]}, {key[2]}) to stay within the memory budget.')
@@ -0,0 +1,259 @@
+import queue
+import threading
+import traceback
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from metrics import UtteranceTimeline
+from transcription import COALESCE_MAX_SECONDS, post_process_transcription, transcribe, transcribe_local_batch
+from utils import ConfigManager
+
+
+class TranscriptionPipeline(QObject):
+    """
+    Long-lived transcription and typing stages for continuous mode.
+
+    Recordings are submitted to a bounded queue and transcribed one at a time; the results go
+    through a second queue to the typing stage. Both stages run on their own threads and keep
+    the order of the recordings, so the next utterance can be recorded while the previous one
+    is still being transcribed and typed.
+
+    When recordings pile up faster than a local model transcribes them, the waiting recordings
+    are coalesced into a single decode, and their transcriptions are still typed one by one. A
+    recording that finds the queue empty is transcribed on its own. In streaming mode, a
+    recording comes with the StreamingTranscriber that decoded it while it was spoken, and only
+    its tail is decoded here.
+
+    Signals:
+        queueSignal: Emits the number of recordings waiting for or in transcription
+        resultSignal: Emits each transcription after it has been typed
+        drainedSignal: Emits when every submitted recording has been transcribed and typed
+    """
+
+    queueSignal = pyqtSignal(int)
+    resultSignal = pyqtSignal(str)
+    drainedSignal = pyqtSignal()
+
+    def __init__(self, type_callback, local_model=None, max_queue_size=3, model_loader=None):
+        """
+        Initialize the pipeline.
+
+        :param type_callback: Function called from the typing stage with each transcription and its timeline
+        :param local_model: Local transcription model (if applicable)
+        :param max_queue_size: Number of recordings that can wait for transcription
+        :param model_loader: ModelLoader to take the local model from for each recording, so
+                             unloading it frees the model; recordings stay queued until it has loaded
+        """
+        super().__init__()
+        self.type_callback = type_callback
+        self.local_model = local_model
+        self.model_loader = model_loader
+        self.transcribe_queue = queue.Queue(maxsize=max(max_queue_size, 1))
+        self.type_queue = queue.Queue()
+        self._in_transcription = 0
+        # Transcriptions queued for typing or being typed
+        self._untyped = 0
+        self._untyped_lock = threading.Lock()
+        # Recordings taken from the queue that did not fit in the last coalesced decode
+        self._held = []
+        self._threads = []
+        # Set by stop(), so recordings still waiting for the model to load do not hold it up
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the transcription and typing stages."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._transcribe_loop, name='TranscribeStage', daemon=True),
+            threading.Thread(target=self._type_loop, name='TypeStage', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Finish the queued work and stop both stages. Recordings still waiting for the model are dropped."""
+        if not self._threads:
+            return
+        self._stopping.set()
+        self.transcribe_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def apply_config_changes(self, changed_keys):
+        """
+        Resize the transcription queue if the maximum number of queued recordings changed.
+
+        :param changed_keys: Set of changed key tuples from ConfigManager.changed_keys()
+        """
+        if ('recording_options', 'max_queued_recordings') in changed_keys:
+            max_queue_size = ConfigManager.get_config_value('recording_options', 'max_queued_recordings') or 3
+            with self.transcribe_queue.mutex:
+                self.transcribe_queue.maxsize = max(max_queue_size, 1)
+
+    def pending(self):
+        """Return the number of recordings waiting for or in transcription."""
+        return self.transcribe_queue.qsize() + len(self._held) + self._in_transcription
+
+    def busy(self):
+        """Return True if recordings are waiting for or in transcription, or transcriptions are still to be typed."""
+        with self._untyped_lock:
+            return self.pending() > 0 or self._untyped > 0
+
+    def is_full(self):
+        """Return True if a new recording would have to wait for space in the queue."""
+        return self.transcribe_queue.full()
+
+    def submit(self, audio_data, timeout=None, timeline=None, streamer=None):
+        """
+        Queue a recording for transcription, waiting while the queue is full.
+
+        :param timeline: UtteranceTimeline of the recording, marked as it goes through the stages
+        :param streamer: StreamingTranscriber that has been transcribing the recording, to finish it with
+        :return: True if the recording was queued, False if the timeout expired first
+        """
+        try:
+            self.transcribe_queue.put((audio_data, timeline or UtteranceTimeline(), streamer), timeout=timeout)
+        except queue.Full:
+            return False
+        self.queueSignal.emit(self.pending())
+        return True
+
+    def _transcribe_loop(self):
+        """Transcribe recordings in the order they were submitted."""
+        while True:
+            item = self._held.pop(0) if self._held else self.transcribe_queue.get()
+            if item is None:
+                self.type_queue.put(None)
+                return
+
+            audio_data, timeline, streamer = item
+            self._in_transcription = 1
+            local_model = None
+            try:
+                if streamer:
+                    timeline.mark('decode_start')
+                    result = post_process_transcription(streamer.finish(audio_data))
+                    timeline.mark('decode_end')
+                    ConfigManager.console_print(f'Transcription completed in {timeline.duration("decode"):.2f} '
+                                                f'seconds. Post-processed line: {result}')
+                    self._queue_for_typing(result, timeline)
+                    continue
+                sample_rate = ConfigManager.get_config_value('recording_options', 'sample_rate') or 16000
+                local_model = self._get_local_model(audio_data.shape[0] / sample_rate)
+                batch = self._take_backlog(item, local_model, sample_rate)
+                if len(batch) > 1:
+                    self._transcribe_batch(batch, local_model)
+                    continue
+                timeline.mark('decode_start')
+                result = transcribe(audio_data, local_model)
+                timeline.mark('decode_end')
+                ConfigManager.console_print(f'Transcription completed in {timeline.duration("decode"):.2f} seconds. '
+                                            f'Post-processed line: {result}')
+                self._queue_for_typing(result, timeline)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                # Do not keep the model alive while waiting for the next recording, so it can be unloaded
+                item = audio_data = streamer = local_model = batch = None
+                self._in_transcription = 0
+                self.queueSignal.emit(self.pending())
+                if not self.busy():
+                    # Nothing was queued for typing, e.g. after an error, so the typing stage will not report it
+                    self.drainedSignal.emit()
+
+    def _take_backlog(self, item, local_model, sample_rate):
+        """
+        Take the recordings waiting behind a recording that can be decoded together with it.
+
+        Recordings are only coalesced for a local model, up to COALESCE_MAX_SECONDS in total and
+        while they use the same model. Streamed recordings are mostly decoded already, so they are
+        not coalesced. The first recording that does not fit is held back for the next decode, so
+        the order is kept.
+
+        :return: List of (audio_data, timeline, streamer) items, starting with item
+        """
+        if (local_model is None or ConfigManager.get_config_value('model_options', 'use_api')
+                or not ConfigManager.get_config_value('model_options', 'local', 'coalesce_backlog')):
+            return [item]
+
+        batch = [item]
+        total_seconds = item[0].shape[0] / sample_rate
+        while True:
+            try:
+                next_item = self.transcribe_queue.get_nowait()
+            except queue.Empty:
+                break
+            if next_item is not None and next_item[2] is None:
+                duration = next_item[0].shape[0] / sample_rate
+                if (total_seconds + duration <= COALESCE_MAX_SECONDS
+                        and self._get_local_model(duration) is local_model):
+                    batch.append(next_item)
+                    total_seconds += duration
+                    self._in_transcription = len(batch)
+                    continue
+            self._held.append(next_item)
+            break
+        return batch
+
+    def _transcribe_batch(self, batch, local_model):
+        """Transcribe several recordings in a single decode and queue each result for typing."""
+        for _, timeline, _ in batch:
+            timeline.mark('decode_start')
+        transcriptions = transcribe_local_batch([audio_data for audio_data, _, _ in batch], local_model)
+        for _, timeline, _ in batch:
+            timeline.mark('decode_end')
+        ConfigManager.console_print(f'Transcribed {len(batch)} queued recordings in one decode in '
+                                    f'{batch[0][1].duration("decode"):.2f} seconds.')
+        for transcription, (_, timeline, _) in zip(transcriptions, batch):
+            result = post_process_transcription(transcription)
+            ConfigManager.console_print(f'Post-processed line: {result}')
+            self._queue_for_typing(result, timeline)
+
+    def _get_local_model(self, duration):
+        """
+        Return the local model for a recording, waiting for the model loader if it is still loading.
+
+        :param duration: Length of the recording in seconds, to select the long-form model
+        """
+        if self.model_loader is None:
+            return self.local_model
+        if ConfigManager.get_config_value('model_options', 'use_api'):
+            # The model is only a fallback for the API, so use it if it has loaded but do not wait for it
+            return self.model_loader.model
+        # Wait in short steps, so a stalled load or an unloaded model cannot block stop()
+        local_model = None
+        while local_model is None:
+            model_loader = self.model_loader
+            if model_loader is None:
+                return self.local_model
+            if model_loader.error is not None:
+                raise RuntimeError(f'The model failed to load: {model_loader.error}')
+            if self._stopping.is_set():
+                raise RuntimeError('The pipeline was stopped while waiting for the model to load')
+            local_model = model_loader.wait_for_model(timeout=0.1)
+        return model_loader.model_for_duration(duration) or local_model
+
+    def _queue_for_typing(self, result, timeline):
+        """Hand a transcription to the typing stage."""
+        with self._untyped_lock:
+            self._untyped += 1
+        self.type_queue.put((result, timeline))
+
+    def _type_loop(self):
+        """Type transcriptions in the order they were produced."""
+        while True:
+            item = self.type_queue.get()
+            if item is None:
+                return
+            result, timeline = item
+            try:
+                self.type_callback(result, timeline)
+            except Exception:
+                traceback.print_exc()
+            with self._untyped_lock:
+                self._untyped -= 1
+            self.resultSignal.emit(result)
+            if not self.busy():
+                self.drainedSignal.emit()
@@ -1,16 +1,14 @@
-import time
 import traceback
 import numpy as np
-import sounddevice as sd
-import tempfile
-import wave
-import webrtcvad
 from PyQt5.QtCore import QThread, QMutex, pyqtSignal
-from collections import deque
-from threading import Event
 
-from transcription import transcribe
+from audio_processing import SpeechGate, compact_silence
+from audio_service import AudioInputService, CaptureSession
+from metrics import Metrics
+from streaming import StreamingTranscriber
+from transcription import ApiClient, transcribe, post_process_transcription
 from utils import ConfigManager
+from vad import create_vad
 
 
 class ResultThread(QThread):
@@ -27,22 +25,37 @@ class ResultThread(QThread):
     Signals:
         statusSignal: Emits the current status of the thread (e.g., 'recording', 'transcribing', 'idle')
         resultSignal: Emits the transcription result
+        partialSignal: Emits the partial transcription while recording, in streaming mode
     """
 
     statusSignal = pyqtSignal(str)
     resultSignal = pyqtSignal(str)
+    partialSignal = pyqtSignal(str)
 
-    def __init__(self, local_model=None):
+    def __init__(self, local_model=None, audio_service=None, pipeline=None, model_loader=None):
         """
         Initialize the ResultThread.
 
         :param local_model: Local transcription model (if applicable)
+        :param audio_service: Shared AudioInputService; if None, a stream is opened for this session only
+        :param pipeline: TranscriptionPipeline to hand recordings to; if set, the thread keeps
+                         recording utterances until stopped instead of transcribing them itself
+        :param model_loader: ModelLoader to take the local model from once it has loaded, if no
+                             local_model is given; recording starts without waiting for it
         """
         super().__init__()
         self.local_model = local_model
+        self.model_loader = model_loader
+        self.audio_service = audio_service
+        self.pipeline = pipeline
+        self._owns_audio_service = False
         self.is_recording = False
         self.is_running = True
         self.sample_rate = None
+        self.streamer = None
+        self.speech_labels = None
+        self.speech_detected = False
+        self.timeline = None
         self.mutex = QMutex()
 
     def stop_recording(self):
@@ -52,11 +65,15 @@ class ResultThread(QThread):
         self.mutex.unlock()
 
     def stop(self):
-        """Stop the entire thread execution."""
+        """
+        Stop the entire thread execution.
+
+        In continuous mode, the pipeline may still be transcribing the last utterances; the status
+        then stays on transcribing until the pipeline emits drainedSignal.
+        """
         self.mutex.lock()
         self.is_running = False
         self.mutex.unlock()
-        self.statusSignal.emit('idle')
         self.wait()
 
     def run(self):
@@ -69,26 +86,56 @@ class ResultThread(QThread):
             self.is_recording = True
             self.mutex.unlock()
 
+            self.timeline = Metrics.new_timeline()
+            if self.model_loader is not None:
+                self.model_loader.rewarm_if_idle()
+                if self.local_model is None:
+                    self.local_model = self.model_loader.model
+            model_options = ConfigManager.get_config_section('model_options')
+            if model_options.get('use_api') and model_options['api'].get('prewarm_connection'):
+                # Connect while the user speaks, so the upload starts as soon as the recording ends
+                ApiClient.prewarm()
+            self._start_audio_service()
+
+            if self.pipeline:
+                self._run_pipelined()
+                return
+
             self.statusSignal.emit('recording')
             ConfigManager.console_print('Recording...')
-            audio_data = self._record_audio()
+            capture = CaptureSession(self.audio_service)
+            self.timeline.mark('stream_start')
+            try:
+                self.streamer = self._start_streamer(capture)
+                audio_data = self._record_audio(capture)
+            finally:
+                capture.close()
 
             if not self.is_running:
                 return
 
-            if audio_data is None:
+            if audio_data is None or not self._has_speech():
                 self.statusSignal.emit('idle')
                 return
 
+            if not self._wait_for_model():
+                if self.is_running:
+                    self.statusSignal.emit('error')
+                    self.resultSignal.emit('')
+                return
+
             self.statusSignal.emit('transcribing')
             ConfigManager.console_print('Transcribing...')
 
-            # Time the transcription process
-            start_time = time.time()
-            result = transcribe(audio_data, self.local_model)
-            end_time = time.time()
+            self.timeline.mark('decode_start')
+            if self.streamer:
+                result = post_process_transcription(self.streamer.finish(audio_data))
+            else:
+                audio_data = self._compact_silence(audio_data)
+                result = transcribe(audio_data, self._select_model(audio_data.shape[0] / self.sample_rate))
+            self.timeline.mark('decode_end')
 
-            transcription_time = end_time - start_time
+            transcription_time = self.timeline.duration('decode')
             ConfigManager.console_print(f'Transcription completed in {transcription_time:.2f} seconds. Post-processed line: {result}')
 
             if not self.is_running:
@@ -102,76 +149,231 @@ class ResultThread(QThread):
             self.statusSignal.emit('error')
             self.resultSignal.emit('')
         finally:
+            if self.streamer:
+                self.streamer.stop()
+                self.streamer = None
+            if self.model_loader is not None:
+                # The model belongs to the loader, so it can be freed when the loader unloads it
+                self.local_model = None
+            self._stop_audio_service()
             self.stop_recording()
+            if not self.is_running:
+                # Emitted from this thread, so it arrives after the statuses emitted before it
+                self.statusSignal.emit('transcribing' if self.pipeline and self.pipeline.busy() else 'idle')
+
+    def _run_pipelined(self):
+        """
+        Record utterances back to back and hand each one to the pipeline.
+
+        Each new capture takes over from the previous one before the recording is handed off,
+        so no audio is lost while waiting for space in the pipeline's queue.
 
-    def _record_audio(self):
+        In streaming mode, each utterance is transcribed while it is spoken, and its streaming
+        transcriber is handed to the pipeline with the recording to decode the remaining tail.
         """
-        Record audio from the microphone and save it to a temporary file.
+        self.statusSignal.emit('recording')
+        capture = CaptureSession(self.audio_service)
+        self.timeline.mark('stream_start')
+        after_activation = True
+        streamer = None
+        try:
+            while self.is_running and self.is_recording:
+                ConfigManager.console_print('Recording...')
+                streamer = self._start_streamer(capture)
+                audio_data = self._record_audio(capture, after_activation)
+                capture = CaptureSession(self.audio_service, replaces=capture)
+                timeline, self.timeline = self.timeline, Metrics.new_timeline(after_activation=False)
+                self.timeline.mark('stream_start')
+                after_activation = False
+                if audio_data is not None and self._has_speech():
+                    # The streamer has committed samples of the recording as it was captured, so it keeps its silence
+                    if not streamer:
+                        audio_data = self._compact_silence(audio_data)
+                    if self._submit_to_pipeline(audio_data, timeline, streamer):
+                        streamer = None
+                if streamer:
+                    streamer.stop()
+                    streamer = None
+        finally:
+            if streamer:
+                streamer.stop()
+            capture.close()
 
+    def _submit_to_pipeline(self, audio_data, timeline, streamer=None):
+        """
+        Queue a recording in the pipeline, waiting while transcription is falling behind.
+
+        :return: True if the recording was queued, False if it was dropped because the thread was stopped
+        """
+        if self.pipeline.is_full():
+            ConfigManager.console_print('Transcription is falling behind. Waiting for the queue to drain...')
+        while not self.pipeline.submit(audio_data, timeout=0.1, timeline=timeline, streamer=streamer):
+            if not self.is_running:
+                ConfigManager.console_print('Recording dropped because the transcription queue is full.')
+                return False
+        return True
+
+    def _wait_for_model(self):
+        """
+        Wait for the local model if it is still loading, keeping the recording until it is ready.
+
+        :return: False if the model is needed but failed to load or the thread was stopped
+        """
+        if self.local_model is not None or self.model_loader is None:
+            return True
+        if ConfigManager.get_config_value('model_options', 'use_api'):
+            # The model is only a fallback for the API, so use it if it has loaded but do not wait for it
+            self.local_model = self.model_loader.model
+            return True
+
+        if not self.model_loader.is_ready():
+            self.statusSignal.emit('loading')
+            ConfigManager.console_print('Waiting for the model to finish loading...')
+        while self.is_running and self.local_model is None and self.model_loader.error is None:
+            self.local_model = self.model_loader.wait_for_model(timeout=0.1)
+
+        if self.local_model is None and self.model_loader.error is not None:
+            ConfigManager.console_print(f'Cannot transcribe, the model failed to load: {self.model_loader.error}')
+        return self.local_model is not None
+
+    def _select_model(self, duration):
+        """Return the model for a recording of the given length in seconds, e.g. a long-form model."""
+        if self.model_loader is None or self.local_model is None:
+            return self.local_model
+        return self.model_loader.model_for_duration(duration) or self.local_model
+
+    def _has_speech(self):
+        """Return True if the last recording contains enough speech to be worth transcribing."""
+        min_speech_ratio = ConfigManager.get_config_value('recording_options', 'min_speech_ratio') or 0.0
+        if SpeechGate.has_speech(self.speech_labels, self.speech_detected, min_speech_ratio):
+            return True
+        ConfigManager.console_print(f'No speech detected. Skipping transcription ({SpeechGate.summary()}).')
+        return False
+
+    def _compact_silence(self, audio_data):
+        """Shorten the silence in the last recording using the speech labels from capture."""
+        if not ConfigManager.get_config_value('recording_options', 'compact_silence'):
+            return audio_data
+
+        padding_ms = ConfigManager.get_config_value('recording_options', 'silence_padding') or 0
+        padding_frames = padding_ms // self.audio_service.FRAME_DURATION_MS
+        compacted = compact_silence(audio_data, self.speech_labels, self.audio_service.frame_size, padding_frames)
+        saved_seconds = (audio_data.shape[0] - compacted.shape[0]) / self.sample_rate
+        if saved_seconds > 0:
+            ConfigManager.console_print(f'Removed {saved_seconds:.2f} seconds of silence before transcription.')
+        return compacted
+
+    def _start_audio_service(self):
+        """Use the shared audio service, or open a stream for this session only if it is not running."""
+        if self.audio_service is None:
+            self.audio_service = AudioInputService()
+        self._owns_audio_service = not self.audio_service.is_running()
+        if self._owns_audio_service:
+            # The pre-roll holds everything captured since the stream opened, so nothing is lost
+            self.audio_service.start()
+        self.sample_rate = self.audio_service.sample_rate
+
+    def _stop_audio_service(self):
+        """Close the audio stream if it was opened for this session only."""
+        if self._owns_audio_service:
+            self.audio_service.stop()
+            self._owns_audio_service = False
+
+    def _streaming_enabled(self):
+        """Return True if the recording should be transcribed incrementally while recording."""
+        model_options = ConfigManager.get_config_section('model_options')
+        return (self.local_model is not None
+                and not model_options.get('use_api')
+                and model_options['local'].get('streaming'))
+
+    def _start_streamer(self, capture):
+        """Start transcribing a capture while it is recorded if streaming is enabled, and return the streamer."""
+        if not self._streaming_enabled():
+            return None
+        streamer = StreamingTranscriber(self.local_model, capture.audio_buffer, self.sample_rate,
+                                        on_partial=self.partialSignal.emit)
+        streamer.start()
+        return streamer
+
+    def _record_audio(self, capture, after_activation=True):
+        """
+        Record audio from the microphone until the recording is stopped or speech ends.
+
+        :param capture: CaptureSession collecting the audio
+        :param after_activation: True if the recording started with the activation key press
         :return: numpy array of audio data, or None if the recording is too short
         """
         recording_options = ConfigManager.get_config_section('recording_options')
-        self.sample_rate = recording_options.get('sample_rate') or 16000
-        frame_duration_ms = 30  # 30ms frame duration for WebRTC VAD
-        frame_size = int(self.sample_rate * (frame_duration_ms / 1000.0))
+        frame_duration_ms = self.audio_service.FRAME_DURATION_MS  # 30ms frame duration for WebRTC VAD
+        frame_size = self.audio_service.frame_size
         silence_duration_ms = recording_options.get('silence_duration') or 900
         silence_frames = int(silence_duration_ms / frame_duration_ms)
 
-        # 150ms delay before starting VAD to avoid mistaking the sound of key pressing for voice
-        initial_frames_to_skip = int(0.15 * self.sample_rate / frame_size)
+        # The sound of the key press lasts less than 150ms, so around activation speech only
+        # counts once it has lasted that long; shorter bursts there are treated as key clicks
+        key_press_frames = int(0.15 * self.sample_rate / frame_size)
+        key_press_end_frame = capture.pre_roll_samples // frame_size + key_press_frames if after_activation else 0
 
-        # Create VAD only for recording modes that use it
+        # Every frame is labelled, but only recording modes that use VAD stop on silence
         recording_mode = recording_options.get('recording_mode') or 'continuous'
-        vad = None
-        if recording_mode in ('voice_activity_detection', 'continuous'):
-            vad = webrtcvad.Vad(2)  # VAD aggressiveness: 0 to 3, 3 being the most aggressive
-            speech_detected = False
-            silent_frame_count = 0
-
-        audio_buffer = deque(maxlen=frame_size)
-        recording = []
-
-        data_ready = Event()
-
-        def audio_callback(indata, frames, time, status):
-            if status:
-                ConfigManager.console_print(f"Audio callback status: {status}")
-            audio_buffer.extend(indata[:, 0])
-            data_ready.set()
-
-        with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
-                            blocksize=frame_size, device=recording_options.get('sound_device'),
-                            callback=audio_callback):
-            while self.is_running and self.is_recording:
-                data_ready.wait()
-                data_ready.clear()
-
-                if len(audio_buffer) < frame_size:
-                    continue
-
-                # Save frame
-                frame = np.array(list(audio_buffer), dtype=np.int16)
-                audio_buffer.clear()
-                recording.extend(frame)
-
-                # Avoid trying to detect voice in initial frames
-                if initial_frames_to_skip > 0:
-                    initial_frames_to_skip -= 1
-                    continue
-
-                if vad:
-                    if vad.is_speech(frame.tobytes(), self.sample_rate):
-                        silent_frame_count = 0
-                        if not speech_detected:
-                            ConfigManager.console_print("Speech detected.")
-                            speech_detected = True
-                    else:
-                        silent_frame_count += 1
-
-                    if speech_detected and silent_frame_count > silence_frames:
-                        break
-
-        audio_data = np.array(recording, dtype=np.int16)
+        stop_on_silence = recording_mode in ('voice_activity_detection', 'continuous')
+        vad = create_vad(self.sample_rate)
+        speech_labels = []
+        speech_detected = False
+        silent_frame_count = 0
+        speech_frame_count = 0
+
+        # Speech is never removed by silence compaction, so once there is enough of it for the
+        # long-form model, that model is loaded while the user is still speaking
+        total_speech_frames = 0
+        long_form_frames = None
+        if self.model_loader is not None and not ConfigManager.get_config_value('model_options', 'use_api'):
+            long_form_threshold = ConfigManager.get_config_value('model_options', 'local', 'long_form_threshold') or 0
+            long_form_frames = max(int(long_form_threshold * 1000 / frame_duration_ms), 1)
+
+        audio_buffer = capture.audio_buffer
+        data_ready = capture.data_ready
+        frame_start = 0
+        frame_index = 0
+        speech_ended = False
+
+        while self.is_running and self.is_recording and not speech_ended:
+            if not data_ready.wait(0.1):
+                continue
+            data_ready.clear()
+
+            # Process every complete frame that has arrived since the last wake-up
+            while not speech_ended:
+                frame = audio_buffer.read(frame_start, frame_size)
+                if frame is None:
+                    break
+                frame_start += frame_size
+                frame_index += 1
+
+                is_speech = vad.is_speech(frame)
+                speech_labels.append(is_speech)
+                if is_speech:
+                    silent_frame_count = 0
+                    speech_frame_count += 1
+                    total_speech_frames += 1
+                    if total_speech_frames == long_form_frames:
+                        self.model_loader.prepare_for_duration(total_speech_frames * frame_duration_ms / 1000)
+                    onset_frames = key_press_frames if frame_index <= key_press_end_frame else 1
+                    if not speech_detected and speech_frame_count >= onset_frames:
+                        ConfigManager.console_print("Speech detected.")
+                        self.timeline.mark('first_speech')
+                        speech_detected = True
+                else:
+                    silent_frame_count += 1
+                    speech_frame_count = 0
+
+                if stop_on_silence and speech_detected and silent_frame_count > silence_frames:
+                    speech_ended = True
+
+        self.timeline.mark('endpoint')
+        self.speech_labels = np.array(speech_labels, dtype=bool)
+        self.speech_detected = speech_detected
+        audio_data = audio_buffer.get_data()
         duration = len(audio_data) / self.sample_rate
 
         ConfigManager.console_print(f'Recording finished. Size: {audio_data.size} samples, Duration: {duration:.2f} seconds')
@@ -0,0 +1,97 @@
+import threading
+import time
+
+
+class StartupProfile:
+    """
+    Records the time of each startup step and prints them as a timeline when enabled.
+
+    Steps are marked from wherever they happen, including other threads. The timeline is printed
+    once, as soon as every step passed to expect() has been marked. Timestamps are relative to
+    the start of the process where the platform reports it, otherwise to the launcher start.
+    """
+
+    _lock = threading.Lock()
+    enabled = False
+    origin = None
+    marks = []
+    expected = set()
+    _reported = False
+
+    @classmethod
+    def start(cls, launcher_start=None, enabled=False):
+        """
+        Start the timeline.
+
+        :param launcher_start: time.perf_counter() value taken as early as possible in the launcher
+        :param enabled: True to print the timeline once the expected steps are done
+        """
+        launcher_start = launcher_start if launcher_start is not None else time.perf_counter()
+        cls.enabled = enabled
+        process_age = cls._process_age()
+        if process_age is not None:
+            cls.origin = time.perf_counter() - process_age
+            cls.marks = [('process started', cls.origin)]
+        else:
+            cls.origin = launcher_start
+            cls.marks = []
+        cls.marks.append(('launcher started', launcher_start))
+
+    @classmethod
+    def mark(cls, step):
+        """
+        Record that a step has finished, and print the timeline if it was the last expected one.
+
+        Only the first mark of each step is kept, so steps that repeat later are not recorded again.
+        """
+        with cls._lock:
+            done = {name for name, _ in cls.marks}
+            if step in done:
+                return
+            cls.marks.append((step, time.perf_counter()))
+            done.add(step)
+            should_report = cls.enabled and not cls._reported and cls.expected and cls.expected <= done
+            if should_report:
+                cls._reported = True
+        if should_report:
+            cls.report()
+
+    @classmethod
+    def expect(cls, *steps):
+        """Add steps that must be marked before the timeline is printed."""
+        with cls._lock:
+            cls.expected.update(steps)
+
+    @classmethod
+    def elapsed_ms(cls, start_step, end_step):
+        """Return the milliseconds between two marked steps, or None if either was not marked."""
+        with cls._lock:
+            timestamps = dict(cls.marks)
+        if start_step not in timestamps or end_step not in timestamps:
+            return None
+        return (timestamps[end_step] - timestamps[start_step]) * 1000
+
+    @classmethod
+    def report(cls):
+        """Print the timeline, with the time since the origin and since the previous step."""
+        if cls.origin is None:
+            return
+        print('Startup timeline:')
+        previous = cls.origin
+        for step, timestamp in sorted(cls.marks, key=lambda mark: mark[1]):
+            print(f'  {(timestamp - cls.origin) * 1000:8.1f} ms  (+{(timestamp - previous) * 1000:7.1f} ms)  {step}')
+            previous = timestamp
+
+    @staticmethod
+    def _process_age():
+        """Return the number of seconds since this process started, or None if unknown."""
+        try:
+            import os
+            with open('/proc/self/stat', 'r') as file:
+                # The command name may contain spaces, so count fields from the closing parenthesis
+                start_ticks = int(file.read().rsplit(')', 1)[1].split()[19])
+            with open('/proc/uptime', 'r') as file:
+                uptime = float(file.read().split()[0])
+            return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
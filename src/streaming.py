@@ -0,0 +1,134 @@
+import re
+import threading
+import traceback
+
+from transcription import transcribe_local_segments
+from utils import ConfigManager
+
+
+class StreamingTranscriber:
+    """
+    Incrementally transcribes a recording while it is still growing.
+
+    Every interval, the uncommitted part of the recording is decoded with word timestamps. Words
+    that two consecutive decodes agree on (the local-agreement policy) are committed, and the
+    committed audio is dropped from the next decode. Once recording stops, only the uncommitted
+    tail needs decoding, so the time to text after speech ends stays roughly constant.
+    """
+
+    # Never decode more than this many seconds at once; Whisper's window is 30 seconds
+    MAX_UNCOMMITTED_SECONDS = 25.0
+    # When the uncommitted audio hits the limit, keep this many trailing seconds tentative
+    FORCED_COMMIT_MARGIN = 5.0
+    MIN_CHUNK_SECONDS = 1.0
+
+    def __init__(self, local_model, audio_buffer, sample_rate, on_partial=None):
+        """
+        Initialize the streaming transcriber.
+
+        :param local_model: Local transcription model
+        :param audio_buffer: AudioBuffer the recording is being written to
+        :param sample_rate: Sample rate of the recording
+        :param on_partial: Callback receiving the partial text after each decode
+        """
+        self.local_model = local_model
+        self.audio_buffer = audio_buffer
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.interval = ConfigManager.get_config_value('model_options', 'local', 'streaming_interval') or 1.0
+
+        self.committed_words = []
+        self.committed_samples = 0
+        self.hypothesis = []
+        self.decode_count = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start decoding in the background."""
+        self._thread = threading.Thread(target=self._run, name='StreamingTranscriber', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background decoding and wait for the current pass to finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def finish(self, audio_data):
+        """
+        Stop streaming and decode the uncommitted tail of the recording.
+
+        :param audio_data: The complete recording
+        :return: The full transcription, not yet post-processed
+        """
+        self.stop()
+        tail = audio_data[self.committed_samples:]
+        if tail.shape[0] >= self.sample_rate * 0.1:
+            words = self._decode(tail)
+            self.committed_words.extend(word for _, word in words)
+        ConfigManager.console_print(f'Streaming transcription finished after {self.decode_count} decodes.')
+        return ''.join(self.committed_words)
+
+    def _run(self):
+        """Decode the growing recording every interval until stopped."""
+        while not self._stop.wait(self.interval):
+            uncommitted = len(self.audio_buffer) - self.committed_samples
+            if uncommitted < self.sample_rate * self.MIN_CHUNK_SECONDS:
+                continue
+            try:
+                self._process(self.audio_buffer.get_data())
+            except Exception:
+                traceback.print_exc()
+                return
+
+    def _process(self, audio_data):
+        """Decode the uncommitted audio and commit the words both hypotheses agree on."""
+        chunk = audio_data[self.committed_samples:]
+        words = self._decode(chunk)
+        if self._stop.is_set():
+            return
+
+        agreed = 0
+        for (_, previous), (_, current) in zip(self.hypothesis, words):
+            if self._normalize(previous) != self._normalize(current):
+                break
+            agreed += 1
+
+        chunk_seconds = chunk.shape[0] / self.sample_rate
+        if agreed == 0 and chunk_seconds > self.MAX_UNCOMMITTED_SECONDS:
+            # No agreement for too long; commit everything but the most recent words
+            agreed = sum(1 for end, _ in words if end < chunk_seconds - self.FORCED_COMMIT_MARGIN)
+
+        if agreed:
+            end = words[agreed - 1][0]
+            self.committed_words.extend(word for _, word in words[:agreed])
+            self.committed_samples += min(int(end * self.sample_rate), chunk.shape[0])
+        self.hypothesis = words[agreed:]
+
+        if self.on_partial:
+            tentative = ''.join(word for _, word in self.hypothesis)
+            self.on_partial((''.join(self.committed_words) + tentative).strip())
+
+    def _decode(self, audio_data):
+        """
+        Decode audio with word timestamps, prompting with the committed text.
+
+        :return: List of (end time in seconds, word) tuples
+        """
+        initial_prompt = ConfigManager.get_config_value('model_options', 'common', 'initial_prompt') or ''
+        committed_text = ''.join(self.committed_words)
+        prompt = (initial_prompt + committed_text)[-200:] or None
+
+        segments = transcribe_local_segments(audio_data, self.local_model,
+                                             initial_prompt=prompt,
+                                             word_timestamps=True)
+        self.decode_count += 1
+        return [(word.end, word.word) for segment in segments for word in (segment.words or [])]
+
+    @staticmethod
+    def _normalize(word):
+        """Normalize a word for comparison, ignoring case and punctuation."""
+        return re.sub(r'[^\w]', '', word.lower())
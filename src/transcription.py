@@ -1,18 +1,62 @@
-import io
+import bisect
+import concurrent.futures
 import os
+import threading
+import time
 import numpy as np
-import soundfile as sf
-from faster_whisper import WhisperModel
-from openai import OpenAI
 
+from audio_encoding import EncodedAudioStream, UploadCodec
+from audio_processing import SpeechGate, split_at_pauses
+from metrics import Metrics
 from utils import ConfigManager
 
-def create_local_model():
+# Options of a performance profile that are used when the model is created, and when decoding
+PROFILE_MODEL_OPTIONS = ('compute_type', 'cpu_threads', 'num_workers')
+PROFILE_DECODE_OPTIONS = ('beam_size', 'best_of', 'without_timestamps')
+# Longest chunk of a recording decoded in parallel, one window of the Whisper encoder
+PARALLEL_CHUNK_SECONDS = 30.0
+# Longest total length of recordings coalesced into one decode, and the silence put between them
+COALESCE_MAX_SECONDS = 30.0
+COALESCE_GAP_SECONDS = 1.0
+
+def get_performance_profile():
+    """
+    Return the options of the performance profile selected in model_options.local, or {} if none is.
+    """
+    name = ConfigManager.get_config_value('model_options', 'local', 'performance_profile')
+    if not name or name == 'none':
+        return {}
+    return ConfigManager.get_config_section('performance_profiles', name)
+
+def get_local_model_options():
+    """
+    Return model_options.local from the config, with the model options of the performance profile.
+    """
+    local_model_options = dict(ConfigManager.get_config_section('model_options')['local'])
+    profile = get_performance_profile()
+    for option in PROFILE_MODEL_OPTIONS:
+        if profile.get(option):
+            local_model_options[option] = profile[option]
+    return local_model_options
+
+def create_local_model(local_model_options=None, **model_kwargs):
     """
     Create a local model using the faster-whisper library.
+
+    :param local_model_options: Options to create the model with, or None for model_options.local
+                                and the performance profile from the config
+    Keyword arguments, e.g. cpu_threads or num_workers, are passed on to WhisperModel. They take
+    precedence over the cpu_threads and num_workers in the options.
     """
+    # Imported here, as faster-whisper and CTranslate2 are slow to import and unused with the API
+    from faster_whisper import WhisperModel
+
     ConfigManager.console_print('Creating local model...')
-    local_model_options = ConfigManager.get_config_section('model_options')['local']
+    if local_model_options is None:
+        local_model_options = get_local_model_options()
+    for option in ('cpu_threads', 'num_workers'):
+        if local_model_options.get(option):
+            model_kwargs.setdefault(option, local_model_options[option])
     compute_type = local_model_options['compute_type']
     model_path = local_model_options.get('model_path')
 
@@ -28,71 +72,594 @@ def create_local_model():
             model = WhisperModel(model_path,
                                  device=device,
                                  compute_type=compute_type,
-                                 download_root=None)  # Prevent automatic download
+                                 download_root=None,  # Prevent automatic download
+                                 **model_kwargs)
         else:
             model = WhisperModel(local_model_options['model'],
                                  device=device,
-                                 compute_type=compute_type)
+                                 compute_type=compute_type,
+                                 **model_kwargs)
     except Exception as e:
         ConfigManager.console_print(f'Error initializing WhisperModel: {e}')
         ConfigManager.console_print('Falling back to CPU.')
         model = WhisperModel(model_path or local_model_options['model'],
                              device='cpu',
                              compute_type=compute_type,
-                             download_root=None if model_path else None)
+                             download_root=None if model_path else None,
+                             **model_kwargs)
 
     ConfigManager.console_print('Local model created.')
     return model
 
-def transcribe_local(audio_data, local_model=None):
+def transcribe_local_segments(audio_data, local_model=None, cancelled=None, **options):
     """
-    Transcribe an audio file using a local model.
+    Transcribe audio data using a local model and return the list of segments.
+
+    :param cancelled: threading.Event that stops decoding after the current segment once it is set
+    Keyword arguments override the options taken from the config, e.g. word_timestamps=True.
     """
     if not local_model:
         local_model = create_local_model()
     model_options = ConfigManager.get_config_section('model_options')
 
-    # Convert int16 to float32
-    audio_data_float = audio_data.astype(np.float32) / 32768.0
+    # Convert int16 to float32 in a single pass, without an intermediate copy
+    audio_data_float = np.multiply(audio_data, 1.0 / 32768.0, dtype=np.float32)
+
+    transcribe_options = {
+        'language': model_options['common']['language'],
+        'initial_prompt': model_options['common']['initial_prompt'],
+        'condition_on_previous_text': model_options['local']['condition_on_previous_text'],
+        'temperature': model_options['common']['temperature'],
+        'vad_filter': model_options['local']['vad_filter'],
+    }
+    profile = get_performance_profile()
+    transcribe_options.update({option: profile[option] for option in PROFILE_DECODE_OPTIONS
+                               if profile.get(option) is not None})
+    transcribe_options.update(options)
+
+    segments, _ = local_model.transcribe(audio=audio_data_float, **transcribe_options)
+    if cancelled is None:
+        segments = list(segments)
+    else:
+        # Segments are decoded lazily, so stopping the iteration stops decoding
+        decoded = []
+        for segment in segments:
+            decoded.append(segment)
+            if cancelled.is_set():
+                break
+        segments = decoded
+
+    # Drop segments the model itself considers silence, which are usually hallucinations
+    no_speech_filter = model_options['local'].get('no_speech_filter')
+    if no_speech_filter:
+        speech_segments = [segment for segment in segments if segment.no_speech_prob <= no_speech_filter]
+        if len(speech_segments) < len(segments):
+            SpeechGate.count_filtered_segments(len(segments) - len(speech_segments))
+            ConfigManager.console_print(f'Filtered {len(segments) - len(speech_segments)} segments without speech.')
+        segments = speech_segments
+    return segments
+
+def get_decode_workers(local_model):
+    """
+    Return the number of recordings the local model can decode at the same time.
+    """
+    workers = getattr(getattr(local_model, 'model', None), 'num_workers', None)
+    if not isinstance(workers, int):
+        workers = get_local_model_options().get('num_workers') or 1
+    return max(workers, 1)
+
+def transcribe_local_chunked(audio_data, local_model, chunks, cancelled=None):
+    """
+    Transcribe the chunks of a recording in parallel and join their text in order.
+
+    Each chunk is decoded by its own thread, and the model's workers decode them at the same time.
+
+    :param chunks: List of (start sample, end sample) pairs, e.g. from split_at_pauses()
+    """
+    workers = min(get_decode_workers(local_model), len(chunks))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='Chunk') as executor:
+        futures = [executor.submit(transcribe_local_segments, audio_data[start:end], local_model, cancelled)
+                   for start, end in chunks]
+        return ''.join(segment.text for future in futures for segment in future.result())
+
+def transcribe_local(audio_data, local_model=None, cancelled=None):
+    """
+    Transcribe an audio file using a local model.
+
+    Recordings longer than model_options.local.parallel_decode_threshold are split at pauses and
+    decoded in parallel if the model has more than one worker.
+    """
+    if not local_model:
+        local_model = create_local_model()
+    threshold = ConfigManager.get_config_value('model_options', 'local', 'parallel_decode_threshold')
+    sample_rate = ConfigManager.get_config_value('recording_options', 'sample_rate') or 16000
+    if threshold and audio_data.shape[0] > threshold * sample_rate and get_decode_workers(local_model) > 1:
+        chunks = split_at_pauses(audio_data, sample_rate, PARALLEL_CHUNK_SECONDS)
+        if len(chunks) > 1:
+            ConfigManager.console_print(f'Decoding {len(chunks)} chunks with {get_decode_workers(local_model)} workers.')
+            return transcribe_local_chunked(audio_data, local_model, chunks, cancelled)
+
+    segments = transcribe_local_segments(audio_data, local_model, cancelled)
+    return ''.join([segment.text for segment in segments])
+
+def transcribe_local_batch(recordings, local_model=None):
+    """
+    Transcribe several short recordings with a single decode.
+
+    The recordings are joined with a short silence between them, so they fill one window of the
+    encoder instead of one window each, and the words are assigned back to the recording they
+    fall in by their timestamps. A single recording is transcribed on its own.
+
+    :param recordings: List of 1-D int16 arrays, together at most COALESCE_MAX_SECONDS long
+    :return: List with the transcription of each recording, in order
+    """
+    if len(recordings) == 1:
+        return [transcribe_local(recordings[0], local_model)]
+
+    sample_rate = ConfigManager.get_config_value('recording_options', 'sample_rate') or 16000
+    gap = np.zeros(int(COALESCE_GAP_SECONDS * sample_rate), dtype=np.int16)
+    parts = []
+    # Times in seconds of the middle of each gap, where one recording ends and the next begins
+    boundaries = []
+    position = 0
+    for recording in recordings:
+        if parts:
+            parts.append(gap)
+            boundaries.append((position + gap.shape[0] / 2) / sample_rate)
+            position += gap.shape[0]
+        parts.append(recording)
+        position += recording.shape[0]
+
+    segments = transcribe_local_segments(np.concatenate(parts), local_model,
+                                         word_timestamps=True, without_timestamps=False)
+    transcriptions = [''] * len(recordings)
+    for segment in segments:
+        if not segment.words:
+            transcriptions[bisect.bisect(boundaries, (segment.start + segment.end) / 2)] += segment.text
+            continue
+        for word in segment.words:
+            transcriptions[bisect.bisect(boundaries, (word.start + word.end) / 2)] += word.word
+    return transcriptions
+
+class ApiClient:
+    """
+    Keeps one OpenAI client with a pool of keep-alive connections for the configured base URL.
+
+    Creating a client for every recording means every transcription first pays for the DNS
+    lookup and the TCP and TLS handshakes. The shared client reuses open connections instead,
+    and prewarm() opens one in the background when a recording starts, so it is ready by the
+    time the audio is uploaded. The client is created again when the base URL, API key or
+    timeouts change.
+    """
+
+    # Seconds an idle connection is kept open; the server may close it earlier
+    KEEPALIVE_EXPIRY = 120.0
+    MAX_CONNECTIONS = 4
+
+    _lock = threading.Lock()
+    _client = None
+    _http_client = None
+    _key = None
+    _prewarm_thread = None
+    last_request = None
+
+    @classmethod
+    def get(cls):
+        """Return the shared client, creating it if the API options changed since it was created."""
+        api_options = ConfigManager.get_config_section('model_options')['api']
+        key = (api_options['base_url'] or 'https://api.openai.com/v1',
+               os.getenv('OPENAI_API_KEY') or None,
+               api_options.get('connect_timeout') or 5.0,
+               api_options.get('read_timeout') or 30.0,
+               # With a fallback, a failed request falls back right away instead of being retried
+               0 if (api_options.get('fallback') or 'none') != 'none' else 2)
+
+        with cls._lock:
+            if cls._client is None or cls._key != key:
+                cls._close()
+                # Imported here, as the OpenAI client and httpx are unused with a local model
+                import httpx
+                from openai import OpenAI
+
+                base_url, api_key, connect_timeout, read_timeout, max_retries = key
+                cls._http_client = httpx.Client(
+                    timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                    limits=httpx.Limits(max_connections=cls.MAX_CONNECTIONS,
+                                        max_keepalive_connections=cls.MAX_CONNECTIONS,
+                                        keepalive_expiry=cls.KEEPALIVE_EXPIRY),
+                )
+                cls._client = OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries,
+                                     http_client=cls._http_client)
+                cls._key = key
+            return cls._client
+
+    @classmethod
+    def prewarm(cls):
+        """
+        Open a connection to the API in the background, so the next request skips the handshakes.
 
-    response = local_model.transcribe(audio=audio_data_float,
-                                      language=model_options['common']['language'],
-                                      initial_prompt=model_options['common']['initial_prompt'],
-                                      condition_on_previous_text=model_options['local']['condition_on_previous_text'],
-                                      temperature=model_options['common']['temperature'],
-                                      vad_filter=model_options['local']['vad_filter'],)
-    return ''.join([segment.text for segment in list(response[0])])
+        Does nothing if the last request was recent enough for its connection to still be open.
+        """
+        if cls.last_request is not None and time.monotonic() - cls.last_request < cls.KEEPALIVE_EXPIRY / 2:
+            return
+        if cls._prewarm_thread is not None and cls._prewarm_thread.is_alive():
+            return
+        cls._prewarm_thread = threading.Thread(target=cls._prewarm, name='ApiPrewarm', daemon=True)
+        cls._prewarm_thread.start()
+
+    @classmethod
+    def close(cls):
+        """Close the shared client and its connections."""
+        with cls._lock:
+            cls._close()
+
+    @classmethod
+    def _prewarm(cls):
+        """Send a HEAD request to the base URL; any response leaves an open connection in the pool."""
+        try:
+            client = cls.get()
+            http_client = cls._http_client
+            start_time = time.perf_counter()
+            http_client.head(str(client.base_url))
+            cls.last_request = time.monotonic()
+            ConfigManager.console_print(f'Connected to the API in {time.perf_counter() - start_time:.2f} seconds.')
+        except Exception as e:
+            ConfigManager.console_print(f'Could not connect to the API in advance: {e}')
+
+    @classmethod
+    def _close(cls):
+        """Close the client; the caller holds the lock."""
+        if cls._http_client is not None:
+            cls._http_client.close()
+        cls._client = None
+        cls._http_client = None
+        cls._key = None
+        cls.last_request = None
 
 def transcribe_api(audio_data):
     """
     Transcribe an audio file using the OpenAI API.
     """
     model_options = ConfigManager.get_config_section('model_options')
-    client = OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY') or None,
-        base_url=model_options['api']['base_url'] or 'https://api.openai.com/v1'
-    )
+    client = ApiClient.get()
 
-    # Convert numpy array to WAV file
-    byte_io = io.BytesIO()
+    # Encode the recording with the codec chosen for the measured bandwidth; Opus is encoded while it is uploaded
     sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
-    sf.write(byte_io, audio_data, sample_rate, format='wav')
-    byte_io.seek(0)
+    codec = UploadCodec.select(audio_data.shape[0] / sample_rate, sample_rate)
+    stream = EncodedAudioStream(audio_data, sample_rate, codec, model_options['api'].get('opus_bitrate') or 24)
 
     response = client.audio.transcriptions.create(
         model=model_options['api']['model'],
-        file=('audio.wav', byte_io, 'audio/wav'),
+        file=(stream.name, stream, stream.mime_type),
         language=model_options['common']['language'],
         prompt=model_options['common']['initial_prompt'],
         temperature=model_options['common']['temperature'],
     )
+    ApiClient.last_request = time.monotonic()
+    UploadCodec.observe(stream)
+    ConfigManager.console_print(f'Uploaded {stream.encoded_bytes / 1024:.0f} KiB as {codec}, '
+                                f'encoded in {stream.encode_time * 1000:.0f} ms.')
     return response.text
 
+class ApiFallback:
+    """
+    Keeps slow or failing API requests from holding up a transcription.
+
+    If the API has not answered within model_options.api.deadline seconds, or fails, a fallback
+    starts next to it: a second request to the API (hedge) or a decode with the local model
+    (local). Whichever finishes first is used. An API request that loses finishes in the
+    background. faster-whisper only checks for cancellation between segments, so a local decode
+    that loses runs to the end of its current segment, usually the whole recording, and is only
+    dropped outright if it has not started yet.
+
+    With the local fallback, a circuit breaker also counts API failures and missed deadlines. After
+    failure_threshold of them in a row, recordings are transcribed locally without trying the API
+    until failure_cooldown seconds have passed. The next recording then tries the API again.
+    """
+
+    # How each source of a transcription is named in the console
+    SOURCES = {'hedge': 'hedged request', 'local': 'local model'}
+
+    _lock = threading.Lock()
+    _executor = None
+    failures = 0
+    open_until = None
+
+    @classmethod
+    def transcribe(cls, audio_data, local_model=None):
+        """
+        Transcribe a recording with the API, falling back as configured.
+
+        :param local_model: Local model for the local fallback; without it, only the API is used
+        :return: The transcription before post-processing
+        """
+        api_options = ConfigManager.get_config_section('model_options')['api']
+        fallback = api_options.get('fallback') or 'none'
+        if fallback == 'local' and local_model is None:
+            fallback = 'none'
+        if fallback == 'local' and cls.is_open():
+            ConfigManager.console_print('The API is failing. Transcribing with the local model until the cool-down ends.')
+            return transcribe_local(audio_data, local_model)
+        if fallback == 'none':
+            return transcribe_api(audio_data)
+
+        cancelled = threading.Event()
+        if fallback == 'local':
+            start_fallback = lambda: cls.submit(transcribe_local, audio_data, local_model, cancelled)
+        else:
+            start_fallback = lambda: cls.submit(transcribe_api, audio_data)
+
+        deadline = api_options.get('deadline') or None
+        pending = {cls.submit(transcribe_api, audio_data): 'API'}
+        api_failed = False
+        error = None
+        while pending:
+            done, _ = concurrent.futures.wait(pending, timeout=None if api_failed else deadline,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                ConfigManager.console_print(f'No answer from the API within {deadline:.1f} seconds. '
+                                            f'Starting the {fallback} fallback...')
+                api_failed = True
+                cls._record_failure()
+                pending[start_fallback()] = cls.SOURCES[fallback]
+                continue
+
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    ConfigManager.console_print(f'Transcription with the {source} failed: {e}')
+                    error = e
+                    continue
+                if source == 'API' and not api_failed:
+                    cls._record_success()
+                if pending:
+                    ConfigManager.console_print(f'Using the transcription from the {source}.')
+                    cancelled.set()
+                return result
+
+            if not api_failed:
+                # The API failed before the deadline, so start the fallback right away
+                api_failed = True
+                cls._record_failure()
+                pending[start_fallback()] = cls.SOURCES[fallback]
+        raise error
+
+    @classmethod
+    def is_open(cls):
+        """Return True if the circuit breaker is sending recordings to the local model."""
+        with cls._lock:
+            return cls.open_until is not None and time.monotonic() < cls.open_until
+
+    @classmethod
+    def reset(cls):
+        """Close the circuit breaker and forget previous failures."""
+        with cls._lock:
+            cls.failures = 0
+            cls.open_until = None
+
+    @classmethod
+    def _record_success(cls):
+        with cls._lock:
+            was_open = cls.open_until is not None
+            cls.failures = 0
+            cls.open_until = None
+        if was_open:
+            ConfigManager.console_print('The API is answering again.')
+
+    @classmethod
+    def _record_failure(cls):
+        api_options = ConfigManager.get_config_section('model_options')['api']
+        threshold = api_options.get('failure_threshold') or 0
+        cooldown = api_options.get('failure_cooldown') or 0
+        with cls._lock:
+            cls.failures += 1
+            opened = threshold > 0 and cls.failures >= threshold and cooldown > 0
+            if opened:
+                cls.open_until = time.monotonic() + cooldown
+        if opened:
+            ConfigManager.console_print(f'The API failed {cls.failures} times in a row. '
+                                        f'Using the local model for {cooldown:.0f} seconds.')
+
+    @classmethod
+    def submit(cls, function, *args):
+        """
+        Run a function on the shared thread pool.
+
+        API requests that lose keep running there until they end, so the pool has room for a few
+        of them next to the requests and decodes of the current recording.
+        """
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = concurrent.futures.ThreadPoolExecutor(max_workers=8,
+                                                                      thread_name_prefix='Transcription')
+            return cls._executor.submit(function, *args)
+
+class BackendRace:
+    """
+    Races the API against the local model, and learns which one is faster for each recording length.
+
+    Recordings are grouped by length. Until both backends have finished model_options.api.race_samples
+    recordings of a length group, each recording is sent to both at once and the first
+    transcription is used. Neither loser can be stopped mid-decode: API requests finish in the
+    background, and faster-whisper only checks for cancellation between segments, so a local
+    decode that loses runs to the end of its current segment, usually the whole recording. It
+    keeps using the CPU meanwhile, and can delay the next recording. Only a local decode that
+    has not started yet is dropped. A local decode that was stopped did not transcribe the whole
+    recording, so its latency is not recorded; it counts as a lost race instead.
+
+    Once both backends have enough samples, each recording only goes to the backend with the lower
+    average latency for its length. A backend that has lost race_samples races while the other has
+    enough samples is treated as the slower one. Every RACE_EVERY-th recording is raced again to
+    keep the averages current.
+    """
+
+    # Upper bounds in seconds of the recording length groups
+    BUCKETS = (3.0, 8.0, 20.0, float('inf'))
+    BACKENDS = ('api', 'local')
+    SOURCES = {'api': 'API', 'local': 'local model'}
+    RACE_EVERY = 10
+    # Weight of the latest latency in the running averages
+    SMOOTHING = 0.3
+
+    _lock = threading.Lock()
+    # Bucket index: {backend: (number of samples, average latency in seconds)}
+    _stats = {}
+    # Bucket index: {backend: number of races lost without finishing}
+    _losses = {}
+    # Bucket index: number of recordings routed since the last race
+    _routed = {}
+
+    @classmethod
+    def transcribe(cls, audio_data, local_model):
+        """
+        Transcribe a recording with the backend predicted to be faster, or with both if unsure.
+
+        :return: The transcription before post-processing
+        """
+        sample_rate = ConfigManager.get_config_value('recording_options', 'sample_rate') or 16000
+        bucket = cls.bucket(audio_data.shape[0] / sample_rate)
+        backend = cls.route(bucket)
+        if backend is None:
+            return cls._race(audio_data, local_model, bucket)
+
+        start_time = time.perf_counter()
+        if backend == 'api':
+            try:
+                result = ApiFallback.transcribe(audio_data, local_model)
+            except Exception as e:
+                ConfigManager.console_print(f'Transcription with the API failed, using the local model: {e}')
+                return transcribe_local(audio_data, local_model)
+        else:
+            result = transcribe_local(audio_data, local_model)
+        cls._observe(bucket, backend, time.perf_counter() - start_time)
+        return result
+
+    @classmethod
+    def bucket(cls, duration):
+        """Return the index of the length group of a recording of the given length in seconds."""
+        return next(index for index, bound in enumerate(cls.BUCKETS) if duration < bound)
+
+    @classmethod
+    def route(cls, bucket):
+        """Return the backend to use for a length group, or None to race both."""
+        samples = ConfigManager.get_config_value('model_options', 'api', 'race_samples') or 0
+        if samples <= 0:
+            return None
+        with cls._lock:
+            stats = cls._stats.get(bucket, {})
+            losses = cls._losses.get(bucket, {})
+            ready = [backend for backend in cls.BACKENDS if stats.get(backend, (0, 0.0))[0] >= samples]
+            if len(ready) == len(cls.BACKENDS):
+                backend = min(cls.BACKENDS, key=lambda backend: stats[backend][1])
+            elif len(ready) == 1 and all(losses.get(other, 0) >= samples for other in cls.BACKENDS if other not in ready):
+                # The other backend is stopped whenever it loses, so it may never finish enough recordings
+                backend = ready[0]
+            else:
+                return None
+            routed = cls._routed.get(bucket, 0)
+            if routed >= cls.RACE_EVERY:
+                cls._routed[bucket] = 0
+                return None
+            cls._routed[bucket] = routed + 1
+            return backend
+
+    @classmethod
+    def stats(cls):
+        """Return the number of samples and average latency of each backend for each length group."""
+        with cls._lock:
+            return {cls._bucket_name(bucket): {backend: {'samples': count, 'latency': latency}
+                                               for backend, (count, latency) in stats.items()}
+                    for bucket, stats in sorted(cls._stats.items())}
+
+    @classmethod
+    def summary(cls):
+        """Return a one-line summary of the average latencies."""
+        groups = []
+        for name, stats in cls.stats().items():
+            latencies = ', '.join(f'{cls.SOURCES[backend]} {values["latency"]:.2f} s ({values["samples"]})'
+                                  for backend, values in stats.items())
+            groups.append(f'{name}: {latencies}')
+        return 'Average latency by recording length: ' + ('; '.join(groups) or 'none yet')
+
+    @classmethod
+    def reset(cls):
+        """Forget the statistics."""
+        with cls._lock:
+            cls._stats = {}
+            cls._losses = {}
+            cls._routed = {}
+
+    @classmethod
+    def _race(cls, audio_data, local_model, bucket):
+        """Start both backends and return the first transcription, stopping the local decode as early as possible."""
+        cancelled = threading.Event()
+        start_time = time.perf_counter()
+
+        def observe(backend):
+            def callback(future):
+                if future.cancelled() or (backend == 'local' and cancelled.is_set()):
+                    # Stopped before the end of the recording, so its time would look too fast
+                    cls._lose(bucket, backend)
+                elif future.exception() is None:
+                    cls._observe(bucket, backend, time.perf_counter() - start_time)
+            return callback
+
+        pending = {ApiFallback.submit(transcribe_api, audio_data): 'api',
+                   ApiFallback.submit(transcribe_local, audio_data, local_model, cancelled): 'local'}
+        for future, backend in pending.items():
+            future.add_done_callback(observe(backend))
+
+        error = None
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    ConfigManager.console_print(f'Transcription with the {cls.SOURCES[backend]} failed: {e}')
+                    error = e
+                    continue
+                # Stops the local decode after its current segment, or before it starts if it is still queued
+                cancelled.set()
+                for loser in pending:
+                    loser.cancel()
+                ConfigManager.console_print(f'The {cls.SOURCES[backend]} won the race in '
+                                            f'{time.perf_counter() - start_time:.2f} seconds.')
+                return result
+        raise error
+
+    @classmethod
+    def _observe(cls, bucket, backend, latency):
+        """Add a latency to the running average of a backend for a length group."""
+        Metrics.observe(f'{backend}_decode', latency)
+        with cls._lock:
+            stats = cls._stats.setdefault(bucket, {})
+            count, average = stats.get(backend, (0, latency))
+            stats[backend] = (count + 1, average + cls.SMOOTHING * (latency - average))
+
+    @classmethod
+    def _lose(cls, bucket, backend):
+        """Count a race a backend lost without finishing the recording."""
+        with cls._lock:
+            losses = cls._losses.setdefault(bucket, {})
+            losses[backend] = losses.get(backend, 0) + 1
+
+    @classmethod
+    def _bucket_name(cls, bucket):
+        lower = cls.BUCKETS[bucket - 1] if bucket else 0
+        upper = cls.BUCKETS[bucket]
+        return f'{lower:g}+ s' if upper == float('inf') else f'{lower:g}-{upper:g} s'
+
 def post_process_transcription(transcription):
     """
     Apply post-processing to the transcription.
     """
     transcription = transcription.strip()
+    if not transcription:
+        return ''
     post_processing = ConfigManager.get_config_section('post_processing')
     if post_processing['remove_trailing_period'] and transcription.endswith('.'):
         transcription = transcription[:-1]
@@ -110,8 +677,11 @@ def transcribe(audio_data, local_model=None):
     if audio_data is None:
         return ''
 
-    if ConfigManager.get_config_value('model_options', 'use_api'):
-        transcription = transcribe_api(audio_data)
+    model_options = ConfigManager.get_config_section('model_options')
+    if model_options.get('use_api') and model_options['api'].get('race') and local_model is not None:
+        transcription = BackendRace.transcribe(audio_data, local_model)
+    elif model_options.get('use_api'):
+        transcription = ApiFallback.transcribe(audio_data, local_model)
     else:
         transcription = transcribe_local(audio_data, local_model)
 
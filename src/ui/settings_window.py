@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import (
     QApplication, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QCheckBox,
     QMessageBox, QTabWidget, QWidget, QSizePolicy, QSpacerItem, QToolButton, QStyle, QFileDialog
 )
-from PyQt5.QtCore import Qt, QCoreApplication, QProcess, pyqtSignal
+from PyQt5.QtCore import Qt, QCoreApplication, pyqtSignal
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from ui.base_window import BaseWindow
@@ -15,12 +15,14 @@ load_dotenv()
 
 class SettingsWindow(BaseWindow):
     settings_closed = pyqtSignal()
-    settings_saved = pyqtSignal()
+    settings_saved = pyqtSignal(object)
 
     def __init__(self):
         """Initialize the settings window."""
         super().__init__('Settings', 700, 700)
         self.schema = ConfigManager.get_schema()
+        # Set while closing after a save, so closing does not ask to discard the saved settings
+        self._saved = False
         self.init_settings_ui()
 
     def init_settings_ui(self):
@@ -54,6 +56,10 @@ class SettingsWindow(BaseWindow):
             if isinstance(sub_settings, dict) and 'value' in sub_settings:
                 self.add_setting_widget(layout, sub_category, sub_settings, category)
             else:
+                if category == 'performance_profiles':
+                    # Every profile has the same options, so label each group with its profile
+                    header = QLabel(f'<b>{sub_category.capitalize()}</b>')
+                    layout.addWidget(header)
                 for key, meta in sub_settings.items():
                     self.add_setting_widget(layout, key, meta, category, sub_category)
 
@@ -160,8 +166,10 @@ class SettingsWindow(BaseWindow):
 
     def get_config_value(self, category, sub_category, key, meta):
         if sub_category:
-            return ConfigManager.get_config_value(category, sub_category, key) or meta['value']
-        return ConfigManager.get_config_value(category, key) or meta['value']
+            value = ConfigManager.get_config_value(category, sub_category, key)
+        else:
+            value = ConfigManager.get_config_value(category, key)
+        return value if value is not None else meta['value']
 
     def browse_model_path(self, widget):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select Whisper Model File", "", "Model Files (*.bin);;All Files (*)")
@@ -174,6 +182,7 @@ class SettingsWindow(BaseWindow):
 
     def save_settings(self):
         """Save the settings to the config file and .env file."""
+        old_config = ConfigManager.snapshot()
         self.iterate_settings(self.save_setting)
 
         # Save the API key to the .env file
@@ -185,8 +194,9 @@ class SettingsWindow(BaseWindow):
         ConfigManager.set_config_value(None, 'model_options', 'api', 'api_key')
 
         ConfigManager.save_config()
-        QMessageBox.information(self, 'Settings Saved', 'Settings have been saved. The application will now restart.')
-        self.settings_saved.emit()
+        QMessageBox.information(self, 'Settings Saved', 'Settings have been saved and applied.')
+        self.settings_saved.emit(ConfigManager.changed_keys(old_config))
+        self._saved = True
         self.close()
 
     def save_setting(self, widget, category, sub_category, key, meta):
@@ -283,6 +293,11 @@ class SettingsWindow(BaseWindow):
 
     def closeEvent(self, event):
         """Confirm before closing the settings window without saving."""
+        if self._saved:
+            self._saved = False
+            super().closeEvent(event)
+            return
+
         reply = QMessageBox.question(
             self,
             'Close without saving?',
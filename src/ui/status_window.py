@@ -1,7 +1,7 @@
 import sys
 import os
 from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot, QTimer
-from PyQt5.QtGui import QFont, QPixmap, QIcon
+from PyQt5.QtGui import QFont, QFontMetrics, QPixmap, QIcon
 from PyQt5.QtWidgets import QApplication, QLabel, QHBoxLayout
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -16,6 +16,9 @@ class StatusWindow(BaseWindow):
         Initialize the status window.
         """
         super().__init__('WhisperWriter Status', 320, 120)
+        self.queue_depth = 0
+        self.status = None
+        self.loading_text = 'Loading model...'
         self.initStatusUI()
         self.statusSignal.connect(self.updateStatus)
 
@@ -76,17 +79,57 @@ class StatusWindow(BaseWindow):
         """
         Update the status window based on the given status.
         """
+        self.status = status
         if status == 'recording':
             self.icon_label.setPixmap(self.microphone_pixmap)
-            self.status_label.setText('Recording...')
+            self.status_label.setText(self.recordingText())
             self.show()
         elif status == 'transcribing':
             self.icon_label.setPixmap(self.pencil_pixmap)
             self.status_label.setText('Transcribing...')
+        elif status == 'loading':
+            self.icon_label.setPixmap(self.pencil_pixmap)
+            self.status_label.setText(self.loading_text)
 
         if status in ('idle', 'error', 'cancel'):
             self.close()
 
+    @pyqtSlot(str)
+    def updateLoadingProgress(self, text):
+        """
+        Show the current step of loading the local model while the status is loading.
+        """
+        self.loading_text = text
+        if self.status == 'loading':
+            self.status_label.setText(text)
+
+    @pyqtSlot(int)
+    def updateQueueDepth(self, depth):
+        """
+        Show how many recordings are waiting to be transcribed in continuous mode.
+        """
+        self.queue_depth = depth
+        if self.status_label.text().startswith('Recording'):
+            self.status_label.setText(self.recordingText())
+
+    def recordingText(self):
+        """
+        Return the recording status text, including the number of queued recordings.
+        """
+        if self.queue_depth:
+            return f'Recording... ({self.queue_depth} queued)'
+        return 'Recording...'
+
+    @pyqtSlot(str)
+    def updatePartialText(self, text):
+        """
+        Show the partial transcription while recording, keeping the most recent words visible.
+        """
+        if not text:
+            return
+        metrics = QFontMetrics(self.status_label.font())
+        self.status_label.setText(metrics.elidedText(text, Qt.ElideLeft, self.width() - 80))
+
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
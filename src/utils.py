@@ -1,6 +1,9 @@
+import copy
 import yaml
 import os
 
+from startup_profile import StartupProfile
+
 class ConfigManager:
     _instance = None
 
@@ -15,8 +18,10 @@ class ConfigManager:
         if cls._instance is None:
             cls._instance = cls()
             cls._instance.schema = cls._instance.load_config_schema(schema_path)
+            StartupProfile.mark('schema loaded')
             cls._instance.config = cls._instance.load_default_config()
             cls._instance.load_user_config()
+            StartupProfile.mark('config parsed')
 
     @classmethod
     def get_schema(cls):
@@ -129,6 +134,41 @@ class ConfigManager:
         cls._instance.config = cls._instance.load_default_config()
         cls._instance.load_user_config()
 
+    @classmethod
+    def snapshot(cls):
+        """Return a deep copy of the current configuration, to compare against later."""
+        if cls._instance is None:
+            raise RuntimeError("ConfigManager not initialized")
+        return copy.deepcopy(cls._instance.config)
+
+    @classmethod
+    def changed_keys(cls, old_config):
+        """
+        Return the settings that differ between a snapshot and the current configuration.
+
+        :param old_config: Configuration returned by snapshot()
+        :return: Set of key tuples, e.g. {('post_processing', 'add_trailing_space')}
+        """
+        if cls._instance is None:
+            raise RuntimeError("ConfigManager not initialized")
+
+        def diff(old, new, prefix):
+            changes = set()
+            for key in set(old) | set(new):
+                old_value, new_value = old.get(key), new.get(key)
+                if isinstance(old_value, dict) and isinstance(new_value, dict):
+                    changes |= diff(old_value, new_value, prefix + (key,))
+                elif old_value != new_value:
+                    changes.add(prefix + (key,))
+            return changes
+
+        return diff(old_config, cls._instance.config, ())
+
+    @staticmethod
+    def has_changed(changed_keys, *keys):
+        """Return True if any setting at or below the given keys is in changed_keys."""
+        return any(changed[:len(keys)] == keys for changed in changed_keys)
+
     @classmethod
     def config_file_exists(cls):
         """Check if a valid config file exists."""
@@ -0,0 +1,292 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+from utils import ConfigManager
+
+
+class VADEngine(ABC):
+    """
+    Abstract base class for voice activity detection engines.
+    Each engine classifies 30ms frames of 16-bit mono audio as speech or non-speech.
+    """
+
+    # Whether the engine costs more per frame than the energy gate, so skipping silent frames pays off
+    USE_ENERGY_GATE = False
+
+    @classmethod
+    @abstractmethod
+    def is_available(cls) -> bool:
+        """
+        Check if this VAD engine can be used on the current system.
+
+        Returns:
+            bool: True if the engine is available, False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def is_speech(self, frame: np.ndarray) -> bool:
+        """
+        Classify a single frame.
+
+        :param frame: 1-D int16 array holding one frame of audio
+        :return: True if the frame contains speech
+        """
+        pass
+
+    def classify_frames(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Classify consecutive frames.
+
+        :param frames: 2-D int16 array of shape (number of frames, frame size)
+        :return: 1-D bool array with one label per frame
+        """
+        return np.fromiter((self.is_speech(frame) for frame in frames), dtype=bool, count=frames.shape[0])
+
+    def reset(self):
+        """
+        Forget the audio seen so far, before classifying frames that do not follow on from it.
+        """
+        pass
+
+
+def frame_energy_db(frames: np.ndarray) -> np.ndarray:
+    """
+    Return the RMS level in dBFS of each frame.
+
+    :param frames: int16 array of shape (frame size,) or (number of frames, frame size)
+    """
+    samples = frames.astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(np.square(samples), axis=-1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+class WebRtcVAD(VADEngine):
+    """
+    Engine using the WebRTC VAD classifier.
+    """
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Check if webrtcvad is installed."""
+        try:
+            import webrtcvad
+            return True
+        except ImportError:
+            return False
+
+    def __init__(self, sample_rate, aggressiveness=2):
+        """
+        Initialize the engine.
+
+        :param aggressiveness: 0 to 3, 3 being the most aggressive in filtering out non-speech
+        """
+        import webrtcvad
+        self.sample_rate = sample_rate
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        """Classify a frame with WebRTC VAD."""
+        # Copying 30ms of audio is cheaper than wrapping the frame in a byte view
+        return self.vad.is_speech(frame.tobytes(), self.sample_rate)
+
+    def classify_frames(self, frames):
+        """Classify all frames through one byte view of their samples, without copying each frame."""
+        buffer = memoryview(np.ascontiguousarray(frames)).cast('B')
+        frame_bytes = frames.shape[1] * frames.itemsize
+        return np.fromiter((self.vad.is_speech(buffer[start:start + frame_bytes], self.sample_rate)
+                            for start in range(0, frames.shape[0] * frame_bytes, frame_bytes)),
+                           dtype=bool, count=frames.shape[0])
+
+
+class EnergyVAD(VADEngine):
+    """
+    Engine using frame energy and zero-crossing rate, vectorized with NumPy.
+
+    A frame is speech if it is loud enough and its zero-crossing rate is below the rate of
+    broadband noise. Very cheap, but less robust than the model-based engines in loud rooms.
+    """
+
+    USE_ENERGY_GATE = True
+    # Energy threshold in dBFS for each aggressiveness level
+    ENERGY_THRESHOLDS = (-50.0, -45.0, -40.0, -35.0)
+    MAX_ZERO_CROSSING_RATE = 0.35
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """The energy engine only needs NumPy."""
+        return True
+
+    def __init__(self, sample_rate, aggressiveness=2):
+        """
+        Initialize the engine.
+
+        :param aggressiveness: 0 to 3, higher values require louder audio to count as speech
+        """
+        self.sample_rate = sample_rate
+        self.energy_threshold = self.ENERGY_THRESHOLDS[min(max(aggressiveness, 0), 3)]
+
+    def is_speech(self, frame):
+        """Classify a single frame."""
+        return bool(self.classify_frames(frame[np.newaxis, :])[0])
+
+    def classify_frames(self, frames):
+        """Classify all frames at once."""
+        energy = frame_energy_db(frames)
+        signs = np.signbit(frames)
+        zero_crossing_rate = np.mean(signs[:, 1:] != signs[:, :-1], axis=-1)
+        return (energy > self.energy_threshold) & (zero_crossing_rate < self.MAX_ZERO_CROSSING_RATE)
+
+
+class SileroVAD(VADEngine):
+    """
+    Engine using the Silero VAD ONNX model bundled with faster-whisper, run on the CPU.
+
+    Silero works on 512-sample windows at 16kHz, so incoming frames are collected and each frame
+    gets the probability of the most recent complete window.
+    """
+
+    USE_ENERGY_GATE = True
+    WINDOW_SIZE = 512
+    # Speech probability threshold for each aggressiveness level
+    THRESHOLDS = (0.3, 0.4, 0.5, 0.7)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Check if onnxruntime and the model bundled with faster-whisper are installed."""
+        try:
+            import onnxruntime
+            from faster_whisper.vad import get_vad_model
+            return True
+        except ImportError:
+            return False
+
+    def __init__(self, sample_rate, aggressiveness=2):
+        """
+        Initialize the engine.
+
+        :param aggressiveness: 0 to 3, higher values require a higher speech probability
+        """
+        from faster_whisper.vad import get_vad_model
+        if sample_rate != 16000:
+            raise ValueError('Silero VAD requires a sample rate of 16000 Hz')
+        self.sample_rate = sample_rate
+        self.threshold = self.THRESHOLDS[min(max(aggressiveness, 0), 3)]
+        self.model = get_vad_model()
+        self.reset()
+
+    def reset(self):
+        """Drop the buffered samples and the recurrent state of the model."""
+        self.state = self.model.get_initial_state(batch_size=1)
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.probability = 0.0
+
+    def is_speech(self, frame):
+        """Classify a frame using the latest Silero speech probability."""
+        self.pending = np.concatenate((self.pending, frame.astype(np.float32) / 32768.0))
+        while self.pending.shape[0] >= self.WINDOW_SIZE:
+            window, self.pending = self.pending[:self.WINDOW_SIZE], self.pending[self.WINDOW_SIZE:]
+            output, self.state = self.model(window, self.state, self.sample_rate)
+            self.probability = float(np.squeeze(output))
+        return self.probability >= self.threshold
+
+
+class EnergyGate(VADEngine):
+    """
+    Wraps another engine and skips it for frames that are obviously silent.
+
+    Frames quieter than the gate threshold are classified as non-speech without calling the
+    wrapped engine, which saves most of the classifier cost while nobody is speaking. WebRTC VAD
+    is not wrapped, as it costs less per frame than the gate's own energy check.
+
+    The wrapped engine never sees the gated frames, so it is reset before the first frame after
+    a gap. Otherwise a stateful engine like Silero would join audio from both sides of the gap.
+    """
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """The gate only needs NumPy."""
+        return True
+
+    def __init__(self, engine, threshold_db=-55.0):
+        """
+        Initialize the gate.
+
+        :param engine: The VADEngine to call for frames above the threshold
+        :param threshold_db: Level in dBFS below which frames are treated as silence
+        """
+        self.engine = engine
+        self.threshold_db = threshold_db
+        # Mean squared sample value at the threshold, to compare without taking a log per frame
+        self.threshold_power = (10 ** (threshold_db / 20) * 32768.0) ** 2
+        self.gated_frames = 0
+        self.classified_frames = 0
+        # Whether the last frame was gated, so the engine must be reset before the next one
+        self.in_gap = False
+
+    def is_speech(self, frame):
+        """Classify a frame, skipping the wrapped engine if it is below the threshold."""
+        samples = frame.astype(np.float32)
+        if np.dot(samples, samples) < self.threshold_power * samples.shape[0]:
+            self.gated_frames += 1
+            self.in_gap = True
+            return False
+        if self.in_gap:
+            self.engine.reset()
+            self.in_gap = False
+        self.classified_frames += 1
+        return self.engine.is_speech(frame)
+
+    def classify_frames(self, frames):
+        """Classify frames, only passing frames above the threshold to the wrapped engine."""
+        labels = np.zeros(frames.shape[0], dtype=bool)
+        loud = frame_energy_db(frames) >= self.threshold_db
+        self.gated_frames += int(frames.shape[0] - np.count_nonzero(loud))
+        self.classified_frames += int(np.count_nonzero(loud))
+        # Pass each run of loud frames on its own, so the engine only sees contiguous audio
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], loud.astype(np.int8), [0]))))
+        for start, end in zip(edges[::2], edges[1::2]):
+            if start > 0 or self.in_gap:
+                self.engine.reset()
+            labels[start:end] = self.engine.classify_frames(frames[start:end])
+        if frames.shape[0]:
+            self.in_gap = not loud[-1]
+        return labels
+
+
+VAD_ENGINES = {
+    'webrtc': WebRtcVAD,
+    'energy': EnergyVAD,
+    'silero': SileroVAD,
+}
+
+
+def create_vad(sample_rate):
+    """
+    Create the VAD engine selected in the recording options, behind an energy gate if enabled
+    and the engine benefits from it.
+    """
+    recording_options = ConfigManager.get_config_section('recording_options')
+    engine_name = recording_options.get('vad_engine') or 'webrtc'
+    aggressiveness = recording_options.get('vad_aggressiveness')
+    if aggressiveness is None:
+        aggressiveness = 2
+
+    engine_class = VAD_ENGINES.get(engine_name)
+    if engine_class is None:
+        print(f"Unknown VAD engine '{engine_name}'. Falling back to webrtc.")
+        engine_class = WebRtcVAD
+    elif not engine_class.is_available():
+        print(f"VAD engine '{engine_name}' is not available. Falling back to webrtc.")
+        engine_class = WebRtcVAD
+
+    try:
+        engine = engine_class(sample_rate, aggressiveness)
+    except ValueError as e:
+        print(f"Error creating VAD engine '{engine_name}': {e}. Falling back to webrtc.")
+        engine = WebRtcVAD(sample_rate, aggressiveness)
+
+    gate_threshold = recording_options.get('vad_energy_gate')
+    if gate_threshold is not None and gate_threshold < 0 and engine.USE_ENERGY_GATE:
+        engine = EnergyGate(engine, gate_threshold)
+    return engine
@@ -0,0 +1,147 @@
+"""
+Check the API deadline, the hedged and local fallbacks and the circuit breaker of ApiFallback.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import transcription
+from transcription import ApiFallback
+from utils import ConfigManager
+
+AUDIO = np.zeros(16000, dtype=np.int16)
+
+
+class FakeModel:
+    """Stands in for a WhisperModel: answers every recording with one segment."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, **options):
+        self.calls += 1
+        return iter([SimpleNamespace(text=' local.', no_speech_prob=0.0)]), None
+
+
+class FakeApi:
+    """Stands in for transcribe_api: answers, fails or hangs as scripted, one behaviour per request."""
+
+    def __init__(self, monkeypatch):
+        self.behaviours = []
+        self.calls = 0
+        self.release = threading.Event()
+        monkeypatch.setattr(transcription, 'transcribe_api', self)
+
+    def __call__(self, audio_data):
+        behaviour = self.behaviours[self.calls] if self.calls < len(self.behaviours) else 'answer'
+        self.calls += 1
+        if behaviour == 'fail':
+            raise ConnectionError('API unavailable')
+        if behaviour == 'hang':
+            self.release.wait(5)
+        return f' api {self.calls}.'
+
+
+@pytest.fixture
+def api(monkeypatch):
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(0, 'model_options', 'local', 'parallel_decode_threshold')
+    for key, value in {'fallback': 'local', 'deadline': 0.1, 'failure_threshold': 2, 'failure_cooldown': 60.0}.items():
+        monkeypatch.setitem(ConfigManager.get_config_section('model_options')['api'], key, value)
+    ApiFallback.reset()
+    fake_api = FakeApi(monkeypatch)
+    yield fake_api
+    fake_api.release.set()
+    ApiFallback.reset()
+
+
+def test_answer_within_the_deadline_is_used(api):
+    model = FakeModel()
+    assert ApiFallback.transcribe(AUDIO, model) == ' api 1.'
+    assert model.calls == 0
+    assert ApiFallback.failures == 0
+
+
+def test_hedge_is_sent_after_the_deadline(api):
+    ConfigManager.set_config_value('hedge', 'model_options', 'api', 'fallback')
+    api.behaviours = ['hang', 'answer']
+    start_time = time.perf_counter()
+    assert ApiFallback.transcribe(AUDIO, FakeModel()) == ' api 2.'
+    assert 0.1 <= time.perf_counter() - start_time < 1.0
+    assert api.calls == 2
+
+
+def test_local_fallback_starts_after_the_deadline(api):
+    api.behaviours = ['hang']
+    model = FakeModel()
+    assert ApiFallback.transcribe(AUDIO, model) == ' local.'
+    assert model.calls == 1
+    assert ApiFallback.failures == 1
+
+
+def test_failure_starts_the_fallback_before_the_deadline(api):
+    ConfigManager.set_config_value(5.0, 'model_options', 'api', 'deadline')
+    api.behaviours = ['fail']
+    start_time = time.perf_counter()
+    assert ApiFallback.transcribe(AUDIO, FakeModel()) == ' local.'
+    assert time.perf_counter() - start_time < 1.0
+
+
+def test_without_a_local_model_the_api_error_is_raised(api):
+    api.behaviours = ['fail']
+    with pytest.raises(ConnectionError):
+        ApiFallback.transcribe(AUDIO, None)
+
+
+def test_breaker_opens_after_repeated_failures(api):
+    api.behaviours = ['fail', 'hang']
+    model = FakeModel()
+    ApiFallback.transcribe(AUDIO, model)
+    assert not ApiFallback.is_open()
+    ApiFallback.transcribe(AUDIO, model)
+    assert ApiFallback.is_open()
+
+    # While open, recordings go to the local model without trying the API
+    assert ApiFallback.transcribe(AUDIO, model) == ' local.'
+    assert api.calls == 2
+    assert model.calls == 3
+
+
+def test_breaker_tries_the_api_again_after_the_cooldown(api):
+    api.behaviours = ['fail', 'fail', 'fail', 'answer']
+    model = FakeModel()
+    ApiFallback.transcribe(AUDIO, model)
+    ApiFallback.transcribe(AUDIO, model)
+    assert ApiFallback.is_open()
+
+    # After the cool-down one request is tried, and a single failure opens the breaker again
+    ApiFallback.open_until = time.monotonic()
+    assert not ApiFallback.is_open()
+    assert ApiFallback.transcribe(AUDIO, model) == ' local.'
+    assert api.calls == 3
+    assert ApiFallback.is_open()
+
+    # A success closes it
+    ApiFallback.open_until = time.monotonic()
+    assert ApiFallback.transcribe(AUDIO, model) == ' api 4.'
+    assert not ApiFallback.is_open()
+    assert ApiFallback.failures == 0
+
+
+def test_late_api_answer_does_not_count_as_success(api):
+    api.behaviours = ['hang']
+    ApiFallback.transcribe(AUDIO, FakeModel())
+    api.release.set()
+    time.sleep(0.1)
+    assert ApiFallback.failures == 1
@@ -0,0 +1,121 @@
+"""
+Check how BackendRace routes recordings by length, and that stopped local decodes do not skew its latencies.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import transcription
+from transcription import BackendRace
+from utils import ConfigManager
+
+
+class SlowModel:
+    """Stands in for a WhisperModel: decodes segments lazily, each taking segment_seconds."""
+
+    def __init__(self, segments=1, segment_seconds=0.0):
+        self.segments = segments
+        self.segment_seconds = segment_seconds
+        self.decoded = 0
+
+    def transcribe(self, audio, **options):
+        def segments():
+            for index in range(self.segments):
+                time.sleep(self.segment_seconds)
+                self.decoded += 1
+                yield SimpleNamespace(text=f' local {index}.', no_speech_prob=0.0)
+        return segments(), None
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def race(monkeypatch):
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(2, 'model_options', 'api', 'race_samples')
+    ConfigManager.set_config_value(0, 'model_options', 'local', 'parallel_decode_threshold')
+    BackendRace.reset()
+    yield BackendRace
+    BackendRace.reset()
+
+
+def test_buckets_split_recordings_by_length(race):
+    assert [race.bucket(duration) for duration in (0.5, 2.9, 3.0, 10.0, 25.0, 600.0)] == [0, 0, 1, 2, 3, 3]
+
+
+def test_races_until_both_backends_have_enough_samples(race):
+    race._observe(0, 'api', 1.0)
+    race._observe(0, 'api', 1.0)
+    race._observe(0, 'local', 0.5)
+    assert race.route(0) is None
+    race._observe(0, 'local', 0.5)
+    assert race.route(0) == 'local'
+    # Other length groups are learned separately
+    assert race.route(1) is None
+
+
+def test_routes_to_the_faster_backend_and_races_again_now_and_then(race):
+    for _ in range(2):
+        race._observe(2, 'api', 0.8)
+        race._observe(2, 'local', 3.0)
+    routes = [race.route(2) for _ in range(race.RACE_EVERY + 1)]
+    assert routes == ['api'] * race.RACE_EVERY + [None]
+
+
+def test_always_races_without_race_samples(race):
+    ConfigManager.set_config_value(0, 'model_options', 'api', 'race_samples')
+    race._observe(0, 'api', 1.0)
+    race._observe(0, 'local', 0.5)
+    assert race.route(0) is None
+
+
+def test_stopped_local_decode_is_not_timed(race, monkeypatch):
+    monkeypatch.setattr(transcription, 'transcribe_api', lambda audio_data: ' api.')
+    model = SlowModel(segments=20, segment_seconds=0.05)
+    audio_data = np.zeros(16000, dtype=np.int16)
+
+    for races in (1, 2):
+        assert race.transcribe(audio_data, model) == ' api.'
+        wait_until(lambda: race._losses.get(0, {}).get('local') == races)
+
+    assert model.decoded < model.segments * 2
+    stats = race.stats()['0-3 s']
+    assert stats['api']['samples'] == 2
+    assert 'local' not in stats
+    # The local model keeps losing, so the API is used without racing
+    assert race.route(0) == 'api'
+
+
+def test_losing_api_request_is_timed_to_the_end(race, monkeypatch):
+    answer = threading.Event()
+
+    def transcribe_api(audio_data):
+        answer.wait(5)
+        return ' api.'
+
+    monkeypatch.setattr(transcription, 'transcribe_api', transcribe_api)
+    assert race.transcribe(np.zeros(16000, dtype=np.int16), SlowModel()) == ' local 0.'
+    assert 'api' not in race.stats()['0-3 s']
+
+    time.sleep(0.1)
+    answer.set()
+    wait_until(lambda: 'api' in race.stats()['0-3 s'])
+    stats = race.stats()['0-3 s']
+    assert stats['api']['latency'] >= 0.1 > stats['local']['latency']
+    assert not race._losses
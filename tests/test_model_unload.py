@@ -0,0 +1,103 @@
+"""
+Check that unloaded and evicted models are freed, and that no other component keeps them alive.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import gc
+import os
+import sys
+import threading
+import weakref
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+pytest.importorskip('PyQt5')
+
+import model_registry
+from model_loader import ModelLoader
+from model_registry import ModelRegistry
+from pipeline import TranscriptionPipeline
+from result_thread import ResultThread
+from utils import ConfigManager
+
+
+class FakeModel:
+    """Stands in for a WhisperModel: answers every recording with one segment."""
+
+    def transcribe(self, audio, **options):
+        segment = SimpleNamespace(text=' Hello.', start=0.0, end=audio.shape[0] / 16000, no_speech_prob=0.0,
+                                  words=None)
+        return iter([segment]), None
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(False, 'model_options', 'use_api')
+    ConfigManager.set_config_value(False, 'model_options', 'local', 'warm_up')
+    ConfigManager.set_config_value(None, 'model_options', 'local', 'long_form_model')
+    monkeypatch.setattr(model_registry, 'create_local_model', lambda *args, **kwargs: FakeModel())
+
+    loader = ModelLoader(ModelRegistry())
+    # Load on this thread, so the test does not need a Qt event loop
+    loader.run()
+    assert loader.is_ready()
+    return loader
+
+
+def test_unload_frees_the_model(loader):
+    model = weakref.ref(loader.model)
+    assert loader.unload()
+    gc.collect()
+    assert model() is None
+
+
+def test_unload_frees_the_model_after_the_pipeline_used_it(loader):
+    model = weakref.ref(loader.model)
+    typed = threading.Event()
+    pipeline = TranscriptionPipeline(lambda result, timeline: typed.set(), model_loader=loader)
+    pipeline.start()
+    try:
+        assert pipeline.submit(np.zeros(16000, dtype=np.int16))
+        assert typed.wait(5)
+        assert loader.unload()
+        gc.collect()
+        assert model() is None
+    finally:
+        pipeline.stop()
+
+
+def test_unload_frees_the_model_after_a_recording_session(loader):
+    model = weakref.ref(loader.model)
+    result_thread = ResultThread(model_loader=loader)
+    result_thread.local_model = loader.model
+    # A stopped session skips recording, but still releases what it holds on the way out
+    result_thread.is_running = False
+    result_thread.run()
+    assert loader.unload()
+    gc.collect()
+    assert model() is None
+
+
+def test_evicted_model_is_freed(loader):
+    ConfigManager.set_config_value(0, 'model_options', 'local', 'model_memory_budget')
+    ConfigManager.set_config_value('tiny', 'model_options', 'local', 'long_form_model')
+    ConfigManager.set_config_value(20.0, 'model_options', 'local', 'long_form_threshold')
+    try:
+        main_model = weakref.ref(loader.model)
+        long_form_model = weakref.ref(loader.model_for_duration(60.0))
+        gc.collect()
+        # A budget of 0 keeps one model: loading the long-form model evicts and frees the main model
+        assert main_model() is None
+        assert long_form_model() is loader.registry.peek(loader.long_form_options())
+        # The main model is loaded again on its next use, evicting the long-form model
+        assert loader.model_for_duration(5.0) is loader.model
+        gc.collect()
+        assert long_form_model() is None
+    finally:
+        ConfigManager.set_config_value(None, 'model_options', 'local', 'long_form_model')
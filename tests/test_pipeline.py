@@ -0,0 +1,56 @@
+"""
+Check that the continuous mode pipeline can be stopped while it waits for the model.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+pytest.importorskip('PyQt5')
+
+from model_loader import ModelLoader
+from model_registry import ModelRegistry
+from pipeline import TranscriptionPipeline
+from utils import ConfigManager
+
+
+@pytest.fixture
+def pipeline():
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(False, 'model_options', 'use_api')
+    typed = []
+    # The loader is never started, like a load that stalls or a model that was unloaded
+    pipeline = TranscriptionPipeline(lambda result, timeline: typed.append(result),
+                                     model_loader=ModelLoader(ModelRegistry()))
+    pipeline.typed = typed
+    pipeline.start()
+    yield pipeline
+    pipeline.stop()
+
+
+def test_stop_does_not_wait_for_a_model_that_never_loads(pipeline):
+    assert pipeline.submit(np.zeros(16000, dtype=np.int16))
+    stopper = threading.Thread(target=pipeline.stop)
+    stopper.start()
+    stopper.join(5)
+    assert not stopper.is_alive()
+    assert pipeline.typed == []
+    assert not pipeline.busy()
+
+
+def test_waiting_recordings_fail_when_the_model_fails_to_load(pipeline):
+    pipeline.model_loader.error = 'out of memory'
+    assert pipeline.submit(np.zeros(16000, dtype=np.int16))
+    deadline = time.monotonic() + 5
+    while pipeline.busy():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert pipeline.typed == []
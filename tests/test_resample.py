@@ -0,0 +1,41 @@
+"""
+Check that recordings are resampled without folding frequencies above the new Nyquist frequency into speech.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from audio_processing import resample
+
+
+def tone(frequency, sample_rate, seconds=2.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize('from_rate', [44100, 48000, 22050])
+def test_speech_band_is_kept(from_rate):
+    resampled = resample(tone(1000, from_rate, 65.0), from_rate, 16000)
+    expected = tone(1000, 16000, 65.0)
+    assert resampled.dtype == np.float32
+    assert resampled.shape == expected.shape
+    # The tone starts and stops abruptly, so only its ends ring; the block boundaries do not
+    assert np.abs(resampled - expected)[16:-16].max() < 1e-3
+
+
+def test_frequencies_above_nyquist_are_removed():
+    # Linear interpolation would fold a 10 kHz tone down to 6 kHz at 16kHz
+    resampled = resample(tone(10000, 44100), 44100, 16000)
+    assert np.sqrt(np.mean(resampled ** 2)) < 0.01
+
+
+def test_same_rate_is_unchanged():
+    audio = tone(1000, 16000)
+    assert resample(audio, 16000, 16000) is audio
@@ -0,0 +1,93 @@
+"""
+Check how changed settings are detected and that saving them applies them without asking to discard them.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from utils import ConfigManager
+
+
+@pytest.fixture
+def config():
+    ConfigManager.initialize()
+    snapshot = ConfigManager.snapshot()
+    yield snapshot
+    ConfigManager._instance.config = snapshot
+
+
+def test_changed_keys_reports_nested_keys(config):
+    old_config = ConfigManager.snapshot()
+    ConfigManager.set_config_value(7, 'model_options', 'local', 'beam_size')
+    ConfigManager.set_config_value(not ConfigManager.get_config_value('misc', 'print_to_terminal'),
+                                   'misc', 'print_to_terminal')
+    assert ConfigManager.changed_keys(old_config) == {('model_options', 'local', 'beam_size'),
+                                                      ('misc', 'print_to_terminal')}
+
+
+def test_changed_keys_reports_added_removed_and_replaced_sections(config):
+    old_config = ConfigManager.snapshot()
+    ConfigManager.set_config_value(1, 'new_section', 'value')
+    del ConfigManager.get_config_section('model_options')['api']
+    ConfigManager.set_config_value('flat', 'post_processing')
+    assert ConfigManager.changed_keys(old_config) == {('new_section',), ('model_options', 'api'), ('post_processing',)}
+
+
+def test_changed_keys_is_empty_without_changes(config):
+    old_config = ConfigManager.snapshot()
+    ConfigManager.set_config_value(ConfigManager.get_config_value('model_options', 'local', 'model'),
+                                   'model_options', 'local', 'model')
+    assert ConfigManager.changed_keys(old_config) == set()
+
+
+def test_has_changed_matches_keys_and_their_parents():
+    changed_keys = {('model_options', 'local', 'beam_size')}
+    assert ConfigManager.has_changed(changed_keys, 'model_options')
+    assert ConfigManager.has_changed(changed_keys, 'model_options', 'local')
+    assert ConfigManager.has_changed(changed_keys, 'model_options', 'local', 'beam_size')
+    assert not ConfigManager.has_changed(changed_keys, 'model_options', 'api')
+    assert not ConfigManager.has_changed(changed_keys, 'model_options', 'local', 'beam_size', 'extra')
+    assert not ConfigManager.has_changed(set(), 'model_options')
+
+
+def test_saving_closes_without_asking_to_discard(config, tmp_path, monkeypatch):
+    pytest.importorskip('PyQt5')
+    pytest.importorskip('dotenv')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    from ui.settings_window import SettingsWindow
+
+    app = QApplication.instance() or QApplication([])
+    # The settings are saved to src/config.yaml and .env in the working directory
+    (tmp_path / 'src').mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(os, 'environ', dict(os.environ))
+    questions = []
+    monkeypatch.setattr(QMessageBox, 'question', lambda *args: questions.append(args) or QMessageBox.No)
+    monkeypatch.setattr(QMessageBox, 'information', lambda *args: QMessageBox.Ok)
+
+    window = SettingsWindow()
+    saved, closed = [], []
+    window.settings_saved.connect(saved.append)
+    window.settings_closed.connect(lambda: closed.append(True))
+    window.show()
+    window.save_settings()
+    app.processEvents()
+
+    assert (tmp_path / 'src' / 'config.yaml').is_file()
+    assert len(saved) == 1
+    assert not questions
+    assert not closed
+    assert not window.isVisible()
+
+    # Closing later without saving still asks
+    window.show()
+    window.close()
+    assert len(questions) == 1
+    assert window.isVisible()
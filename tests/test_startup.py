@@ -0,0 +1,41 @@
+"""
+Start the app in a fresh interpreter, without a display, and check that it initializes its components.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Only check that the dependencies are installed: pynput cannot be imported without a display
+MISSING = [module for module in ('PyQt5', 'pynput', 'sounddevice', 'dotenv') if importlib.util.find_spec(module) is None]
+pytestmark = pytest.mark.skipif(bool(MISSING), reason=f'Requires {", ".join(MISSING)}')
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+STARTUP_SCRIPT = """
+from utils import ConfigManager
+ConfigManager.initialize()
+import main
+app = main.WhisperWriterApp()
+assert app.components_initialized
+assert app.status_window is not None
+app.cleanup()
+print('started')
+"""
+
+
+@pytest.mark.parametrize('use_api', [False, True])
+def test_app_starts(tmp_path, use_api):
+    # The app reads src/config.yaml from the working directory, so give it its own
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'config.yaml').write_text(
+        f'model_options: {{use_api: {str(use_api).lower()}}}\nmisc: {{print_to_terminal: false}}\n')
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, QT_QPA_PLATFORM='offscreen', PYNPUT_BACKEND='dummy')
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert 'started' in result.stdout
@@ -0,0 +1,129 @@
+"""
+Check the local-agreement policy and the forced commit of StreamingTranscriber.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from streaming import StreamingTranscriber
+from utils import ConfigManager
+
+SAMPLE_RATE = 16000
+
+
+class ScriptedModel:
+    """Stands in for a WhisperModel: answers each decode with the next scripted list of (end, word) pairs."""
+
+    def __init__(self, *decodes):
+        self.decodes = list(decodes)
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((audio.shape[0] / SAMPLE_RATE, options.get('initial_prompt')))
+        words = [SimpleNamespace(end=end, word=word) for end, word in self.decodes.pop(0)]
+        return iter([SimpleNamespace(text=''.join(word.word for word in words), words=words, no_speech_prob=0.0)]), None
+
+
+def seconds(duration):
+    return np.zeros(int(duration * SAMPLE_RATE), dtype=np.int16)
+
+
+@pytest.fixture(autouse=True)
+def config():
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value('', 'model_options', 'common', 'initial_prompt')
+
+
+def make_streamer(model):
+    partials = []
+    streamer = StreamingTranscriber(model, None, SAMPLE_RATE, on_partial=partials.append)
+    return streamer, partials
+
+
+def test_words_two_decodes_agree_on_are_committed():
+    model = ScriptedModel(
+        [(0.5, ' Hello'), (1.0, ' world'), (1.4, ' this')],
+        [(0.5, ' hello,'), (1.0, ' world'), (1.6, ' is'), (2.0, ' a')],
+    )
+    streamer, partials = make_streamer(model)
+    streamer._process(seconds(1.5))
+    assert streamer.committed_words == []
+    assert partials[-1] == 'Hello world this'
+
+    streamer._process(seconds(2.2))
+    # The prefix both decodes agree on is committed, ignoring case and punctuation
+    assert streamer.committed_words == [' hello,', ' world']
+    assert streamer.committed_samples == SAMPLE_RATE
+    assert [word for _, word in streamer.hypothesis] == [' is', ' a']
+    assert partials[-1] == 'hello, world is a'
+
+
+def test_committed_audio_and_text_are_not_decoded_again():
+    model = ScriptedModel(
+        [(0.5, ' One'), (1.0, ' two')],
+        [(0.5, ' One'), (1.0, ' two'), (1.5, ' three')],
+        [(0.6, ' three'), (1.2, ' four')],
+    )
+    streamer, _ = make_streamer(model)
+    streamer._process(seconds(1.2))
+    streamer._process(seconds(1.8))
+    streamer._process(seconds(2.5))
+    # The third decode only gets the audio after the committed words, prompted with their text
+    assert model.calls[2] == (pytest.approx(1.5), ' One two')
+    assert streamer.committed_words == [' One', ' two', ' three']
+    assert [word for _, word in streamer.hypothesis] == [' four']
+
+
+def test_no_agreement_commits_nothing_below_the_limit():
+    model = ScriptedModel([(1.0, ' Hello')], [(1.0, ' Yellow')])
+    streamer, _ = make_streamer(model)
+    streamer._process(seconds(2.0))
+    streamer._process(seconds(3.0))
+    assert streamer.committed_words == []
+    assert streamer.committed_samples == 0
+
+
+def test_long_disagreement_forces_a_commit_of_all_but_the_last_seconds():
+    first = [(float(second), f' a{second}') for second in range(1, 21)]
+    second = [(float(second), f' b{second}') for second in range(1, 27)]
+    model = ScriptedModel(first, second)
+    streamer, _ = make_streamer(model)
+    streamer._process(seconds(20.0))
+    assert streamer.committed_words == []
+    streamer._process(seconds(26.0))
+    # Words ending before 26 - FORCED_COMMIT_MARGIN seconds are committed, the rest stays tentative
+    assert streamer.committed_words == [f' b{second}' for second in range(1, 21)]
+    assert streamer.committed_samples == 20 * SAMPLE_RATE
+    assert [word for _, word in streamer.hypothesis] == [f' b{second}' for second in range(21, 27)]
+
+
+def test_finish_decodes_only_the_uncommitted_tail():
+    model = ScriptedModel(
+        [(0.5, ' Hello'), (1.0, ' world')],
+        [(0.5, ' Hello'), (1.0, ' world'), (1.5, ' again')],
+        [(0.5, ' again.')],
+    )
+    streamer, _ = make_streamer(model)
+    streamer._process(seconds(1.2))
+    streamer._process(seconds(1.8))
+    assert streamer.finish(seconds(2.0)) == ' Hello world again.'
+    assert model.calls[-1][0] == pytest.approx(1.0)
+
+
+def test_decode_finishing_after_stop_commits_nothing():
+    model = ScriptedModel([(0.5, ' Hello')], [(0.5, ' Hello')])
+    streamer, partials = make_streamer(model)
+    streamer._process(seconds(1.0))
+    streamer.stop()
+    streamer._process(seconds(1.5))
+    assert streamer.committed_words == []
+    assert len(partials) == 1
@@ -0,0 +1,77 @@
+"""
+Check that the energy gate only passes contiguous audio to the engine it wraps.
+
+Run from the root of the repository:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from vad import EnergyGate, VADEngine
+
+FRAME_SIZE = 480
+
+
+class StatefulEngine(VADEngine):
+    """Stands in for a stateful engine like Silero: keeps the runs of frames it saw since each reset."""
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def __init__(self):
+        self.runs = [[]]
+
+    def is_speech(self, frame):
+        self.runs[-1].append(int(frame[0]))
+        return True
+
+    def reset(self):
+        self.runs.append([])
+
+
+def make_frames(loud):
+    """Return frames numbered by their index, silent where loud is False."""
+    frames = np.zeros((len(loud), FRAME_SIZE), dtype=np.int16)
+    for index, is_loud in enumerate(loud):
+        if is_loud:
+            frames[index] = 8000 * np.sign(np.sin(np.arange(FRAME_SIZE)))
+            frames[index, 0] = index
+    return frames
+
+
+LOUD = [True, True, False, False, True, False, True, True, True]
+EXPECTED_RUNS = [[0, 1], [4], [6, 7, 8]]
+
+
+def test_engine_is_reset_after_each_gap():
+    engine = StatefulEngine()
+    gate = EnergyGate(engine)
+    labels = [gate.is_speech(frame) for frame in make_frames(LOUD)]
+    assert labels == LOUD
+    assert [run for run in engine.runs if run] == EXPECTED_RUNS
+    assert (gate.gated_frames, gate.classified_frames) == (3, 6)
+
+
+def test_batches_are_split_at_gaps():
+    engine = StatefulEngine()
+    gate = EnergyGate(engine)
+    labels = gate.classify_frames(make_frames(LOUD))
+    assert labels.tolist() == LOUD
+    assert [run for run in engine.runs if run] == EXPECTED_RUNS
+
+
+def test_gap_at_the_end_of_a_batch_resets_before_the_next():
+    engine = StatefulEngine()
+    gate = EnergyGate(engine)
+    frames = make_frames(LOUD)
+    gate.classify_frames(frames[:3])
+    gate.classify_frames(frames[3:5])
+    assert gate.is_speech(frames[5]) is False
+    gate.is_speech(frames[6])
+    gate.classify_frames(frames[7:])
+    assert [run for run in engine.runs if run] == EXPECTED_RUNS